@@ -0,0 +1,246 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import ipaddress
+import os
+import time
+from contextlib import contextmanager
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.common.statefile import StateFile
+
+
+class SubnetAllocator:
+    """
+    SubnetAllocator hands out non-overlapping subnets from a configured
+    supernet and tracks them per project, implements::
+
+        * allocate       - reserve a free subnet for a project
+        * assign         - bind an allocated subnet to the created network
+        * release        - free a subnet
+        * releaseNetwork - free the subnet held by a network
+        * releaseProject - free every subnet held by a project
+        * reconcile      - free subnets of networks which no longer exist
+
+    Allocations are persisted in a StateFile guarded by a file lock, so
+    concurrent test processes never get the same subnet and a crashed run does
+    not leak ranges into the next one. Supernet, prefix length and state file
+    are read from the [network] section of test.conf.
+
+    Examples:
+        ::
+
+            allocator = SubnetAllocator()
+            cidr      = allocator.allocate(projectID)
+            allocator.assign(projectID, cidr, networkID)
+            allocator.releaseNetwork(projectID, networkID)
+    """
+
+    DEFAULT_SUPERNET = "192.168.0.0/16"
+    DEFAULT_PREFIXLEN = 24
+    DEFAULT_STATEFILE = ".subnets.json"
+
+    def __init__(self, supernet=None, prefixLen=None, stateFile=None):
+        testConfig = ConfigParser("network")
+        if supernet is None:
+            supernet = testConfig.getOptionalConfig("supernet", self.DEFAULT_SUPERNET)
+        if prefixLen is None:
+            prefixLen = testConfig.getOptionalConfig(
+                "prefixlen", self.DEFAULT_PREFIXLEN
+            )
+        if stateFile is None:
+            stateFile = testConfig.getOptionalConfig(
+                "subnetstatefile", self.DEFAULT_STATEFILE
+            )
+
+        self.supernet = ipaddress.ip_network(supernet)
+        self.prefixLen = int(prefixLen)
+        self.stateFile = StateFile(stateFile)
+
+    @contextmanager
+    def _state(self):
+        with self.stateFile.locked() as state:
+            state.setdefault("projects", {})
+            yield state
+
+    @staticmethod
+    def _isStale(entry):
+        # a subnet reserved by a process that died before the network was
+        # created will never be assigned, so it can be handed out again
+        if entry.get("network") or "pid" not in entry:
+            return False
+        return not StateFile.isProcessAlive(entry["pid"])
+
+    def allocate(self, projectID, name=""):
+        """
+        reserve a free subnet for the project.
+
+        Returns:
+            string: subnet in CIDR notation, None if the supernet is exhausted.
+
+        Args:
+            projectID (string): project the subnet is allocated to.
+
+            name      (string): optional name recorded for the allocation.
+
+        Examples:
+            ::
+
+                allocator = SubnetAllocator()
+                cidr      = allocator.allocate(projectID, 'Auto-SubNet1')
+        """
+        with self._state() as state:
+            allocations = state["projects"].setdefault(projectID, {})
+            for cidr in list(allocations):
+                if self._isStale(allocations[cidr]):
+                    elog.warning(
+                        "reclaiming stale subnet %s of project %s"
+                        % (eutil.rcolor(cidr), eutil.bcolor(projectID))
+                    )
+                    del allocations[cidr]
+
+            for subnet in self.supernet.subnets(new_prefix=self.prefixLen):
+                cidr = str(subnet)
+                if cidr in allocations:
+                    continue
+                allocations[cidr] = {
+                    "name": name,
+                    "network": None,
+                    "pid": os.getpid(),
+                    "time": time.time(),
+                }
+                elog.info(
+                    "allocated subnet %s to project %s"
+                    % (eutil.bcolor(cidr), eutil.bcolor(projectID))
+                )
+                return cidr
+
+        elog.error(
+            "no free /%s subnet left in %s for project %s"
+            % (
+                self.prefixLen,
+                eutil.rcolor(self.supernet),
+                eutil.bcolor(projectID),
+            )
+        )
+        return None
+
+    def assign(self, projectID, cidr, networkID):
+        """
+        bind an allocated subnet to the network created on it.
+
+        Returns:
+            bool: True on success or False if the subnet is not allocated.
+        """
+        with self._state() as state:
+            allocations = state["projects"].get(projectID, {})
+            if cidr not in allocations:
+                elog.error(
+                    "subnet %s is not allocated to project %s"
+                    % (eutil.rcolor(cidr), eutil.bcolor(projectID))
+                )
+                return False
+            allocations[cidr]["network"] = networkID
+        return True
+
+    def release(self, projectID, cidr):
+        """
+        free a subnet allocated to the project.
+
+        Returns:
+            bool: True on success or False if the subnet is not allocated.
+        """
+        with self._state() as state:
+            allocations = state["projects"].get(projectID, {})
+            if allocations.pop(cidr, None) is None:
+                return False
+            if not allocations:
+                state["projects"].pop(projectID, None)
+        elog.info(
+            "released subnet %s of project %s"
+            % (eutil.bcolor(cidr), eutil.bcolor(projectID))
+        )
+        return True
+
+    def releaseNetwork(self, projectID, networkID):
+        """
+        free the subnet held by a network of the project.
+
+        Returns:
+            bool: True on success or False if the network holds no subnet.
+        """
+        for cidr, entry in self.getAllocations(projectID).items():
+            if entry["network"] == networkID:
+                return self.release(projectID, cidr)
+        return False
+
+    def releaseProject(self, projectID):
+        """
+        free every subnet held by the project.
+
+        Returns:
+            int: number of subnets released.
+        """
+        with self._state() as state:
+            allocations = state["projects"].pop(projectID, {})
+        if allocations:
+            elog.info(
+                "released %s subnets of project %s"
+                % (len(allocations), eutil.bcolor(projectID))
+            )
+        return len(allocations)
+
+    def reconcile(self, projectID, networkIDs):
+        """
+        free subnets whose networks are not in networkIDs any more, e.g.
+        networks removed out of band or by a crashed run.
+
+        Returns:
+            int: number of subnets released.
+
+        Args:
+            projectID  (string): project to reconcile.
+
+            networkIDs (list)  : IDs of networks which exist in the project.
+        """
+        released = 0
+        with self._state() as state:
+            allocations = state["projects"].get(projectID, {})
+            for cidr in list(allocations):
+                networkID = allocations[cidr]["network"]
+                if networkID and networkID not in networkIDs:
+                    del allocations[cidr]
+                    released += 1
+        if released:
+            elog.info(
+                "reclaimed %s subnets of deleted networks in project %s"
+                % (released, eutil.bcolor(projectID))
+            )
+        return released
+
+    def getAllocations(self, projectID):
+        """
+        Returns:
+            dict: allocations of the project keyed by CIDR.
+        """
+        with self._state() as state:
+            return dict(state["projects"].get(projectID, {}))
+
+    @staticmethod
+    def getSubnetDetails(cidr):
+        """
+        Returns:
+            tuple: gateway IP, first and last IP of the allocation pool.
+
+        Examples:
+            ::
+
+                gateway, start, end = SubnetAllocator.getSubnetDetails(cidr)
+        """
+        subnet = ipaddress.ip_network(cidr)
+        return str(subnet[1]), str(subnet[2]), str(subnet[-2])
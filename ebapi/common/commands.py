@@ -4,38 +4,211 @@
 # (c) 2022 Edgebricks Inc
 
 
+import atexit
+import hashlib
 import os
+import posixpath
+import shlex
+import stat
 import sys
 import socket
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import paramiko
 
+from ebapi.common.config import ConfigParser
 from ebapi.common.logger import elog
 from ebapi.common import utils as eutil
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
+class SSHConnectionPool:
+    """
+    SSHConnectionPool keeps authenticated SSH connections open for reuse,
+    keyed by (host, port, username), implements::
+
+        * getClient - pooled connection, reconnected transparently if stale
+        * discard   - close and forget a pooled connection
+        * closeAll  - close all pooled connections
+
+    Pooled transports send keepalives, and a connection which was idle for
+    longer than checkAfterInSecs is health checked by opening a channel on it
+    before it is handed out again.
+
+    Examples:
+        ::
+
+            client = sshPool.getClient((host, 22, username), connectFn)
+            stdin, stdout, stderr = client.exec_command('uptime')
+    """
+
+    def __init__(self, keepaliveInSecs=15, checkAfterInSecs=30):
+        self.keepaliveInSecs = keepaliveInSecs
+        self.checkAfterInSecs = checkAfterInSecs
+        self.lock = threading.Lock()
+        # key -> [paramiko.SSHClient, time of last use]
+        self.clients = {}
+        # serialises connecting per key, other keys connect in parallel
+        self.keyLocks = {}
+
+    def _isHealthy(self, client, lastUsed):
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if time.monotonic() - lastUsed < self.checkAfterInSecs:
+            return True
+        try:
+            transport.open_session(timeout=self.keepaliveInSecs).close()
+        except (EOFError, OSError, paramiko.SSHException):
+            return False
+        return True
+
+    def getClient(self, key, connect):
+        """
+        Returns:
+            paramiko.SSHClient: authenticated connection, None on failure.
+
+        Args:
+            key     (tuple)   : (host, port, username) of the connection.
+
+            connect (function): opens a new authenticated SSHClient, or
+                                returns None on failure.
+        """
+        with self.lock:
+            keyLock = self.keyLocks.setdefault(key, threading.Lock())
+
+        with keyLock:
+            entry = self.clients.get(key)
+            if entry is not None:
+                client, lastUsed = entry
+                if self._isHealthy(client, lastUsed):
+                    entry[1] = time.monotonic()
+                    return client
+                elog.warning(
+                    "stale ssh connection to %s, reconnecting" % eutil.bcolor(key[0])
+                )
+                client.close()
+                del self.clients[key]
+
+            client = connect()
+            if client is None:
+                return None
+            client.get_transport().set_keepalive(self.keepaliveInSecs)
+            self.clients[key] = [client, time.monotonic()]
+            return client
+
+    def discard(self, key):
+        """
+        close the pooled connection for key, if any.
+        """
+        with self.lock:
+            keyLock = self.keyLocks.setdefault(key, threading.Lock())
+
+        with keyLock:
+            entry = self.clients.pop(key, None)
+        if entry is not None:
+            entry[0].close()
+
+    def closeAll(self):
+        """
+        close all pooled connections.
+        """
+        for key in list(self.clients):
+            self.discard(key)
+
+
+# connections shared by all RemoteMachine objects of this process
+sshPool = SSHConnectionPool()
+atexit.register(sshPool.closeAll)
+
+# outcome of a command run on its own channel, exitStatus is None if the
+# command did not finish in time or its channel failed
+CommandResult = namedtuple(
+    "CommandResult", ["command", "exitStatus", "stdout", "stderr", "duration"]
+)
+
+
+def getGateway(section="remote"):
+    """
+    Returns:
+        RemoteMachine: the gateway configured in test.conf, None unless
+        tunnel is enabled in that section.
+
+    Examples:
+        ::
+
+            # test.conf
+            [remote]
+            host = vpn.edgebricks.in
+            username = ankit
+            password = ankit
+            port = 16022
+            tunnel = true
+
+            remote = RemoteMachine(floatingIP, username, password=password,
+                                   gateway=getGateway())
+    """
+    testConfig = ConfigParser(section)
+    tunnel = testConfig.getOptionalConfig("tunnel", "false")
+    if tunnel.lower() not in ("true", "yes", "1"):
+        return None
+
+    return RemoteMachine(
+        testConfig.getConfig("host"),
+        testConfig.getConfig("username"),
+        port=int(testConfig.getOptionalConfig("port", "22")),
+        password=testConfig.getOptionalConfig("password"),
+        keyfile=testConfig.getOptionalConfig("keyfile"),
+    )
+
+
 class RemoteMachine:
     """
     RemoteMachine API class implements::
 
         * connect - Connect to remote SSH server
+        * isSSHReady - check for the SSH banner, without logging in
         * run     - to run command on remote machine as specified user
+        * stream  - run command, iterate over its output while it runs
         * get     - transfer file from remote machine to local machine
         * put     - transfer file from local machine to remote machine
+        * download/downloadAll/downloadDir - resumable, verified transfers
+        * upload/uploadAll/uploadDir       - of files, file lists and trees
+        * submit  - run a command on its own channel, returns a future
+        * runAll  - run several commands concurrently, wait for all of them
         * close   - close all remote connections
 
+    Connections come from sshPool, so RemoteMachine objects for the same
+    host, port and user share one authenticated connection which stays open
+    across calls until close(). With a gateway, the connection is tunnelled
+    through the gateway's pooled connection, so any number of targets share
+    one authenticated gateway session.
+
     Examples:
         ::
 
-            remote      = RemoteMachine(host, username, password)
+            remote      = RemoteMachine(host, username, password=password)
             rc, output  = remote.run(cmd)
             assert rc  == 0
             match       = re.findall(pattern, output, re.M)
     """
 
+    # bytes per SFTP read/write, paramiko splits them into protocol requests
+    CHUNK_SIZE = 1048576
+
     def __init__(
-        self, host, username, port=22, timeout=20, password=None, keyfile=None
+        self,
+        host,
+        username,
+        port=22,
+        timeout=20,
+        password=None,
+        keyfile=None,
+        maxChannels=8,
+        gateway=None,
     ) -> None:
         self.ssh_output = None
         self.ssh_error = None
@@ -47,6 +220,72 @@ class RemoteMachine:
         self.port = port
         self.password = password
         self.timeout = float(timeout)
+        # channels running concurrently on the shared transport, sshd allows
+        # 10 sessions per connection by default (MaxSessions)
+        self.maxChannels = maxChannels
+        self.executor = None
+        self.executorLock = threading.Lock()
+        # RemoteMachine to tunnel the connection through, see getGateway
+        self.gateway = gateway
+
+    def getKey(self):
+        """
+        Returns:
+            tuple: (host, port, username) under which the connection is pooled,
+            followed by the key of the gateway for tunnelled connections.
+        """
+        if self.gateway is not None:
+            return (self.host, self.port, self.username, self.gateway.getKey())
+        return (self.host, self.port, self.username)
+
+    def _openTunnel(self):
+        # a direct-tcpip channel on the gateway's pooled transport carries the
+        # whole SSH session to the target, no separate handshake with the VPN
+        if not self.gateway.connect():
+            elog.error(
+                "Could not connect to gateway %s" % eutil.rcolor(self.gateway.host)
+            )
+            return None
+
+        elog.info(
+            "Tunnelling to [%s] through gateway [%s]"
+            % (eutil.bcolor(self.host), eutil.bcolor(self.gateway.host))
+        )
+        return self.gateway.client.get_transport().open_channel(
+            "direct-tcpip",
+            (self.host, int(self.port)),
+            ("127.0.0.1", 0),
+            timeout=self.timeout,
+        )
+
+    def isSSHReady(self):
+        """
+        Check whether the SSH server answers, without logging in, e.g. to
+        time the boot of a VM whose credentials are not known.
+
+        Returns:
+            bool: True if the server sent its SSH version banner.
+        """
+        sock = None
+        try:
+            if self.gateway is not None:
+                sock = self._openTunnel()
+                if sock is None:
+                    return False
+                sock.settimeout(self.timeout)
+            else:
+                sock = socket.create_connection(
+                    (self.host, int(self.port)), timeout=self.timeout
+                )
+            banner = sock.recv(256)
+        except (OSError, paramiko.SSHException) as e:
+            elog.debug("SSH on %s not ready: %s" % (self.host, e))
+            return False
+        finally:
+            if sock is not None:
+                sock.close()
+
+        return banner.startswith(b"SSH-")
 
     def connect(self):
         """
@@ -66,25 +305,36 @@ class RemoteMachine:
         Examples:
             ::
 
-                remote = RemoteMachine(host, username, password)
+                remote = RemoteMachine(host, username, password=password)
                 remote.close
         """
+        self.client = sshPool.getClient(self.getKey(), self._connect)
+        return self.client is not None
+
+    def _connect(self):
+        client = None
         try:
             # Paramiko.SSHClient can be used to make connections to the remote
             # server and transfer files
             elog.info("Establishing ssh connection..")
-            self.client = paramiko.SSHClient()
+            client = paramiko.SSHClient()
             # instructs the client to look for all the hosts connected to in the past by looking at the
             # system's known_hosts file and finding the SSH keys the host is
             # expecting
-            self.client.load_system_host_keys()
+            client.load_system_host_keys()
             # Parsing an instance of the AutoAddPolicy to
             # set_missing_host_key_policy() changes it to allow any host.
-            self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            sock = None
+            if self.gateway is not None:
+                sock = self._openTunnel()
+                if sock is None:
+                    client.close()
+                    return None
             # Connect to the server
-            if self.password == "":
+            if not self.password:
                 private_key = paramiko.RSAKey.from_private_key_file(self.keyfile)
-                self.client.connect(
+                client.connect(
                     hostname=self.host,
                     port=self.port,
                     username=self.username,
@@ -92,10 +342,11 @@ class RemoteMachine:
                     timeout=self.timeout,
                     allow_agent=False,
                     look_for_keys=False,
+                    sock=sock,
                 )
                 elog.info("Connected to the server [%s]" % eutil.bcolor(self.host))
             else:
-                self.client.connect(
+                client.connect(
                     hostname=self.host,
                     port=self.port,
                     username=self.username,
@@ -103,82 +354,309 @@ class RemoteMachine:
                     timeout=self.timeout,
                     allow_agent=False,
                     look_for_keys=False,
+                    sock=sock,
                 )
                 elog.info("Connected to the server [%s]" % eutil.bcolor(self.host))
         except paramiko.AuthenticationException:
             elog.error("Authentication failed, please verify your credentials")
-            result_flag = False
+            client.close()
+            client = None
         except paramiko.SSHException as sshException:
             elog.error(
                 " Could not establish SSH connection: [%s]" % eutil.bcolor(sshException)
             )
-            result_flag = False
+            client.close()
+            client = None
         except socket.timeout as e:
             elog.error("Connection timed out: [%s]" % eutil.bcolor(e))
-            result_flag = False
+            client.close()
+            client = None
         except Exception as e:
             elog.error(
                 "\nException in connecting to the server: [%s]" % eutil.bcolor(e)
             )
-            result_flag = False
-            self.client.close()
-        else:
-            result_flag = True
+            if client:
+                client.close()
+            client = None
 
-        return result_flag
+        return client
 
-    def run(self, command):
+    def run(self, command, timeoutInSecs=300):
         """
         Execute a command on the remote host.
 
         Returns:
-            tuple: an integer status and a two strings,
-                   the first containing stdout and
-                   the second containing stderr from the command
+            tuple: the exit status of the command, None if it could not be
+                   run or timed out, and a string containing its stdout.
+                   stderr is kept in self.ssh_error.
 
         Args:
-            command (string) : the command to execute
+            command       (string) : the command to execute
+
+            timeoutInSecs (int)    : give up on the command after this long,
+                                     None to wait forever.
 
         Examples:
             ::
 
-                remote = RemoteMachine(host, username, password)
+                remote = RemoteMachine(host, username, password=password)
                 rc, output  = remote.run(command)
                 assert rc  == 0
         """
-        self.ssh_output = None
-        result_flag = True
+        elog.info("Executing command --> [%s]" % eutil.bcolor(command))
+        result = self._execute(command, timeoutInSecs)
+        self.ssh_output = result.stdout
+        self.ssh_error = result.stderr
+        if result.exitStatus == 0:
+            elog.info("Command execution completed successfully")
+        elif result.exitStatus is not None:
+            elog.error(
+                "Problem occurred while running command: [%s] - exit status %s %s"
+                % (eutil.bcolor(command), result.exitStatus, result.stderr)
+            )
+
+        return result.exitStatus, result.stdout
+
+    def _localChecksum(self, localPath):
+        digest = hashlib.sha256()
+        with open(localPath, "rb") as f:
+            for chunk in iter(lambda: f.read(self.CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _remoteChecksum(self, remotePath):
+        result = self._execute("sha256sum %s" % shlex.quote(remotePath), None)
+        if result.exitStatus != 0 or not result.stdout:
+            return None
+        return result.stdout.split()[0]
+
+    def _verify(self, localPath, remotePath):
+        remoteSum = self._remoteChecksum(remotePath)
+        if remoteSum is None:
+            elog.warning(
+                "no sha256sum on %s, skipped verifying %s"
+                % (eutil.bcolor(self.host), remotePath)
+            )
+            return True
+        return remoteSum == self._localChecksum(localPath)
+
+    def _download(self, sftp, remotePath, localPath, resume):
+        # data goes into a .part file first, an interrupted transfer resumes
+        # from its size and only complete files ever carry the final name
+        partPath = localPath + ".part"
+        size = sftp.stat(remotePath).st_size
+        offset = 0
+        if resume and os.path.exists(partPath):
+            offset = os.path.getsize(partPath)
+            if offset > size:
+                offset = 0
+
+        with sftp.open(remotePath, "rb", bufsize=self.CHUNK_SIZE) as remote:
+            with open(partPath, "ab" if offset else "wb") as local:
+                remote.seek(offset)
+                # keep many read requests in flight instead of one at a time
+                remote.prefetch(size)
+                for chunk in iter(lambda: remote.read(self.CHUNK_SIZE), b""):
+                    local.write(chunk)
+        os.replace(partPath, localPath)
+        return size - offset
+
+    def _upload(self, sftp, localPath, remotePath, resume):
+        partPath = remotePath + ".part"
+        size = os.path.getsize(localPath)
+        offset = 0
+        if resume:
+            try:
+                offset = sftp.stat(partPath).st_size
+            except IOError:
+                offset = 0
+            if offset > size:
+                offset = 0
+
+        mode = "r+b" if offset else "wb"
+        with sftp.open(partPath, mode, bufsize=self.CHUNK_SIZE) as remote:
+            # do not wait for the status of every write request
+            remote.set_pipelined(True)
+            remote.seek(offset)
+            with open(localPath, "rb") as local:
+                local.seek(offset)
+                for chunk in iter(lambda: local.read(self.CHUNK_SIZE), b""):
+                    remote.write(chunk)
+        sftp.posix_rename(partPath, remotePath)
+        return size - offset
+
+    def _transfer(self, direction, source, destination, resume, verify):
+        start = time.monotonic()
+        localPath, remotePath = (
+            (destination, source) if direction == "download" else (source, destination)
+        )
         try:
-            if self.connect():
-                elog.info("Executing command --> [%s]" % eutil.bcolor(command))
-                stdin, stdout, stderr = self.client.exec_command(command, timeout=10)
-                self.ssh_input = stdin.read()
-                self.ssh_output = stdout.read()
-                self.ssh_error = stderr.read()
-                if self.ssh_error:
-                    elog.error(
-                        "Problem occurred while running command: [%s] - The error is %s"
-                        % (eutil.bcolor(command), self.ssh_error)
-                    )
-                    result_flag = False
-                else:
-                    elog.info("Command execution completed successfully")
-                self.client.close()
-            else:
+            if not self.connect():
                 elog.error("Could not establish SSH connection")
-                result_flag = False
-        except socket.timeout as e:
+                return False
+
+            with self.client.open_sftp() as sftp:
+                if direction == "download":
+                    moved = self._download(sftp, remotePath, localPath, resume)
+                else:
+                    moved = self._upload(sftp, localPath, remotePath, resume)
+
+            if verify and not self._verify(localPath, remotePath):
+                if not resume:
+                    elog.error("[%s] %s: checksum mismatch" % (source, direction))
+                    return False
+                # the resumed part may have been stale, transfer it afresh
+                elog.warning(
+                    "[%s] %s: checksum mismatch, retrying" % (source, direction)
+                )
+                return self._transfer(direction, source, destination, False, verify)
+        except Exception as e:
             elog.error(
-                "\nException in connecting to the server: [%s]" % eutil.bcolor(e)
+                "[%s] %s: failed - %s"
+                % (eutil.bcolor(source), direction, eutil.rcolor(e))
             )
-            self.client.close()
-            result_flag = False
-        except paramiko.SSHException:
-            elog.error("Failed to execute the command: [%s]" % eutil.bcolor(command))
-            self.client.close()
-            result_flag = False
+            return False
 
-        return result_flag, self.ssh_output.strip()
+        elapsed = max(time.monotonic() - start, 0.001)
+        elog.info(
+            "[%s] %s: success, %.1f MB at %.1f MB/s"
+            % (eutil.bcolor(source), direction, moved / 1e6, moved / 1e6 / elapsed)
+        )
+        return True
+
+    def download(self, remotePath, localPath, resume=True, verify=True):
+        """
+        download a file from remote machine to local, in pipelined chunks.
+
+        Returns:
+            bool: True on success or False on failure
+
+        Args:
+            remotePath (string): path to remote file
+            localPath  (string): destination file in local machine
+            resume     (bool)  : continue an interrupted earlier download
+            verify     (bool)  : compare sha256 checksums afterwards
+
+        Examples:
+            ::
+
+                remote = RemoteMachine(host, username, password=password)
+                assert remote.download('/tmp/fio.log', '/tmp/fio.log')
+        """
+        return self._transfer("download", remotePath, localPath, resume, verify)
+
+    def upload(self, localPath, remotePath, resume=True, verify=True):
+        """
+        upload a file from local machine to remote, in pipelined chunks.
+
+        Returns:
+            bool: True on success or False on failure
+
+        Args:
+            localPath  (string): source file in local machine
+            remotePath (string): destination file in remote
+            resume     (bool)  : continue an interrupted earlier upload
+            verify     (bool)  : compare sha256 checksums afterwards
+        """
+        return self._transfer("upload", localPath, remotePath, resume, verify)
+
+    def _transferAll(self, direction, pairs, resume, verify):
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.maxChannels) as executor:
+            futures = [
+                executor.submit(self._transfer, direction, src, dst, resume, verify)
+                for src, dst in pairs
+            ]
+            results = [future.result() for future in futures]
+
+        failed = results.count(False)
+        if failed:
+            elog.error(
+                "%s of %s files failed to %s" % (failed, len(results), direction)
+            )
+        elog.info(
+            "%s of %s files completed in %.1fs"
+            % (direction, len(results), time.monotonic() - start)
+        )
+        return not failed
+
+    def downloadAll(self, pairs, resume=True, verify=True):
+        """
+        download files in parallel, up to maxChannels at a time.
+
+        Returns:
+            bool: True if all files were downloaded.
+
+        Args:
+            pairs (list): (remotePath, localPath) of every file.
+        """
+        return self._transferAll("download", pairs, resume, verify)
+
+    def uploadAll(self, pairs, resume=True, verify=True):
+        """
+        upload files in parallel, up to maxChannels at a time.
+
+        Returns:
+            bool: True if all files were uploaded.
+
+        Args:
+            pairs (list): (localPath, remotePath) of every file.
+        """
+        return self._transferAll("upload", pairs, resume, verify)
+
+    def downloadDir(self, remoteDir, localDir, resume=True, verify=True):
+        """
+        download a directory tree, files in parallel.
+
+        Returns:
+            bool: True if all files were downloaded.
+        """
+        if not self.connect():
+            elog.error("Could not establish SSH connection")
+            return False
+
+        pairs = []
+        with self.client.open_sftp() as sftp:
+            pending = [(remoteDir, localDir)]
+            while pending:
+                remote, local = pending.pop()
+                os.makedirs(local, exist_ok=True)
+                for entry in sftp.listdir_attr(remote):
+                    remotePath = posixpath.join(remote, entry.filename)
+                    localPath = os.path.join(local, entry.filename)
+                    if stat.S_ISDIR(entry.st_mode):
+                        pending.append((remotePath, localPath))
+                    else:
+                        pairs.append((remotePath, localPath))
+        return self.downloadAll(pairs, resume, verify)
+
+    def uploadDir(self, localDir, remoteDir, resume=True, verify=True):
+        """
+        upload a directory tree, files in parallel.
+
+        Returns:
+            bool: True if all files were uploaded.
+        """
+        if not self.connect():
+            elog.error("Could not establish SSH connection")
+            return False
+
+        pairs = []
+        with self.client.open_sftp() as sftp:
+            for root, _, files in os.walk(localDir):
+                relative = os.path.relpath(root, localDir)
+                remote = remoteDir
+                if relative != os.curdir:
+                    remote = posixpath.join(remoteDir, *relative.split(os.sep))
+                try:
+                    sftp.mkdir(remote)
+                except IOError:
+                    pass  # already exists
+                for fname in files:
+                    pairs.append(
+                        (os.path.join(root, fname), posixpath.join(remote, fname))
+                    )
+        return self.uploadAll(pairs, resume, verify)
 
     def get(self, remotePath, localPath):
         """
@@ -194,27 +672,24 @@ class RemoteMachine:
         Examples:
             ::
 
-                remote = RemoteMachine(host, username, password)
+                remote = RemoteMachine(host, username, password=password)
                 assert remote.get('/tmp/download.txt', '/tmp')
         """
-        result_flag = True
         try:
-            if self.connect():
-                download = self.client.open_sftp()
-                download.get(remotePath, localPath)
-                download.close()
-                elog.info("[%s] download: success" % eutil.bcolor(self.host))
-                self.client.close()
-            else:
+            if not self.connect():
                 elog.error("Could not establish SSH connection")
-                result_flag = False
+                return False
+            with self.client.open_sftp() as sftp:
+                isDir = stat.S_ISDIR(sftp.stat(remotePath).st_mode)
         except Exception as e:
             elog.error("[%s] download: failed" % eutil.bcolor(e))
-            result_flag = False
-            download.close()
-            self.client.close()
+            return False
 
-        return result_flag
+        if isDir:
+            return self.downloadDir(remotePath, localPath)
+        if os.path.isdir(localPath):
+            localPath = os.path.join(localPath, posixpath.basename(remotePath))
+        return self.download(remotePath, localPath)
 
     def put(self, localPath, remotePath):
         """
@@ -230,29 +705,358 @@ class RemoteMachine:
         Examples:
             ::
 
-                remote = RemoteMachine(host, username, password)
-                assert remote.put('/tmp/upload.txt', '/tmp', mode=755)
+                remote = RemoteMachine(host, username, password=password)
+                assert remote.put('/tmp/upload.txt', '/tmp')
         """
-        result_flag = True
+        if os.path.isdir(localPath):
+            return self.uploadDir(localPath, remotePath)
+
         try:
-            if self.connect():
-                upload = self.client.open_sftp()
-                upload.put(localPath, remotePath)
-                upload.close()
-                elog.info("[%s] put: success" % eutil.bcolor(self.host))
-                self.client.close()
-            else:
-                print("Could not establish SSH connection")
-                result_flag = False
+            if not self.connect():
+                elog.error("Could not establish SSH connection")
+                return False
+            with self.client.open_sftp() as sftp:
+                isDir = stat.S_ISDIR(sftp.stat(remotePath).st_mode)
+        except IOError:
+            isDir = False
         except Exception as e:
             elog.error("[%s] put: failed" % eutil.bcolor(e))
-            result_flag = False
-            upload.close()
-            self.client.close()
+            return False
+
+        if isDir:
+            remotePath = posixpath.join(remotePath, os.path.basename(localPath))
+        return self.upload(localPath, remotePath)
+
+    def _openChannel(self, command):
+        if not self.connect():
+            elog.error("Could not establish SSH connection")
+            return None
+
+        channel = self.client.get_transport().open_session(timeout=self.timeout)
+        channel.exec_command(command)
+        channel.shutdown_write()
+        return channel
+
+    @staticmethod
+    def _drain(channel, start, timeoutInSecs):
+        # yields (isStderr, data) chunks until the command exits, reading both
+        # streams so a command blocked on a full stderr window cannot hang
+        while True:
+            idle = True
+            if channel.recv_ready():
+                yield False, channel.recv(32768)
+                idle = False
+            if channel.recv_stderr_ready():
+                yield True, channel.recv_stderr(32768)
+                idle = False
+            if idle and channel.exit_status_ready():
+                if not channel.recv_ready() and not channel.recv_stderr_ready():
+                    return
+            if timeoutInSecs and time.monotonic() - start > timeoutInSecs:
+                raise socket.timeout("timed out after %ss" % timeoutInSecs)
+            if idle:
+                time.sleep(0.05)
+
+    def _execute(self, command, timeoutInSecs):
+        start = time.monotonic()
+        stdout = []
+        stderr = []
+        exitStatus = None
+        channel = None
+        try:
+            channel = self._openChannel(command)
+            if channel is not None:
+                for isStderr, data in self._drain(channel, start, timeoutInSecs):
+                    (stderr if isStderr else stdout).append(data)
+                exitStatus = channel.recv_exit_status()
+        except socket.timeout as e:
+            elog.error("[%s] %s" % (eutil.bcolor(command), e))
+        except (EOFError, OSError, paramiko.SSHException) as e:
+            elog.error(
+                "Failed to execute the command: [%s] - %s" % (eutil.bcolor(command), e)
+            )
+        finally:
+            if channel is not None:
+                channel.close()
+
+        return CommandResult(
+            command,
+            exitStatus,
+            b"".join(stdout).decode("utf-8", "replace").strip(),
+            b"".join(stderr).decode("utf-8", "replace").strip(),
+            time.monotonic() - start,
+        )
+
+    def stream(self, command, timeoutInSecs=None, until=None):
+        """
+        Execute a command on the remote host and iterate over its stdout
+        lines while it runs, nothing but the current line is kept in memory.
+
+        Returns:
+            CommandStream: iterable over the decoded stdout lines, holding
+            exitStatus, the tail of stderr and whether it timed out once the
+            iteration is over.
+
+        Args:
+            command       (string)  : the command to execute
+
+            timeoutInSecs (int)     : stop and close the channel after this
+                                      long, None to wait forever.
+
+            until         (function): stop and close the channel after the
+                                      first line for which it returns True.
+
+        Examples:
+            ::
+
+                remote = RemoteMachine(host, username, password=password)
+                with remote.stream('iperf3 --server', until=lambda l:
+                                   'receiver' in l) as lines:
+                    for line in lines:
+                        elog.info(line)
+
+                stream = remote.stream('iperf3 -c server -t 600', 900)
+                for line in stream:
+                    pass
+                assert stream.exitStatus == 0
+        """
+        return CommandStream(self, command, timeoutInSecs, until)
+
+    def submit(self, command, timeoutInSecs=None):
+        """
+        Execute a command on its own channel of the pooled connection, without
+        waiting for it. Up to maxChannels commands run concurrently, further
+        ones queue.
+
+        Returns:
+            Future: resolves to a CommandResult with the exit status, stdout
+            and stderr of the command.
+
+        Args:
+            command       (string): the command to execute
+
+            timeoutInSecs (int)   : close the channel if the command has not
+                                    finished by then, None to wait forever.
+
+        Examples:
+            ::
+
+                remote = RemoteMachine(host, username, password=password)
+                server = remote.submit('iperf3 --server --one-off')
+                client = remote.submit('iperf3 -c localhost -t 10')
+                assert client.result().exitStatus == 0
+                assert server.result().exitStatus == 0
+        """
+        with self.executorLock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    max_workers=self.maxChannels,
+                    thread_name_prefix="ssh-%s" % self.host,
+                )
+        elog.info("Submitting command --> [%s]" % eutil.bcolor(command))
+        return self.executor.submit(self._execute, command, timeoutInSecs)
+
+    def runAll(self, commands, timeoutInSecs=None):
+        """
+        Execute several commands concurrently, one channel each.
+
+        Returns:
+            list: CommandResult of every command, in the order of commands.
 
-        return result_flag
+        Args:
+            commands      (list): the commands to execute
+
+            timeoutInSecs (int) : per command timeout, None to wait forever.
+        """
+        futures = [self.submit(command, timeoutInSecs) for command in commands]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """Close the pooled SSH connection to this host."""
+        with self.executorLock:
+            if self.executor is not None:
+                self.executor.shutdown(wait=False)
+                self.executor = None
+        sshPool.discard(self.getKey())
+        self.client = None
+
+
+class CommandStream:
+    """
+    CommandStream iterates over the stdout lines of a command while it runs,
+    see RemoteMachine.stream. Leaving the iteration early, or close(), closes
+    the channel of the command.
+    """
+
+    # bytes of stderr kept for error reporting
+    MAX_STDERR = 65536
+
+    def __init__(self, machine, command, timeoutInSecs=None, until=None):
+        self.machine = machine
+        self.command = command
+        self.timeoutInSecs = timeoutInSecs
+        self.until = until
+        self.channel = None
+        self.exitStatus = None
+        self.stderr = ""
+        self.timedOut = False
+        self.stoppedEarly = False
+
+    def __iter__(self):
+        start = time.monotonic()
+        stderr = b""
+        tail = -self.MAX_STDERR
+        pending = b""
+        try:
+            elog.info("Streaming command --> [%s]" % eutil.bcolor(self.command))
+            self.channel = self.machine._openChannel(self.command)
+            if self.channel is None:
+                return
+
+            drain = self.machine._drain(self.channel, start, self.timeoutInSecs)
+            for isStderr, data in drain:
+                if isStderr:
+                    stderr = (stderr + data)[tail:]
+                    continue
+
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    line = line.decode("utf-8", "replace").rstrip("\r")
+                    yield line
+                    if self.until and self.until(line):
+                        self.stoppedEarly = True
+                        return
+
+            if pending:
+                yield pending.decode("utf-8", "replace").rstrip("\r")
+            self.exitStatus = self.channel.recv_exit_status()
+        except socket.timeout as e:
+            self.timedOut = True
+            elog.error("[%s] %s" % (eutil.bcolor(self.command), e))
+        except (EOFError, OSError, paramiko.SSHException) as e:
+            elog.error(
+                "Failed to execute the command: [%s] - %s"
+                % (eutil.bcolor(self.command), e)
+            )
+        finally:
+            self.stderr = stderr.decode("utf-8", "replace").strip()
+            self.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """Close the channel, the command may no longer write output."""
+        if self.channel is not None:
+            self.channel.close()
+            self.channel = None
+
+
+class RemoteFleet:
+    """
+    RemoteFleet runs commands on many remote machines in parallel,
+    implements::
+
+        * iterRun - run commands, yield per-host results as they complete
+        * run     - run commands, wait for all hosts
+        * close   - close the connections to all hosts
+
+    Each host runs on a pooled connection of its own, a host which cannot be
+    reached or whose command fails only affects its own CommandResult.
+
+    Examples:
+        ::
+
+            fleet   = RemoteFleet([RemoteMachine(h, username, password=pwd)
+                                   for h in hosts])
+            results = fleet.run('ip route show | grep default')
+            failed  = [h for h, r in results.items() if r.exitStatus != 0]
+
+            # per-host commands, results stream in as hosts complete
+            for host, result in fleet.iterRun({h1: 'uptime', h2: 'df -h'}):
+                elog.info('%s took %.1fs' % (host, result.duration))
+    """
+
+    def __init__(self, machines, maxWorkers=16):
+        self.machines = {machine.host: machine for machine in machines}
+        self.maxWorkers = maxWorkers
+
+    def _execute(self, host, command, timeoutInSecs):
+        try:
+            return self.machines[host]._execute(command, timeoutInSecs)
+        except Exception as e:
+            elog.error("[%s] failed: %s" % (eutil.bcolor(host), eutil.rcolor(e)))
+            return CommandResult(command, None, "", "", 0.0)
+
+    def iterRun(self, commands, timeoutInSecs=None):
+        """
+        Execute commands on the fleet, at most maxWorkers hosts at a time.
+
+        Returns:
+            generator: (host, CommandResult) tuples, in order of completion.
+
+        Args:
+            commands      (string/dict): the command to execute on every
+                                         host, or a command per host.
+
+            timeoutInSecs (int)        : per host timeout, None to wait
+                                         forever.
+        """
+        if isinstance(commands, str):
+            commands = {host: commands for host in self.machines}
+
+        unknown = set(commands) - set(self.machines)
+        if unknown:
+            raise ValueError("hosts %s are not part of the fleet" % sorted(unknown))
+
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            futures = {
+                executor.submit(self._execute, host, command, timeoutInSecs): host
+                for host, command in commands.items()
+            }
+            for future in as_completed(futures):
+                host = futures[future]
+                result = future.result()
+                color = eutil.gcolor if result.exitStatus == 0 else eutil.rcolor
+                elog.info(
+                    "[%s] exit status %s in %.1fs"
+                    % (eutil.bcolor(host), color(result.exitStatus), result.duration)
+                )
+                yield host, result
+
+    def run(self, commands, timeoutInSecs=None):
+        """
+        Execute commands on the fleet and wait for all hosts.
+
+        Returns:
+            dict: CommandResult keyed by host.
+
+        Args:
+            commands      (string/dict): the command to execute on every
+                                         host, or a command per host.
+
+            timeoutInSecs (int)        : per host timeout, None to wait
+                                         forever.
+        """
+        start = time.monotonic()
+        results = dict(self.iterRun(commands, timeoutInSecs))
+        failed = sorted(h for h, r in results.items() if r.exitStatus != 0)
+        if failed:
+            elog.error(
+                "%s of %s hosts failed: %s"
+                % (len(failed), len(results), eutil.rcolor(", ".join(failed)))
+            )
+        elog.info(
+            "fleet run on %s hosts completed in %.1fs"
+            % (len(results), time.monotonic() - start)
+        )
+        return results
 
     def close(self):
-        """Close the SSH connection."""
-        if self.connect():
-            self.client.close()
+        """Close the connections to all hosts."""
+        for machine in self.machines.values():
+            machine.close()
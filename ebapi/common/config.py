@@ -83,6 +83,31 @@ class ConfigParser:
             )
         return value
 
+    def getOptionalConfig(self, config, default=None):
+        """
+        method to get an optional test configuration. unlike getConfig, a
+        missing section or parameter is not an error.
+
+        Returns:
+            string: value of config, or default if config is missing or not set.
+
+        Args:
+            config  (string): test configuraton parameter.
+
+            default (any)   : value to return when config is not available.
+
+        Examples:
+            ::
+
+                testConfig = ConfigParser('network')
+                testConfig.getOptionalConfig('supernet', '192.168.0.0/16')
+        """
+        self.parser.read(self.fname)
+        value = self.parser.get(self.section, config, fallback=None)
+        if not value:
+            return default
+        return value
+
     def setConfig(self, config, value=None):
         """
         method to set test configuration
@@ -0,0 +1,259 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+pytest plugin that schedules tests by their historical duration::
+
+    * records per-test and per-group (class or module) durations into a
+      local history file at the end of every run
+    * reorders collected tests longest group first, keeping every group
+      together since setup_class/module fixtures provision BUs and projects
+    * optionally shards the groups across CI machines by predicted time
+
+With pytest-xdist, run with --dist loadscope so that whole groups are handed
+to workers in the (longest-first) collection order.
+
+Examples:
+    ::
+
+        python3 -m pytest -n 4 --dist loadscope tests
+        python3 -m pytest --shards 3 --shard-id 0 tests
+"""
+
+import json
+import os
+import statistics
+
+import pytest
+
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+
+# duration assumed for tests that never ran before
+DEFAULT_DURATION = 60.0
+# weight of the latest run in the recorded moving average
+HISTORY_WEIGHT = 0.5
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("scheduler", "historical-duration-aware scheduling")
+    group.addoption(
+        "--durations-file",
+        action="store",
+        default=None,
+        help="test duration history file, default .durations.json in rootdir",
+    )
+    group.addoption(
+        "--no-duration-order",
+        action="store_true",
+        default=False,
+        help="keep collection order instead of longest group first",
+    )
+    group.addoption(
+        "--shards",
+        action="store",
+        type=int,
+        default=1,
+        help="number of CI machines the test groups are balanced across",
+    )
+    group.addoption(
+        "--shard-id",
+        action="store",
+        type=int,
+        default=0,
+        help="index of the shard run by this machine, 0 <= shard-id < shards",
+    )
+
+
+def getGroup(nodeid):
+    """
+    Returns:
+        string: class part of the test node ID, or the module for plain
+        test functions, e.g. tests/vm/test_crud.py::TestVMCRUD
+    """
+    parts = nodeid.split("::")
+    if len(parts) > 2:
+        return "::".join(parts[:2])
+    return parts[0]
+
+
+class DurationHistory:
+    """
+    DurationHistory loads, updates and saves recorded test durations.
+
+    Examples:
+        ::
+
+            history  = DurationHistory('.durations.json')
+            duration = history.predictGroup(group, nodeids)
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        self.tests = {}
+        self.groups = {}
+        if os.path.exists(fname):
+            try:
+                with open(fname, encoding="UTF-8") as f:
+                    content = json.load(f)
+                self.tests = content.get("tests", {})
+                self.groups = content.get("groups", {})
+            except ValueError:
+                elog.warning("ignoring corrupt history %s" % eutil.rcolor(fname))
+
+        durations = list(self.tests.values())
+        self.default = statistics.median(durations) if durations else DEFAULT_DURATION
+
+    def predictTest(self, nodeid):
+        return self.tests.get(nodeid, self.default)
+
+    def predictGroup(self, group, nodeids):
+        # class/module setup runs in the setup phase of a group's first test,
+        # so the recorded group duration, the sum of its tests in a run,
+        # includes it, prefer it as it averages whole runs of the group
+        if group in self.groups:
+            return self.groups[group]
+        return sum(self.predictTest(nodeid) for nodeid in nodeids)
+
+    @staticmethod
+    def _average(old, new):
+        if old is None:
+            return new
+        return HISTORY_WEIGHT * new + (1 - HISTORY_WEIGHT) * old
+
+    def update(self, durations):
+        """
+        merge durations of the latest run, keyed by test node ID.
+        """
+        groups = {}
+        for nodeid, duration in durations.items():
+            self.tests[nodeid] = self._average(self.tests.get(nodeid), duration)
+            group = getGroup(nodeid)
+            groups[group] = groups.get(group, 0.0) + duration
+
+        for group, duration in groups.items():
+            self.groups[group] = self._average(self.groups.get(group), duration)
+
+    def save(self):
+        tmpFile = self.fname + ".tmp"
+        with open(tmpFile, "w", encoding="UTF-8") as f:
+            json.dump(
+                {"tests": self.tests, "groups": self.groups},
+                f,
+                indent=4,
+                sort_keys=True,
+            )
+        os.replace(tmpFile, self.fname)
+
+
+def shardGroups(predicted, shards):
+    """
+    balance groups across shards, longest processing time first.
+
+    Returns:
+        list: one (load, [groups]) tuple per shard.
+
+    Args:
+        predicted (dict): predicted duration keyed by group.
+
+        shards    (int) : number of shards.
+    """
+    bins = [(0.0, []) for _ in range(shards)]
+    # sort on the group name as well so every machine computes the same plan
+    for group, duration in sorted(predicted.items(), key=lambda x: (-x[1], x[0])):
+        index = min(range(shards), key=lambda i: (bins[i][0], i))
+        load, groups = bins[index]
+        groups.append(group)
+        bins[index] = (load + duration, groups)
+    return bins
+
+
+class DurationScheduler:
+    def __init__(self, config):
+        self.config = config
+        fname = config.getoption("--durations-file")
+        if not fname:
+            fname = os.path.join(str(config.rootpath), ".durations.json")
+        self.history = DurationHistory(fname)
+        self.durations = {}
+        self.skipped = set()
+        self.predicted = {}
+        self.shardLoads = None
+
+    def pytest_collection_modifyitems(self, config, items):
+        shards = config.getoption("--shards")
+        shardID = config.getoption("--shard-id")
+        if shards < 1 or not 0 <= shardID < shards:
+            raise pytest.UsageError("--shard-id must be in [0, %s)" % shards)
+
+        groups = {}
+        for item in items:
+            groups.setdefault(getGroup(item.nodeid), []).append(item)
+
+        self.predicted = {
+            group: self.history.predictGroup(group, [i.nodeid for i in members])
+            for group, members in groups.items()
+        }
+
+        if shards > 1:
+            bins = shardGroups(self.predicted, shards)
+            self.shardLoads = [load for load, _ in bins]
+            selected = set(bins[shardID][1])
+            deselected = [i for i in items if getGroup(i.nodeid) not in selected]
+            if deselected:
+                config.hook.pytest_deselected(items=deselected)
+            groups = {g: m for g, m in groups.items() if g in selected}
+
+        order = list(groups)
+        if not config.getoption("--no-duration-order"):
+            order.sort(key=lambda group: -self.predicted[group])
+        items[:] = [item for group in order for item in groups[group]]
+
+    def pytest_report_collectionfinish(self, config):
+        if not self.predicted:
+            return None
+
+        lines = [
+            "predicted duration: %.0fs over %s groups"
+            % (sum(self.predicted.values()), len(self.predicted))
+        ]
+        if self.shardLoads:
+            lines.append(
+                "shard %s of %s, predicted shard loads: %s"
+                % (
+                    config.getoption("--shard-id"),
+                    len(self.shardLoads),
+                    ", ".join("%.0fs" % load for load in self.shardLoads),
+                )
+            )
+        return lines
+
+    def pytest_runtest_logreport(self, report):
+        # a skipped test says nothing about how long it really takes
+        if report.skipped:
+            self.skipped.add(report.nodeid)
+        # setup, call and teardown all count towards a test's duration
+        self.durations[report.nodeid] = (
+            self.durations.get(report.nodeid, 0.0) + report.duration
+        )
+
+    def pytest_sessionfinish(self, session):
+        # with xdist, reports are forwarded to the controller which is the
+        # only process writing the history
+        if hasattr(session.config, "workerinput") or not self.durations:
+            return
+
+        self.history.update(
+            {k: v for k, v in self.durations.items() if k not in self.skipped}
+        )
+        try:
+            self.history.save()
+        except OSError as e:
+            elog.error("failed to save test durations: %s" % eutil.rcolor(e))
+
+
+def pytest_configure(config):
+    config.pluginmanager.register(DurationScheduler(config), "durationscheduler")
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+
+
+class StateFile:
+    """
+    StateFile is a JSON document shared by concurrent test processes, every
+    update happens under an exclusive file lock.
+
+    Relative paths are kept next to test.conf.
+
+    Examples:
+        ::
+
+            stateFile = StateFile('.subnets.json')
+            with stateFile.locked() as state:
+                state['projects'] = {}
+    """
+
+    def __init__(self, fname):
+        confFile = ConfigParser().fname
+        if not os.path.isabs(fname) and confFile:
+            fname = os.path.join(os.path.dirname(confFile), fname)
+        self.fname = fname
+        self.lockFile = fname + ".lock"
+
+    def _read(self):
+        if not os.path.exists(self.fname):
+            return {}
+        with open(self.fname, encoding="UTF-8") as f:
+            try:
+                return json.load(f)
+            except ValueError:
+                elog.warning(
+                    "corrupt state file %s, starting afresh" % eutil.rcolor(self.fname)
+                )
+                return {}
+
+    @contextmanager
+    def locked(self):
+        """
+        hold the lock while the state is read, modified and written back,
+        this serialises updates across threads and processes.
+
+        Returns:
+            dict: the state, written back when the block exits.
+        """
+        with open(self.lockFile, "a", encoding="UTF-8") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                state = self._read()
+
+                yield state
+
+                tmpFile = self.fname + ".tmp"
+                with open(tmpFile, "w", encoding="UTF-8") as f:
+                    json.dump(state, f, indent=4, sort_keys=True)
+                os.replace(tmpFile, self.fname)
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    @staticmethod
+    def isProcessAlive(pid):
+        """
+        Returns:
+            bool: False if the process which wrote an entry has died.
+        """
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
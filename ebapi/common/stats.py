@@ -0,0 +1,140 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import json
+import os
+import time
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+
+
+def percentile(values, percent):
+    """
+    Returns:
+        float: the percent-th percentile of values, linearly interpolated
+        between the closest ranks. None if values is empty.
+
+    Args:
+        values  (list) : numbers in any order.
+        percent (float): 0 to 100.
+
+    Examples:
+        ::
+
+            p95 = stats.percentile(latencies, 95)
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * percent / 100.0
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+
+def summarize(values):
+    """
+    Returns:
+        dict: count, min, mean, p50, p95, p99 and max of values, None if
+        values is empty.
+
+    Examples:
+        ::
+
+            summary = stats.summarize([1.2, 0.8, 3.1])
+            elog.info('p95 = %.2fs' % summary['p95'])
+    """
+    if not values:
+        return None
+
+    return {
+        "count": len(values),
+        "min": min(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+# upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def histogram(values, bounds=LATENCY_BUCKETS):
+    """
+    Returns:
+        list: one {'le': bound, 'count': n} dict per bucket, counting the
+        values above the previous bound up to bound, followed by a bucket
+        with le None for the values above the last bound.
+
+    Examples:
+        ::
+
+            buckets = stats.histogram(latencies)
+    """
+    buckets = [{"le": bound, "count": 0} for bound in sorted(bounds)]
+    buckets.append({"le": None, "count": 0})
+    for value in values:
+        for bucket in buckets:
+            if bucket["le"] is None or value <= bucket["le"]:
+                bucket["count"] += 1
+                break
+    return buckets
+
+
+def getResultsDir():
+    """
+    Returns:
+        string: directory for benchmark results, resultsdir of the [perf]
+        section in test.conf, relative paths are kept next to test.conf.
+    """
+    resultsDir = ConfigParser("perf").getOptionalConfig("resultsdir", "perf-results")
+    confFile = ConfigParser().fname
+    if not os.path.isabs(resultsDir) and confFile:
+        resultsDir = os.path.join(os.path.dirname(confFile), resultsDir)
+    return resultsDir
+
+
+def saveResults(name, results):
+    """
+    write benchmark results as a timestamped JSON document.
+
+    Returns:
+        string: path of the written file, None on failure.
+
+    Args:
+        name    (string): benchmark name, used as file name prefix.
+        results (dict)  : JSON serialisable results.
+
+    Examples:
+        ::
+
+            stats.saveResults('iperf-qos', {'policies': measurements})
+    """
+    resultsDir = getResultsDir()
+    fname = os.path.join(
+        resultsDir, "%s-%s.json" % (name, time.strftime("%Y%m%d-%H%M%S"))
+    )
+    try:
+        os.makedirs(resultsDir, exist_ok=True)
+        with open(fname, "w", encoding="UTF-8") as f:
+            json.dump(
+                {"name": name, "time": time.time(), "results": results},
+                f,
+                indent=4,
+                sort_keys=True,
+            )
+    except OSError as e:
+        elog.error("failed to save %s results: %s" % (name, eutil.rcolor(e)))
+        return None
+
+    elog.info("%s results saved to %s" % (name, eutil.bcolor(fname)))
+    return fname
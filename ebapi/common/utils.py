@@ -6,6 +6,8 @@
 
 import random
 import string
+import threading
+import time
 
 
 def randomKey(length):
@@ -87,3 +89,63 @@ def bcolor(s):
     BLUE = "\033[0;34m"
     NC = "\033[0m"
     return BLUE + s + NC
+
+
+def waitUntil(condition, timeoutInSecs=150, sleepInSecs=5):
+    """
+    poll condition until it returns a truthy value or timeout expires.
+
+    Returns:
+        bool: True if condition was met, False on timeout.
+
+    Args:
+        condition(callable): function without arguments, polled until truthy.
+
+        timeoutInSecs(int): maximum time to wait, default 150 seconds.
+
+        sleepInSecs(int): time between two polls, default 5 seconds.
+
+    Examples:
+        ::
+
+            eutil.waitUntil(lambda: not vmObj.getVM(vmID), timeoutInSecs=60)
+    """
+    deadline = time.monotonic() + timeoutInSecs
+    while True:
+        if condition():
+            return True
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(min(sleepInSecs, max(deadline - time.monotonic(), 0)))
+
+
+class RateLimiter:
+    """
+    thread-safe rate limiter which spaces out calls to acquire so that at
+    most rate calls per second go through.
+
+    Args:
+        rate(float): allowed calls per second, None or 0 for no limit.
+
+    Examples:
+        ::
+
+            limiter = eutil.RateLimiter(2)
+            limiter.acquire()
+            client.delete(requestURL)
+    """
+
+    def __init__(self, rate=None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.nextSlot = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.nextSlot, now)
+            self.nextSlot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
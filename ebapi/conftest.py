@@ -12,7 +12,12 @@ from ebapi.common.logger import elog
 from ebapi.common import utils as eutil
 from ebapi.common.config import ConfigParser
 from ebapi.common.rest import RestClient
+from ebapi.lib.admission import AdmissionController
 from ebapi.lib.keystone import Token
+from ebapi.lib.sweeper import Sweeper
+
+
+pytest_plugins = ["ebapi.common.scheduler"]
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -37,6 +42,30 @@ def isDefaultTestConfigsSet():
         pytest.skip("default test configs not set")
 
 
+@pytest.fixture(autouse=True)
+def admission(request):
+    """
+    Admit a test marked with @pytest.mark.resources(...) only once its
+    project quota can cover the declared resources, queue it otherwise.
+    The project is the test class's projID, or projectID from test.conf.
+    """
+    marker = request.node.get_closest_marker("resources")
+    if marker is None:
+        yield None
+        return
+
+    projectID = getattr(request.cls, "projID", None)
+    if not projectID:
+        projectID = ConfigParser().getProjectID()
+
+    controller = AdmissionController(projectID)
+    if not controller.admit(request.node.nodeid, dict(marker.kwargs)):
+        pytest.fail("project quota cannot cover %s" % marker.kwargs)
+
+    yield controller
+    controller.release(request.node.nodeid)
+
+
 def getAcctAndClusterID():
     testConfig = ConfigParser()
     apiURL = testConfig.getConfig("apiURL")
@@ -187,6 +216,18 @@ def pytest_configure(config):
     elog.info("successfully read configuration")
 
 
+def pytest_sessionstart(session):
+    """Sweep resources leaked by aborted runs before any test starts"""
+    config = session.config
+    # with pytest-xdist, only the controller sweeps
+    if hasattr(config, "workerinput") or not config.getoption("--sweep"):
+        return
+
+    sweeper = Sweeper(minAgeInSecs=config.getoption("--sweep-min-age"))
+    if not sweeper.sweep(dryRun=config.getoption("--sweep-dry-run")):
+        elog.warning("some leaked resources could not be swept")
+
+
 def pytest_addoption(parser):
     """Creates new options to be passed as pytest cli command"""
     parser.addoption(
@@ -213,3 +254,22 @@ def pytest_addoption(parser):
         default=None,
         help="Cloud Admin password e.g. test123",
     )
+    parser.addoption(
+        "--sweep",
+        action="store_true",
+        default=False,
+        help="delete resources leaked by aborted runs before running tests",
+    )
+    parser.addoption(
+        "--sweep-min-age",
+        action="store",
+        type=int,
+        default=3600,
+        help="only sweep leaked resources older than this many seconds",
+    )
+    parser.addoption(
+        "--sweep-dry-run",
+        action="store_true",
+        default=False,
+        help="with --sweep, only log what would be deleted",
+    )
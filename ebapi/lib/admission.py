@@ -0,0 +1,207 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest library for quota-aware admission of concurrent tests"""
+
+import os
+import time
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.common.statefile import StateFile
+from ebapi.lib import cinder
+from ebapi.lib import neutron
+from ebapi.lib import nova
+
+
+def getProjectQuota(projectID):
+    """
+    Returns:
+        dict: compute, network and volume quota of the project merged into
+        one dict, see nova.Quotas.getComputeQuota. None on failure.
+    """
+    computeQuota = nova.Quotas(projectID).getComputeQuota()
+    networkQuota = neutron.Quotas(projectID).getNetworkQuota()
+    volumeQuota = cinder.Quotas(projectID).getVolumeQuota()
+    if computeQuota is None or networkQuota is None or volumeQuota is None:
+        return None
+
+    quota = dict(computeQuota)
+    quota.update(networkQuota)
+    quota.update(volumeQuota)
+    return quota
+
+
+class AdmissionController:
+    """
+    AdmissionController admits concurrent tests into a shared project only
+    while the project quota can cover the resources they declared, the other
+    tests queue, implements::
+
+        * admit   - block until the demand of a test fits into the quota
+        * release - give back the demand of a finished test
+
+    Reservations of all test processes are kept in a shared StateFile. The
+    headroom of a resource is its limit minus what the quota endpoints report
+    in use, minus the demand of admitted tests which has not shown up in use
+    yet. Every reservation records the usage at its admission, and the demand
+    then pending for the tests admitted before it, so growth of the usage is
+    only counted against a test once the tests ahead of it are covered, and
+    resources of admitted tests are not counted twice once they exist, nor
+    hidden by resources created outside the suite. Smaller tests may
+    overtake a queued test that does not fit yet, unless it has waited for
+    more than maxBypassInSecs already.
+
+    Examples:
+        ::
+
+            admission = AdmissionController(projectID)
+            assert admission.admit(testID, {'instances': 2, 'cores': 4})
+            try:
+                ...
+            finally:
+                admission.release(testID)
+    """
+
+    DEFAULT_STATEFILE = ".admission.json"
+
+    def __init__(self, projectID, pollInSecs=15, maxBypassInSecs=600, stateFile=None):
+        self.projectID = projectID
+        self.pollInSecs = pollInSecs
+        self.maxBypassInSecs = maxBypassInSecs
+        if stateFile is None:
+            stateFile = ConfigParser("admission").getOptionalConfig(
+                "statefile", self.DEFAULT_STATEFILE
+            )
+        self.stateFile = StateFile(stateFile)
+
+    @staticmethod
+    def _prune(entries):
+        for testID in list(entries):
+            if not StateFile.isProcessAlive(entries[testID]["pid"]):
+                elog.warning("dropping stale admission of %s" % eutil.rcolor(testID))
+                del entries[testID]
+
+    @staticmethod
+    def _getUsed(quota, resource):
+        return quota[resource]["in_use"] + quota[resource]["reserved"]
+
+    def _getPending(self, quota, reservations, resource):
+        # demand of admitted tests which does not show up as used yet
+        used = self._getUsed(quota, resource)
+        pending = 0
+        for reservation in reservations.values():
+            demand = reservation["demand"].get(resource, 0)
+            admittedAt = reservation.get("used", {}).get(resource)
+            if admittedAt is None:
+                pending += demand
+                continue
+            ahead = reservation["ahead"].get(resource, 0)
+            shown = max(used - admittedAt - ahead, 0)
+            pending += max(demand - shown, 0)
+        return pending
+
+    def _getHeadroom(self, quota, reservations, demand):
+        headroom = {}
+        for resource in demand:
+            if resource not in quota or quota[resource]["limit"] < 0:
+                continue
+            used = self._getUsed(quota, resource)
+            pending = self._getPending(quota, reservations, resource)
+            headroom[resource] = quota[resource]["limit"] - used - pending
+        return headroom
+
+    def _tryAdmit(self, testID, demand, quota):
+        now = time.time()
+        with self.stateFile.locked() as state:
+            project = state.setdefault(self.projectID, {})
+            reservations = project.setdefault("reservations", {})
+            waiting = project.setdefault("waiting", {})
+            self._prune(reservations)
+            self._prune(waiting)
+
+            waiting.setdefault(testID, {"pid": os.getpid(), "since": now})
+            mySince = waiting[testID]["since"]
+            # do not overtake a test which has been waiting for too long
+            for otherID, other in waiting.items():
+                if otherID == testID or other["since"] >= mySince:
+                    continue
+                if now - other["since"] > self.maxBypassInSecs:
+                    return False
+
+            headroom = self._getHeadroom(quota, reservations, demand)
+            for resource, available in headroom.items():
+                if demand[resource] > available:
+                    return False
+
+            del waiting[testID]
+            counted = [r for r in demand if r in quota]
+            reservations[testID] = {
+                "pid": os.getpid(),
+                "demand": demand,
+                "since": now,
+                "used": {r: self._getUsed(quota, r) for r in counted},
+                "ahead": {r: self._getPending(quota, reservations, r) for r in counted},
+            }
+        return True
+
+    def admit(self, testID, demand, timeoutInSecs=3600):
+        """
+        wait until the demand fits into the remaining project quota and
+        reserve it for the test.
+
+        Returns:
+            bool: True once admitted, False on timeout, failure to read the
+            quota, or if the demand exceeds the project quota altogether.
+
+        Args:
+            testID        (string): unique ID of the test, e.g. its node ID.
+
+            demand        (dict)  : resources needed by the test, keyed by
+                                    quota resource, e.g. {'instances': 2}.
+
+            timeoutInSecs (int)   : maximum time to queue.
+        """
+        quota = getProjectQuota(self.projectID)
+        if quota is None:
+            return False
+
+        for resource, needed in demand.items():
+            limit = quota.get(resource, {"limit": -1})["limit"]
+            if 0 <= limit < needed:
+                elog.error(
+                    "%s needs %s %s, project quota is %s"
+                    % (testID, eutil.rcolor(needed), resource, eutil.rcolor(limit))
+                )
+                return False
+
+        start = time.monotonic()
+        while not self._tryAdmit(testID, demand, quota):
+            if time.monotonic() - start > timeoutInSecs:
+                self.release(testID)
+                elog.error(
+                    "%s not admitted within %ss" % (eutil.rcolor(testID), timeoutInSecs)
+                )
+                return False
+
+            elog.info("%s queued, waiting for project quota" % eutil.bcolor(testID))
+            time.sleep(self.pollInSecs)
+            quota = getProjectQuota(self.projectID) or quota
+
+        elog.info(
+            "%s admitted after %.1fs" % (eutil.gcolor(testID), time.monotonic() - start)
+        )
+        return True
+
+    def release(self, testID):
+        """
+        give back the reservation (or queue entry) of a test.
+        """
+        with self.stateFile.locked() as state:
+            project = state.get(self.projectID, {})
+            project.get("reservations", {}).pop(testID, None)
+            project.get("waiting", {}).pop(testID, None)
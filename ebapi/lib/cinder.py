@@ -4,7 +4,12 @@
 # (c) 2022 Edgebricks Inc
 
 
-"""ebtest library with network utility functions"""
+"""ebtest library with block storage utility functions"""
+
+import json
+
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
 from ebapi.common.rest import RestClient
 from ebapi.lib.keystone import Token
 
@@ -16,6 +21,32 @@ class CinderBase(Token):
         self.projectID = projectID
         self.serviceURL = self.getServiceURL()
         self.cinderURL = self.serviceURL + "/cinder/v2/" + self.projectID
+        self.novaURL = self.serviceURL + "/nova/v2/" + self.projectID
+
+    def _waitForStatus(self, kind, getStatus, resourceID, status, timeoutInSecs):
+        elog.info(
+            "waiting for %s %s to be %s"
+            % (kind, eutil.bcolor(resourceID), eutil.bcolor(status))
+        )
+        current = {}
+
+        def isFinal():
+            current["status"] = getStatus(resourceID)
+            # error states are final as well, stop waiting
+            return current["status"] == status or "error" in str(current["status"])
+
+        if timeoutInSecs is None:
+            timeoutInSecs = 300  # 5mins
+
+        eutil.waitUntil(isFinal, timeoutInSecs, 2)
+        if current["status"] != status:
+            elog.error(
+                "%s [%s] is %s, not %s"
+                % (kind, eutil.rcolor(resourceID), current["status"], status)
+            )
+            return False
+
+        return True
 
 
 class Volumes(CinderBase):
@@ -26,6 +57,66 @@ class Volumes(CinderBase):
     def __init__(self, projectID):
         super().__init__(projectID)
         self.volumesURL = self.cinderURL + "/volumes"
+        self.serversURL = self.novaURL + "/servers"
+
+    def createVolume(
+        self,
+        volName,
+        sizeInGB=1,
+        volumeType=None,
+        imageID=None,
+        snapshotID=None,
+        sourceVolID=None,
+    ):
+        """
+        create a volume, empty or from an image, a snapshot or another volume.
+
+        Returns:
+            string: volume ID on success, None on failure.
+
+        Args:
+            volName     (string): name of the volume.
+
+            sizeInGB    (int)   : size, at least the size of the source.
+
+            volumeType  (string): e.g. relhighiops_type, cloud default if None.
+
+            imageID     (string): image to copy onto the volume.
+
+            snapshotID  (string): snapshot to create the volume from.
+
+            sourceVolID (string): volume to clone.
+
+        Examples:
+            ::
+
+                volumeObj = Volumes(projectID)
+                volumeID  = volumeObj.createVolume('vol1', 10, 'highiops_type')
+                assert volumeObj.waitForStatus(volumeID, 'available')
+        """
+        volume = {"name": volName, "size": sizeInGB}
+        if volumeType:
+            volume["volume_type"] = volumeType
+        if imageID:
+            volume["imageRef"] = imageID
+        if snapshotID:
+            volume["snapshot_id"] = snapshotID
+        if sourceVolID:
+            volume["source_volid"] = sourceVolID
+
+        response = self.client.post(self.volumesURL, {"volume": volume})
+        if not response.ok:
+            elog.error(
+                "creating volume %s: %s"
+                % (eutil.bcolor(volName), eutil.rcolor(response.status_code))
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        volumeID = content["volume"]["id"]
+        elog.info("created volume %s [%s]" % (volName, eutil.bcolor(volumeID)))
+        return volumeID
 
     def deleteVolume(self, volumeID):
         """
@@ -43,3 +134,343 @@ class Volumes(CinderBase):
         """
         requestURL = self.volumesURL + "/" + volumeID
         return self.client.delete(requestURL)
+
+    def getVolume(self, volumeID):
+        """
+        Returns:
+            `response content <https://goo.gl/NeMqL8>`_ of the volume details.
+
+        Args:
+            volumeID (string): volume ID.
+
+        Examples:
+            ::
+
+                volumeObj = Volumes(projectID)
+                response  = volumeObj.getVolume(volumeID)
+        """
+        requestURL = self.volumesURL + "/" + volumeID
+        return self.client.get(requestURL)
+
+    def getVolumeStatus(self, volumeID):
+        """
+        Returns:
+            string: volume status, e.g. available or in-use, None on failure.
+        """
+        response = self.getVolume(volumeID)
+        if not response.ok:
+            elog.error(
+                "fetching volume %s: %s"
+                % (eutil.bcolor(volumeID), eutil.rcolor(response.status_code))
+            )
+            return None
+
+        return json.loads(response.content)["volume"]["status"]
+
+    def listVolumes(self):
+        """
+        Returns:
+            list: details of the volumes of the project, None on failure.
+
+        Examples:
+            ::
+
+                volumeObj = Volumes(projectID)
+                for volume in volumeObj.listVolumes() or []:
+                    elog.info('%s is %s' % (volume['name'], volume['status']))
+        """
+        response = self.client.get(self.volumesURL + "/detail")
+        if not response.ok:
+            elog.error(
+                "failed to list volumes: %s" % eutil.rcolor(response.status_code)
+            )
+            elog.error(response.text)
+            return None
+
+        return json.loads(response.content)["volumes"]
+
+    def listVolumeTypes(self):
+        """
+        Returns:
+            list: names of the volume types, None on failure.
+        """
+        response = self.client.get(self.cinderURL + "/types")
+        if not response.ok:
+            elog.error(
+                "failed to list volume types: %s" % eutil.rcolor(response.status_code)
+            )
+            elog.error(response.text)
+            return None
+
+        return [
+            volType["name"] for volType in json.loads(response.content)["volume_types"]
+        ]
+
+    def waitForStatus(self, volumeID, status="available", timeoutInSecs=None):
+        """
+        Returns:
+            bool: True once the volume is in status, False on timeout or if
+            the volume went into an error state.
+
+        Args:
+            volumeID      (string): volume ID.
+
+            status        (string): e.g. available or in-use.
+
+            timeoutInSecs (int)   : maximum time to wait, default 5 minutes.
+        """
+        return self._waitForStatus(
+            "volume", self.getVolumeStatus, volumeID, status, timeoutInSecs
+        )
+
+    def attachVolume(self, vmID, volumeID):
+        """
+        attach a volume to a VM, the volume is in-use once attached.
+
+        Returns:
+            bool: True if the attach request was accepted.
+
+        Args:
+            vmID     (string): VM ID.
+
+            volumeID (string): ID of an available volume.
+
+        Examples:
+            ::
+
+                volumeObj = Volumes(projectID)
+                assert volumeObj.attachVolume(vmID, volumeID)
+                assert volumeObj.waitForStatus(volumeID, 'in-use')
+        """
+        requestURL = self.serversURL + "/" + vmID + "/os-volume_attachments"
+        payload = {"volumeAttachment": {"volumeId": volumeID}}
+        response = self.client.post(requestURL, payload)
+        if not response.ok:
+            elog.error(
+                "attaching volume %s to %s: %s"
+                % (
+                    eutil.bcolor(volumeID),
+                    eutil.bcolor(vmID),
+                    eutil.rcolor(response.status_code),
+                )
+            )
+            elog.error(response.text)
+            return False
+
+        return True
+
+    def detachVolume(self, vmID, volumeID):
+        """
+        detach a volume from a VM, the volume is available once detached.
+
+        Returns:
+            bool: True if the detach request was accepted.
+
+        Args:
+            vmID     (string): VM ID.
+
+            volumeID (string): ID of a volume attached to the VM.
+        """
+        requestURL = self.serversURL + "/" + vmID + "/os-volume_attachments/" + volumeID
+        response = self.client.delete(requestURL)
+        if not response.ok:
+            elog.error(
+                "detaching volume %s from %s: %s"
+                % (
+                    eutil.bcolor(volumeID),
+                    eutil.bcolor(vmID),
+                    eutil.rcolor(response.status_code),
+                )
+            )
+            elog.error(response.text)
+            return False
+
+        return True
+
+    def waitForDelete(self, volumeID, timeoutInSecs=None, sleepInSecs=None):
+        """
+        Returns:
+            bool: True once the volume is gone, False on timeout.
+
+        Args:
+            volumeID (string): volume ID.
+
+        Examples:
+            ::
+
+                volumeObj = Volumes(projectID)
+                volumeObj.deleteVolume(volumeID)
+                assert volumeObj.waitForDelete(volumeID)
+        """
+        elog.info("waiting for volume %s to be deleted" % eutil.bcolor(volumeID))
+
+        if timeoutInSecs is None:
+            timeoutInSecs = 150  # 2mins 30secs
+        if sleepInSecs is None:
+            sleepInSecs = 5  # 5secs
+
+        if not eutil.waitUntil(
+            lambda: self.getVolume(volumeID).status_code == 404,
+            timeoutInSecs,
+            sleepInSecs,
+        ):
+            elog.error("volume [%s] is not deleted" % eutil.rcolor(volumeID))
+            return False
+
+        elog.info("volume [%s] is deleted" % eutil.bcolor(volumeID))
+        return True
+
+
+class Snapshots(CinderBase):
+    """
+    class that implements CRUD operations for volume snapshots
+    """
+
+    def __init__(self, projectID):
+        super().__init__(projectID)
+        self.snapshotsURL = self.cinderURL + "/snapshots"
+
+    def createSnapshot(self, volumeID, snapName, force=True):
+        """
+        Returns:
+            string: snapshot ID on success, None on failure.
+
+        Args:
+            volumeID (string): volume to snapshot.
+
+            snapName (string): name of the snapshot.
+
+            force    (bool)  : snapshot the volume even if it is in-use.
+
+        Examples:
+            ::
+
+                snapObj = Snapshots(projectID)
+                snapID  = snapObj.createSnapshot(volumeID, 'snap1')
+                assert snapObj.waitForStatus(snapID, 'available')
+        """
+        payload = {
+            "snapshot": {"volume_id": volumeID, "name": snapName, "force": force}
+        }
+        response = self.client.post(self.snapshotsURL, payload)
+        if not response.ok:
+            elog.error(
+                "creating snapshot of volume %s: %s"
+                % (eutil.bcolor(volumeID), eutil.rcolor(response.status_code))
+            )
+            elog.error(response.text)
+            return None
+
+        snapID = json.loads(response.content)["snapshot"]["id"]
+        elog.info("created snapshot %s [%s]" % (snapName, eutil.bcolor(snapID)))
+        return snapID
+
+    def getSnapshot(self, snapID):
+        """
+        Returns:
+            response of the snapshot details.
+        """
+        return self.client.get(self.snapshotsURL + "/" + snapID)
+
+    def getSnapshotStatus(self, snapID):
+        """
+        Returns:
+            string: snapshot status, e.g. available, None on failure.
+        """
+        response = self.getSnapshot(snapID)
+        if not response.ok:
+            elog.error(
+                "fetching snapshot %s: %s"
+                % (eutil.bcolor(snapID), eutil.rcolor(response.status_code))
+            )
+            return None
+
+        return json.loads(response.content)["snapshot"]["status"]
+
+    def listSnapshots(self):
+        """
+        Returns:
+            list: details of the snapshots of the project, None on failure.
+        """
+        response = self.client.get(self.snapshotsURL + "/detail")
+        if not response.ok:
+            elog.error(
+                "failed to list snapshots: %s" % eutil.rcolor(response.status_code)
+            )
+            elog.error(response.text)
+            return None
+
+        return json.loads(response.content)["snapshots"]
+
+    def waitForStatus(self, snapID, status="available", timeoutInSecs=None):
+        """
+        Returns:
+            bool: True once the snapshot is in status, False on timeout or if
+            the snapshot went into an error state.
+        """
+        return self._waitForStatus(
+            "snapshot", self.getSnapshotStatus, snapID, status, timeoutInSecs
+        )
+
+    def deleteSnapshot(self, snapID):
+        """
+        Returns:
+            response after deleting the snapshot.
+        """
+        return self.client.delete(self.snapshotsURL + "/" + snapID)
+
+    def waitForDelete(self, snapID, timeoutInSecs=None):
+        """
+        Returns:
+            bool: True once the snapshot is gone, False on timeout.
+        """
+        if timeoutInSecs is None:
+            timeoutInSecs = 150  # 2mins 30secs
+
+        if not eutil.waitUntil(
+            lambda: self.getSnapshot(snapID).status_code == 404, timeoutInSecs, 5
+        ):
+            elog.error("snapshot [%s] is not deleted" % eutil.rcolor(snapID))
+            return False
+
+        elog.info("snapshot [%s] is deleted" % eutil.bcolor(snapID))
+        return True
+
+
+class Quotas(CinderBase):
+    def __init__(self, projectID):
+        super().__init__(projectID)
+        self.quotaURL = self.cinderURL + "/os-quota-sets/" + self.projectID
+
+    def getVolumeQuota(self):
+        """
+        Returns:
+            dict: limit, in_use and reserved count per block storage resource,
+            e.g. {'gigabytes': {'limit': 1000, 'in_use': 10, 'reserved': 0}}.
+            a limit of -1 means unlimited.
+
+        Examples:
+            ::
+
+                quotaObj = Quotas(projectID)
+                quota    = quotaObj.getVolumeQuota()
+        """
+        response = self.client.get(self.quotaURL + "?usage=true")
+        if not response.ok:
+            elog.error(
+                "fetching volume quota for project %s failed: %s"
+                % (eutil.bcolor(self.projectID), eutil.rcolor(response.status_code))
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        quota = {}
+        for resource, value in content["quota_set"].items():
+            if isinstance(value, dict):
+                quota[resource] = {
+                    "limit": value.get("limit", -1),
+                    "in_use": value.get("in_use", 0),
+                    "reserved": value.get("reserved", 0),
+                }
+        return quota
@@ -8,6 +8,7 @@ import json
 from time import sleep
 
 from ebapi.common import utils as eutil
+from ebapi.common.allocator import SubnetAllocator
 from ebapi.common.config import ConfigParser
 from ebapi.common.logger import elog
 from ebapi.common.rest import RestClient
@@ -160,6 +161,24 @@ class BUs(Token):
 
         return True
 
+    def list(self):
+        elog.info("fetching business units")
+
+        # send list request
+        response = self.client.get(self.buURL)
+        if not response.ok:
+            elog.error(
+                "failed to get business units :: %s"
+                % eutil.rcolor(response.status_code)
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        if isinstance(content, dict):
+            content = content.get("domains", [])
+        return content
+
     def get(self, buID: str = ""):
         elog.info("fetching business unit %s" % (eutil.bcolor(buID)))
 
@@ -374,6 +393,10 @@ class Projects(Token):
                         eutil.gcolor(state),
                     )
                 )
+                if state == self.PROJ_STATE_DELETED:
+                    # networks are gone with the project, so are their
+                    # subnets, not before
+                    SubnetAllocator().releaseProject(projID)
                 break
 
             # break after maximum allowed iterations and report failure
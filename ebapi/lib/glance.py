@@ -4,8 +4,10 @@
 # (c) 2022 Edgebricks Inc
 
 
-"""ebtest library with network utility functions"""
+"""ebtest library with image utility functions"""
+
 import json
+import time
 
 from ebapi.common import utils as eutil
 from ebapi.common.logger import elog
@@ -31,63 +33,195 @@ class Images(GlanceBase):
         super().__init__(projectID)
         self.imagesURL = self.glanceURL + "/images"
 
-    def createCirrosImageByURL(self, imageName="", netID=""):
+    CIRROS_URL = "http://download.cirros-cloud.net/0.5.2/cirros-0.5.2-x86_64-disk.img"
+
+    # glance task states after which the task does not change anymore
+    TASK_FINAL_STATES = ("success", "failure")
+
+    def createImageTask(
+        self, imageName, url, diskFormat="qcow2", netID="", properties=None
+    ):
         """
+        import an image from a URL through a glance task, see waitForTasks.
+
         Returns:
-            response imageID <https://goo.gl/NeMqL8>`_ after creating Image.
+            string: task ID, None on failure.
 
         Args:
-            imageName (string): Name of the image to be created.
-            domainID  (uuid)  : Domain ID.
+            imageName  (string): name of the image to be created.
+
+            url        (string): URL glance downloads the image from.
+
+            diskFormat (string): e.g. qcow2 or raw.
+
+            netID      (string): network the import runs on.
+
+            properties (dict)  : image properties to add or override, e.g.
+                                 os and version.
 
         Examples:
             ::
 
                 imageObj = Images(projectID)
-                response  = imageObj.createCirrosImageByURL(imageName, domainID)
+                taskID   = imageObj.createImageTask('img1', url, 'raw')
+                tasks    = imageObj.waitForTasks([taskID])
+                assert tasks[taskID]['status'] == 'success'
         """
-        requestURL = self.glanceURL + "/tasks"
+        imageProperties = {
+            "name": imageName,
+            "disk_format": diskFormat,
+            "min_ram": 2048,
+            "source": "url",
+            "category": "url",
+            "imageAccess": "currentProject",
+            "owner": self.projectID,
+            "created_version": "v2",
+            "hw_vif_multiqueue_enabled": "true",
+            "buAccess": "",
+            "visibility": "private",
+            "changeDefaultConfig": "true",
+            "min_disk": 1,
+            "volume-type": "relhighiops_type",
+            "import_from": url,
+            "container_format": "ovf",
+            "net_id": netID,
+        }
+        imageProperties.update(properties or {})
         payload = {
             "type": "import",
             "input": {
-                "import_from": "http://download.cirros-cloud.net/0.5.2/cirros-0.5.2-x86_64-disk.img",
-                "import_from_format": "qcow2",
-                "image_properties": {
-                    "name": imageName,
-                    "disk_format": "qcow2",
-                    "min_ram": 2048,
-                    "os": "Cirros",
-                    "version": "0.5.2",
-                    "source": "url",
-                    "category": "url",
-                    "imageAccess": "currentProject",
-                    "owner": self.projectID,
-                    "created_version": "v2",
-                    "hw_vif_multiqueue_enabled": "true",
-                    "buAccess": "",
-                    "visibility": "private",
-                    "changeDefaultConfig": "true",
-                    "min_disk": 1,
-                    "volume-type": "relhighiops_type",
-                    "import_from": "http://download.cirros-cloud.net/0.5.2/cirros-0.5.2-x86_64-disk.img",
-                    "container_format": "ovf",
-                    "net_id": netID,
-                },
+                "import_from": url,
+                "import_from_format": diskFormat,
+                "image_properties": imageProperties,
             },
         }
-        response = self.client.post(requestURL, payload)
+        response = self.client.post(self.glanceURL + "/tasks", payload)
         if not response.ok:
             elog.error(
                 "failed to create image: %s" % eutil.rcolor(response.status_code)
             )
             elog.error(response.text)
-            return False
+            return None
 
+        taskID = json.loads(response.content)["id"]
         elog.info(
-            "image %s created successfully: %s"
-            % (eutil.bcolor(imageName), eutil.bcolor(response.status_code))
+            "importing image %s, task %s: %s"
+            % (
+                eutil.bcolor(imageName),
+                eutil.bcolor(taskID),
+                eutil.bcolor(response.status_code),
+            )
         )
-        return True
+        return taskID
+
+    def createCirrosImageByURL(self, imageName="", netID=""):
+        """
+        Returns:
+            bool: True if the import of the cirros image was accepted, the
+            import itself runs on, see createImageTask.
+
+        Args:
+            imageName (string): Name of the image to be created.
+            netID     (string): network the import runs on.
+
+        Examples:
+            ::
+
+                imageObj = Images(projectID)
+                response  = imageObj.createCirrosImageByURL(imageName, netID)
+        """
+        properties = {"os": "Cirros", "version": "0.5.2"}
+        taskID = self.createImageTask(
+            imageName, self.CIRROS_URL, "qcow2", netID, properties
+        )
+        return taskID is not None
+
+    def getTask(self, taskID):
+        """
+        Returns:
+            dict: glance task with status, result and message, None on failure.
+        """
+        response = self.client.get(self.glanceURL + "/tasks/" + taskID)
+        if not response.ok:
+            elog.error(
+                "failed to get task %s: %s"
+                % (eutil.bcolor(taskID), eutil.rcolor(response.status_code))
+            )
+            return None
+
+        return json.loads(response.content)
+
+    def waitForTasks(
+        self, taskIDs, timeoutInSecs=1800, minSleepInSecs=1, maxSleepInSecs=10
+    ):
+        """
+        wait for glance tasks to succeed or fail. Only tasks still running are
+        polled, and the time between polls grows from minSleepInSecs up to
+        maxSleepInSecs while no task finishes, so long imports do not flood
+        glance with requests and short ones are seen done quickly.
+
+        Returns:
+            dict: per task ID the last task seen, with doneTime, the seconds
+            from the call until the task was seen in a final state, None for
+            tasks that did not finish in time or could not be fetched.
+
+        Args:
+            taskIDs        (list): IDs of tasks, see createImageTask.
+
+            timeoutInSecs  (int) : maximum time to wait for all tasks.
+
+            minSleepInSecs (int) : first and shortest time between polls.
+
+            maxSleepInSecs (int) : longest time between polls.
+
+        Examples:
+            ::
+
+                tasks = imageObj.waitForTasks(taskIDs)
+                done  = [t for t in tasks.values() if t['status'] == 'success']
+        """
+        start = time.monotonic()
+        tasks = {taskID: None for taskID in taskIDs}
+        pending = set(taskIDs)
+        sleepInSecs = minSleepInSecs
+        while pending:
+            finished = False
+            for taskID in sorted(pending):
+                task = self.getTask(taskID)
+                if task is None or task["status"] not in self.TASK_FINAL_STATES:
+                    continue
+                task["doneTime"] = time.monotonic() - start
+                tasks[taskID] = task
+                pending.discard(taskID)
+                finished = True
+
+            elapsed = time.monotonic() - start
+            if not pending or elapsed >= timeoutInSecs:
+                break
+            # poll again soon while tasks finish, back off while none does
+            sleepInSecs = (
+                minSleepInSecs if finished else min(2 * sleepInSecs, maxSleepInSecs)
+            )
+            time.sleep(min(sleepInSecs, timeoutInSecs - elapsed))
+
+        for taskID in pending:
+            elog.error("task %s did not finish" % eutil.rcolor(taskID))
+        return tasks
+
+    def getImage(self, imageID):
+        """
+        Returns:
+            dict: image details, e.g. status and size, None on failure.
+        """
+        response = self.client.get(self.imagesURL + "/" + imageID)
+        if not response.ok:
+            elog.error(
+                "failed to get image %s: %s"
+                % (eutil.bcolor(imageID), eutil.rcolor(response.status_code))
+            )
+            return None
+
+        return json.loads(response.content)
 
     def deleteImage(self, imageID):
         """
@@ -154,3 +288,26 @@ class Images(GlanceBase):
         requestURL = self.imagesURL + "?owner=%s" % owner + "&status=active"
         response = self.client.get(requestURL)
         return json.loads(response.content)
+
+    def getImageIDByOS(self, osName, visibility="public"):
+        """
+        Returns:
+            string: ID of an active image with the given os property, e.g.
+            'debian 10.0', None if there is none.
+
+        Args:
+            osName     (string): os property of the image, case insensitive.
+            visibility (string): visibility of the images to look at.
+
+        Examples:
+            ::
+
+                ImageObj = Images(projectID)
+                imageID  = ImageObj.getImageIDByOS('centos 7.0')
+        """
+        for image in self.getImagesbyVisibility(visibility).get("images", []):
+            if image.get("os", "").lower() == osName.lower():
+                return image["id"]
+
+        elog.error("no active %s image found" % eutil.rcolor(osName))
+        return None
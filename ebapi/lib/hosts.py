@@ -57,6 +57,22 @@ class Hosts(HostsBase):
         content = json.loads(response.content)
         return content["name"]
 
+    def getHostNames(self):
+        """
+        Returns:
+            dict: host names keyed by host ID, None on failure.
+        """
+        hosts = self.getHosts()
+        if hosts is None:
+            return None
+
+        hostNames = {}
+        for hostID in hosts:
+            hostName = self.getHostName(hostID)
+            if hostName:
+                hostNames[hostID] = hostName
+        return hostNames
+
     def getHostIPbyName(self, hostName):
         hosts = self.getHosts()
         hostID = None
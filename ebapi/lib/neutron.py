@@ -7,6 +7,7 @@
 import json
 
 from ebapi.common import utils as eutil
+from ebapi.common.allocator import SubnetAllocator
 from ebapi.common.logger import elog
 from ebapi.common.rest import RestClient
 from ebapi.lib.keystone import Token
@@ -29,6 +30,7 @@ class Networks(NeutronBase):
         self.projectID = projectID
         self.networksURL = self.neutronURL + "/networks"
         self.tenantURL = self.networksURL + "?tenant_id=" + self.projectID
+        self.subnetAllocator = SubnetAllocator()
 
     def getURL(self, filterStr):
         if not filterStr:
@@ -72,7 +74,43 @@ class Networks(NeutronBase):
 
         return self._getNetworks(response)
 
-    def createInternalNetwork(self, netName="", subnetName=""):
+    def createInternalNetwork(self, netName="", subnetName="", cidr=None):
+        """
+        create a private network with a single subnet. unless cidr is given,
+        the subnet is taken from the project's SubnetAllocator so networks of
+        concurrent tests never overlap.
+
+        Returns:
+            string: network ID on success, None on failure.
+
+        Args:
+            netName    (string): name of the network.
+
+            subnetName (string): name of the subnet.
+
+            cidr       (string): optional subnet, e.g. 192.168.150.0/24.
+
+        Examples:
+            ::
+
+                networkObj = Networks(projectID)
+                netID      = networkObj.createInternalNetwork('net1', 'subnet1')
+        """
+        allocated = False
+        if cidr is None:
+            cidr = self.subnetAllocator.allocate(self.projectID, subnetName)
+            if cidr is None:
+                # networks removed out of band may still hold subnets, unless
+                # the networks cannot be listed, which is not the same as none
+                networks = self.getInternalNetworks()
+                if networks is not None:
+                    self.subnetAllocator.reconcile(self.projectID, networks)
+                    cidr = self.subnetAllocator.allocate(self.projectID, subnetName)
+            if cidr is None:
+                return None
+            allocated = True
+
+        gatewayIP, poolStart, poolEnd = SubnetAllocator.getSubnetDetails(cidr)
         payload = {
             "admin_state_up": True,
             "name": netName,
@@ -80,12 +118,10 @@ class Networks(NeutronBase):
                 {
                     "name": subnetName,
                     "enable_dhcp": True,
-                    "gateway_ip": "192.168.150.1",
+                    "gateway_ip": gatewayIP,
                     "ip_version": 4,
-                    "cidr": "192.168.150.0/24",
-                    "allocation_pools": [
-                        {"start": "192.168.150.2", "end": "192.168.150.254"}
-                    ],
+                    "cidr": cidr,
+                    "allocation_pools": [{"start": poolStart, "end": poolEnd}],
                     "dns_nameservers": ["8.8.8.8"],
                     "tenant_id": self.projectID,
                 }
@@ -94,24 +130,41 @@ class Networks(NeutronBase):
             "visibility": "private",
             "project_id": self.projectID,
         }
-        elog.info("creating internal private network %s" % eutil.bcolor(netName))
+        elog.info(
+            "creating internal private network %s with subnet %s"
+            % (eutil.bcolor(netName), eutil.bcolor(cidr))
+        )
         response = self.client.post(self.clusterURL + "/networks", payload)
         if not response.ok:
             elog.error(
                 "failed to create network: %s" % eutil.rcolor(response.status_code)
             )
             elog.error(response.text)
+            if allocated:
+                self.subnetAllocator.release(self.projectID, cidr)
             return None
 
         content = json.loads(response.content)
         networkID = content["id"]
+        if allocated:
+            self.subnetAllocator.assign(self.projectID, cidr, networkID)
         elog.info(
             "network %s created successfully: %s"
             % (eutil.bcolor(netName), eutil.bcolor(networkID))
         )
         return networkID
 
-    def deleteInternalNetwork(self, networkID):
+    def deleteInternalNetwork(self, networkID, wait=False):
+        """
+        delete a network. its subnet stays allocated until the network is
+        seen gone, see waitForDelete, so it is not handed out again while
+        the network may still exist. subnets of deletions never confirmed
+        are freed by SubnetAllocator.reconcile.
+
+        Returns:
+            bool: True once the delete request is accepted, or, with wait,
+            once the network is gone.
+        """
         requestURL = self.clusterURL + "/networks/" + networkID
         response = self.client.deleteWithPayload(requestURL)
         if not response.ok:
@@ -126,12 +179,34 @@ class Networks(NeutronBase):
             "deleting network %s success: %s"
             % (eutil.bcolor(networkID), eutil.gcolor(response.status_code))
         )
+        if wait:
+            return self.waitForDelete(networkID)
         return True
 
     def getNetwork(self, networkID):
         requestURL = self.networksURL + "/" + networkID
         return self.client.get(requestURL)
 
+    def waitForDelete(self, networkID, timeoutInSecs=None, sleepInSecs=None):
+        elog.info("waiting for network %s to be deleted" % eutil.bcolor(networkID))
+
+        if timeoutInSecs is None:
+            timeoutInSecs = 60  # 1min
+        if sleepInSecs is None:
+            sleepInSecs = 2  # 2secs
+
+        if not eutil.waitUntil(
+            lambda: self.getNetwork(networkID).status_code == 404,
+            timeoutInSecs,
+            sleepInSecs,
+        ):
+            elog.error("network [%s] is not deleted" % eutil.rcolor(networkID))
+            return False
+
+        elog.info("network [%s] is deleted" % eutil.bcolor(networkID))
+        self.subnetAllocator.releaseNetwork(self.projectID, networkID)
+        return True
+
     def getNetworkByName(self, networkID):
         response = self.getNetwork(networkID)
         if not response.ok:
@@ -356,7 +431,21 @@ class QoS(NeutronBase):
         content = json.loads(response.content)
         return content["policy"]["id"]
 
-    def createBandwidthLimitRules(self, policyID, maxBurst, maxBandwidth):
+    def getPolicies(self):
+        response = self.client.get(self.policyURL)
+        if not response.ok:
+            elog.error(
+                "failed to get QoS policies: %s" % eutil.rcolor(response.status_code)
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        return content["policies"]
+
+    def createBandwidthLimitRules(
+        self, policyID, maxBurst, maxBandwidth, direction=None
+    ):
         requestURL = self.policyURL + "/" + policyID + "/bandwidth_limit_rules"
         payload = {
             "bandwidth_limit_rule": {
@@ -364,6 +453,9 @@ class QoS(NeutronBase):
                 "max_kbps": maxBandwidth,
             }
         }
+        # egress (leaving the VM) unless ingress is asked for
+        if direction:
+            payload["bandwidth_limit_rule"]["direction"] = direction
         response = self.client.post(requestURL, payload)
         if not response.ok:
             elog.error(
@@ -385,3 +477,42 @@ class QoS(NeutronBase):
             return False
 
         return True
+
+
+class Quotas(NeutronBase):
+    def __init__(self, projectID):
+        super().__init__()
+        self.projectID = projectID
+        self.quotaURL = self.neutronURL + "/quotas/" + self.projectID
+
+    def getNetworkQuota(self):
+        """
+        Returns:
+            dict: limit, in_use and reserved count per network resource, e.g.
+            {'floatingip': {'limit': 64, 'in_use': 1, 'reserved': 0}}. a
+            limit of -1 means unlimited.
+
+        Examples:
+            ::
+
+                quotaObj = Quotas(projectID)
+                quota    = quotaObj.getNetworkQuota()
+        """
+        response = self.client.get(self.quotaURL + "/details")
+        if not response.ok:
+            elog.error(
+                "fetching network quota for project %s failed: %s"
+                % (eutil.bcolor(self.projectID), eutil.rcolor(response.status_code))
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        quota = {}
+        for resource, value in content["quota"].items():
+            quota[resource] = {
+                "limit": value.get("limit", -1),
+                "in_use": value.get("used", 0),
+                "reserved": value.get("reserved", 0),
+            }
+        return quota
@@ -5,6 +5,8 @@
 
 
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from time import sleep
 
 from ebapi.common import utils as eutil
@@ -26,6 +28,8 @@ class NovaBase(Token):
 
 
 class VMs(NovaBase):
+    DEFAULT_VOLUME_TYPE = "relhighiops_type"
+
     def __init__(self, projectID):
         super().__init__(projectID)
         self.vmsURL = self.clusterURL + "/projects"
@@ -45,6 +49,17 @@ class VMs(NovaBase):
 
         return vms
 
+    def getVMIDByName(self, vmName):
+        vms = self.getAllVMs()
+        if vms is None:
+            return None
+
+        for vmID, name in vms.items():
+            if name == vmName:
+                return vmID
+
+        return None
+
     def getVM(self, vmID):
         requestURL = self.clusterURL + "/vms/" + vmID
         response = self.client.get(requestURL)
@@ -192,57 +207,78 @@ class VMs(NovaBase):
 
         return response["host"]
 
-    def createVM(self, vmName="", flavorID="", networkID="", imageID=""):
+    def _getBootVolume(self, vmName, imageID, snapshotID, volumeType, volumeSizeInGB):
+        volume = {
+            "availability_zone": None,
+            "description": None,
+            "size": volumeSizeInGB,
+            "name": "bootVolume-" + vmName,
+            "volume_type": volumeType,
+            "disk_bus": "virtio",
+            "device_type": "disk",
+            "device_name": "/dev/vda",
+            "bootable": True,
+            "tenant_id": self.projectID,
+            "enabled": "true",
+        }
+        if snapshotID:
+            volume["source_type"] = "snapshot"
+            volume["snapshot_id"] = snapshotID
+        else:
+            volume["source_type"] = "image"
+            volume["imageRef"] = imageID
+        return {"type": "OS::Cinder::Volume", "os_req": {"volume": volume}}
+
+    def _submitVM(
+        self,
+        vmName="",
+        flavorID="",
+        networkID="",
+        imageID="",
+        snapshotID=None,
+        volumeID=None,
+        volumeType=None,
+        volumeSizeInGB=1,
+    ):
         requestURL = self.vmsURL + "/" + self.projectID + "/vms"
-        payload = {
-            "name": vmName,
-            "resources": {
+        volumeType = volumeType or self.DEFAULT_VOLUME_TYPE
+        resources = {}
+        if volumeID:
+            # boot the volume as is, it stays with its owner after the VM
+            bootVolID = volumeID
+            deleteOnTermination = False
+        else:
+            bootVolID = "{{.bootVol}}"
+            deleteOnTermination = True
+            resources["bootVol"] = self._getBootVolume(
+                vmName, imageID, snapshotID, volumeType, volumeSizeInGB
+            )
+
+        resources["server"] = {
+            "type": "OS::Nova::Server",
+            "os_req": {
                 "server": {
-                    "type": "OS::Nova::Server",
-                    "os_req": {
-                        "server": {
-                            "name": vmName,
-                            "flavorRef": flavorID,
-                            "block_device_mapping_v2": [
-                                {
-                                    "device_type": "disk",
-                                    "disk_bus": "virtio",
-                                    "device_name": "/dev/vda",
-                                    "source_type": "volume",
-                                    "destination_type": "volume",
-                                    "delete_on_termination": True,
-                                    "boot_index": "0",
-                                    "uuid": "{{.bootVol}}",
-                                }
-                            ],
-                            "networks": [{"uuid": networkID}],
-                            "security_groups": [{"name": "default"}],
-                        },
-                        "os:scheduler_hints": {"volume_id": "{{.bootVol}}"},
-                    },
-                },
-                "bootVol": {
-                    "type": "OS::Cinder::Volume",
-                    "os_req": {
-                        "volume": {
-                            "availability_zone": None,
-                            "description": None,
-                            "size": 1,
-                            "name": "bootVolume-" + vmName,
-                            "volume_type": "relhighiops_type",
-                            "disk_bus": "virtio",
+                    "name": vmName,
+                    "flavorRef": flavorID,
+                    "block_device_mapping_v2": [
+                        {
                             "device_type": "disk",
-                            "source_type": "image",
+                            "disk_bus": "virtio",
                             "device_name": "/dev/vda",
-                            "bootable": True,
-                            "tenant_id": self.projectID,
-                            "imageRef": imageID,
-                            "enabled": "true",
+                            "source_type": "volume",
+                            "destination_type": "volume",
+                            "delete_on_termination": deleteOnTermination,
+                            "boot_index": "0",
+                            "uuid": bootVolID,
                         }
-                    },
+                    ],
+                    "networks": [{"uuid": networkID}],
+                    "security_groups": [{"name": "default"}],
                 },
+                "os:scheduler_hints": {"volume_id": bootVolID},
             },
         }
+        payload = {"name": vmName, "resources": resources}
         response = self.client.post(requestURL, payload)
         if not response.ok:
             elog.error(
@@ -256,6 +292,51 @@ class VMs(NovaBase):
             "creating vm %s: %s OK"
             % (eutil.bcolor(vmName), eutil.gcolor(response.status_code))
         )
+        return True
+
+    def createVM(self, vmName="", flavorID="", networkID="", imageID="", **bootSource):
+        """
+        create a VM booting from a volume and wait for the creation to finish.
+        The boot volume is created from imageID, or from a volume snapshot,
+        unless the VM boots an existing volume.
+
+        Returns:
+            bool: True once the VM is created.
+
+        Args:
+            vmName         (string): name of the VM.
+
+            flavorID       (string): flavor of the VM.
+
+            networkID      (string): network of the VM.
+
+            imageID        (string): image copied onto the boot volume.
+
+            bootSource     (dict)  : optional keyword arguments::
+
+                snapshotID     - volume snapshot to create the boot volume
+                                 from, instead of imageID
+                volumeID       - existing bootable volume to boot, e.g. a
+                                 clone, not deleted along with the VM
+                volumeType     - type of the created boot volume, default
+                                 VMs.DEFAULT_VOLUME_TYPE
+                volumeSizeInGB - size of the created boot volume, default 1,
+                                 at least the size of the snapshot
+
+        Examples:
+            ::
+
+                vmObj = VMs(projectID)
+                assert vmObj.createVM('vm1', flavorID, netID, imageID)
+
+                # boot from a snapshot onto a 10 GB highcap volume
+                assert vmObj.createVM('vm2', flavorID, netID,
+                                      snapshotID=snapID,
+                                      volumeType='highcap_type',
+                                      volumeSizeInGB=10)
+        """
+        if not self._submitVM(vmName, flavorID, networkID, imageID, **bootSource):
+            return False
 
         timeoutInSecs = 150  # 2mins 30secs
         sleepInSecs = 15  # 15secs
@@ -277,6 +358,170 @@ class VMs(NovaBase):
             curIteration = curIteration + 1
         return True
 
+    def _checkQuota(self, specs):
+        flavorObj = Flavors(self.projectID)
+        required = {"instances": len(specs), "cores": 0, "ram": 0}
+        flavors = {}
+        for spec in specs:
+            flavorID = spec["flavorID"]
+            if flavorID not in flavors:
+                flavors[flavorID] = flavorObj.getFlavor(flavorID)
+            if flavors[flavorID] is None:
+                return False
+            required["cores"] += flavors[flavorID]["vcpus"]
+            required["ram"] += flavors[flavorID]["ram"]
+
+        quota = Quotas(self.projectID).getComputeQuota()
+        if quota is None:
+            return False
+
+        for resource, needed in required.items():
+            limit = quota[resource]["limit"]
+            if limit < 0:
+                continue
+            available = limit - quota[resource]["in_use"] - quota[resource]["reserved"]
+            if needed > available:
+                elog.error(
+                    "creating %s VMs needs %s %s, only %s available in project %s"
+                    % (
+                        len(specs),
+                        eutil.rcolor(needed),
+                        resource,
+                        eutil.rcolor(available),
+                        eutil.bcolor(self.projectID),
+                    )
+                )
+                return False
+
+        return True
+
+    def _createOneOfVMs(self, spec, timeoutInSecs, pollInSecs, onDone):
+        handle = {"name": spec["vmName"], "id": None, "ok": False}
+        try:
+            self._waitForOneOfVMs(handle, spec, timeoutInSecs, pollInSecs)
+        except Exception as e:
+            # keep what is known, e.g. the ID, so the VM can be torn down
+            handle["ok"] = False
+            elog.error(
+                "creating VM %s failed: %s"
+                % (eutil.bcolor(handle["name"]), eutil.rcolor(e))
+            )
+        if onDone is not None:
+            onDone(handle)
+        return handle
+
+    def _waitForOneOfVMs(self, handle, spec, timeoutInSecs, pollInSecs):
+        vmName = spec["vmName"]
+        start = time.monotonic()
+        if not self._submitVM(**spec):
+            return handle
+        handle["acceptTime"] = time.monotonic() - start
+
+        def lookupID():
+            handle["id"] = self.getVMIDByName(vmName)
+            return handle["id"]
+
+        # the server shows up once the create request has been processed
+        if not eutil.waitUntil(lookupID, timeoutInSecs, pollInSecs):
+            elog.error("VM %s did not show up" % eutil.rcolor(vmName))
+            return handle
+
+        handle["ok"] = bool(
+            self.waitForState(
+                handle["id"],
+                "ACTIVE",
+                timeoutInSecs=timeoutInSecs,
+                sleepInSecs=pollInSecs,
+            )
+        )
+        handle["activeTime"] = time.monotonic() - start
+        return handle
+
+    def createVMs(
+        self, specs, maxInFlight=8, timeoutInSecs=600, pollInSecs=1, onDone=None
+    ):
+        """
+        create VMs concurrently, with at most maxInFlight VMs being created at
+        a time. the project compute quota (instances, cores, ram) must cover
+        all VMs, otherwise no VM is created.
+
+        Returns:
+            tuple: a list with one handle dict per spec, having name, id, ok,
+            acceptTime and activeTime keys, and a dict with aggregate timing.
+            None, None if the project quota is exceeded.
+
+        Args:
+            specs         (list)    : createVM keyword arguments per VM,
+                                      i.e. vmName, flavorID, networkID and
+                                      imageID, and optionally the boot
+                                      source options.
+
+            maxInFlight   (int)     : maximum number of concurrent creates.
+
+            timeoutInSecs (int)     : per VM timeout to become ACTIVE.
+
+            pollInSecs    (int)     : time between two polls of a VM, which
+                                      is the resolution of activeTime.
+
+            onDone        (callable): called with the handle of every VM as
+                                      soon as it is ACTIVE or failed, from
+                                      the thread creating it, e.g. to start
+                                      using it before the others are done.
+
+        Examples:
+            ::
+
+                vmObj  = VMs(projectID)
+                specs  = [
+                    {
+                        'vmName': 'ebtestVM%s' % i,
+                        'flavorID': flavorID,
+                        'networkID': netID,
+                        'imageID': imageID,
+                    }
+                    for i in range(20)
+                ]
+                handles, timing = vmObj.createVMs(specs, maxInFlight=10)
+                assert timing['failed'] == 0
+        """
+        if not self._checkQuota(specs):
+            return None, None
+
+        elog.info(
+            "creating %s VMs, %s at a time"
+            % (eutil.bcolor(len(specs)), eutil.bcolor(maxInFlight))
+        )
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=maxInFlight) as executor:
+            handles = list(
+                executor.map(
+                    lambda spec: self._createOneOfVMs(
+                        spec, timeoutInSecs, pollInSecs, onDone
+                    ),
+                    specs,
+                )
+            )
+
+        activeTimes = [h["activeTime"] for h in handles if h["ok"]]
+        timing = {
+            "count": len(handles),
+            "failed": len([h for h in handles if not h["ok"]]),
+            "totalTime": time.monotonic() - start,
+            "meanActiveTime": (
+                sum(activeTimes) / len(activeTimes) if activeTimes else None
+            ),
+            "maxActiveTime": max(activeTimes) if activeTimes else None,
+        }
+        elog.info(
+            "created %s of %s VMs in %.1fs"
+            % (
+                eutil.gcolor(timing["count"] - timing["failed"]),
+                timing["count"],
+                timing["totalTime"],
+            )
+        )
+        return handles, timing
+
     def deleteVM(self, vmID):
         requestURL = self.vmsURL + "/" + self.projectID + "/vms/" + vmID
         response = self.client.delete(requestURL)
@@ -477,6 +722,20 @@ class Flavors(NovaBase):
         requestURL = self.flavorsURL + "/detail"
         return self.client.get(requestURL)
 
+    def getFlavor(self, flavorID):
+        requestURL = self.flavorsURL + "/" + flavorID
+        response = self.client.get(requestURL)
+        if not response.ok:
+            elog.error(
+                "fetching flavor %s failed: %s"
+                % (eutil.bcolor(flavorID), eutil.rcolor(response.status_code))
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        return content["flavor"]
+
     def getBestMatchingFlavor(self, numCPU, memMB):
         elog.debug(
             "fetching best matching flavor having cpu=%s, ram=%s" % (numCPU, memMB)
@@ -517,3 +776,42 @@ class Flavors(NovaBase):
         if bestMatchFlavor:
             return flavorID
         return None
+
+
+class Quotas(NovaBase):
+    def __init__(self, projectID):
+        super().__init__(projectID)
+        self.quotaURL = self.novaURL + "/os-quota-sets/" + self.projectID
+
+    def getComputeQuota(self):
+        """
+        Returns:
+            dict: limit, in_use and reserved count per compute resource, e.g.
+            {'cores': {'limit': 128, 'in_use': 4, 'reserved': 0}}. a limit of
+            -1 means unlimited.
+
+        Examples:
+            ::
+
+                quotaObj = Quotas(projectID)
+                quota    = quotaObj.getComputeQuota()
+        """
+        response = self.client.get(self.quotaURL + "/detail")
+        if not response.ok:
+            elog.error(
+                "fetching compute quota for project %s failed: %s"
+                % (eutil.bcolor(self.projectID), eutil.rcolor(response.status_code))
+            )
+            elog.error(response.text)
+            return None
+
+        content = json.loads(response.content)
+        quota = {}
+        for resource, value in content["quota_set"].items():
+            if isinstance(value, dict):
+                quota[resource] = {
+                    "limit": value.get("limit", -1),
+                    "in_use": value.get("in_use", 0),
+                    "reserved": value.get("reserved", 0),
+                }
+        return quota
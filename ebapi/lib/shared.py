@@ -0,0 +1,187 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest library for a BU and project shared by concurrent tests"""
+
+import os
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.common.statefile import StateFile
+from ebapi.lib.edgebricks import BUs, Projects
+from ebapi.lib.tracker import ResourceTracker
+
+
+class SharedProject:
+    """
+    SharedProject hands one BU and project to any number of test classes,
+    across test processes, instead of every class provisioning its own,
+    implements::
+
+        * acquire - join, the first user creates the BU and project
+        * release - leave, the last user deletes the BU and project
+
+    Users are counted per process in a shared StateFile, so pytest-xdist
+    workers reuse the BU and project while any of them still needs it, and
+    users of crashed processes are dropped. The BU, project and project
+    admin are named ebtestShared<name>..., so they do not clash with the
+    [defaults] BU and project of tests running alongside, and the sweeper
+    deletes them if a run leaves them behind. The password of the project
+    admin comes from the [defaults] section of test.conf.
+
+    Examples:
+        ::
+
+            sharedProject = SharedProject('vmactions')
+            buID, projID  = sharedProject.acquire()
+            assert projID
+            try:
+                ...
+            finally:
+                assert sharedProject.release()
+    """
+
+    DEFAULT_STATEFILE = ".shared.json"
+
+    COMPUTE_QUOTA = {
+        "cores": 128,
+        "injected_file_content_bytes": -1,
+        "injected_file_path_bytes": -1,
+        "injected_files": -1,
+        "instances": 64,
+        "key_pairs": -1,
+        "metadata_items": -1,
+        "ram": 262144,
+    }
+    STORAGE_QUOTA = {
+        "snapshots": 640,
+        "backup_gigabytes": -1,
+        "backups": -1,
+        "volumes": 640,
+        "gigabytes": 25600,
+    }
+    NETWORK_QUOTA = {
+        "router": 30,
+        "subnet": -1,
+        "network": 30,
+        "port": -1,
+        "floatingip": 64,
+        "pool": -1,
+    }
+
+    def __init__(self, name, stateFile=None):
+        self.name = name
+        self.domainName = "ebtestShared%sBU" % name
+        self.userName = "ebtestShared%sAdmin" % name
+        self.userPwd = ConfigParser().getProjectAdminPassword()
+        self.projectName = "ebtestShared%sProject" % name
+        if stateFile is None:
+            stateFile = ConfigParser("shared").getOptionalConfig(
+                "statefile", self.DEFAULT_STATEFILE
+            )
+        self.stateFile = StateFile(stateFile)
+        self.buObj = BUs()
+
+    def _getProjects(self):
+        return Projects(self.domainName, self.userName, self.userPwd)
+
+    def _isCreated(self, buID):
+        buRsp = self.buObj.get(buID)
+        return buRsp is not None and buRsp["domain_state"] == BUs.BU_STATE_CREATED
+
+    def _create(self):
+        tracker = ResourceTracker()
+        buID = self.buObj.create(
+            buName=self.domainName, userName=self.userName, userPwd=self.userPwd
+        )
+        if not buID:
+            return None, None
+        buKey = tracker.add(ResourceTracker.BU, buID, self.buObj)
+
+        if not self.buObj.waitForState(buID, state=BUs.BU_STATE_CREATED):
+            tracker.teardown()
+            return None, None
+
+        projObj = self._getProjects()
+        metadata = {"templateId": "Large", "custom_template": "true"}
+        projID = projObj.create(
+            self.projectName,
+            buID,
+            metadata,
+            self.COMPUTE_QUOTA,
+            self.STORAGE_QUOTA,
+            self.NETWORK_QUOTA,
+        )
+        if projID:
+            tracker.add(ResourceTracker.PROJECT, projID, projObj, [buKey])
+        if not projID or not projObj.waitForState(
+            projID, state=Projects.PROJ_STATE_CREATED
+        ):
+            tracker.teardown()
+            return None, None
+
+        elog.info(
+            "created shared project %s for %s"
+            % (eutil.bcolor(projID), eutil.bcolor(self.name))
+        )
+        return buID, projID
+
+    def _delete(self, buID, projID):
+        tracker = ResourceTracker()
+        buKey = tracker.add(ResourceTracker.BU, buID, self.buObj)
+        tracker.add(ResourceTracker.PROJECT, projID, self._getProjects(), [buKey])
+        return tracker.teardown()
+
+    def acquire(self):
+        """
+        join the shared BU and project, creating them if this is the first
+        user. Other processes wait while they are being created.
+
+        Returns:
+            tuple: BU ID and project ID, None, None on failure.
+        """
+        pid = str(os.getpid())
+        with self.stateFile.locked() as state:
+            entry = state.get(self.name)
+            # left behind by an aborted run, reuse it unless it was swept
+            if entry and not self._isCreated(entry["buID"]):
+                elog.warning("shared BU %s is gone" % eutil.rcolor(entry["buID"]))
+                entry = None
+
+            if entry is None:
+                buID, projID = self._create()
+                if not projID:
+                    return None, None
+                entry = {"buID": buID, "projID": projID, "users": {}}
+                state[self.name] = entry
+
+            entry["users"][pid] = entry["users"].get(pid, 0) + 1
+            return entry["buID"], entry["projID"]
+
+    def release(self):
+        """
+        leave the shared BU and project, the last user deletes them.
+
+        Returns:
+            bool: False if deleting the BU or project failed.
+        """
+        pid = str(os.getpid())
+        with self.stateFile.locked() as state:
+            entry = state.get(self.name)
+            if entry is None:
+                return True
+
+            users = entry["users"]
+            users[pid] = users.get(pid, 1) - 1
+            for user in list(users):
+                if users[user] <= 0 or not StateFile.isProcessAlive(int(user)):
+                    del users[user]
+            if users:
+                return True
+
+            del state[self.name]
+            return self._delete(entry["buID"], entry["projID"])
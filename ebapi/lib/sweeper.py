@@ -0,0 +1,255 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest library for sweeping resources leaked by aborted test runs.
+
+Examples:
+    ::
+
+        python3 -m ebapi.lib.sweeper --dry-run
+        python3 -m ebapi.lib.sweeper --min-age 7200 --workers 8 --rate 2
+"""
+
+import argparse
+import fnmatch
+import json
+import time
+from datetime import datetime, timezone
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.cinder import Snapshots, Volumes
+from ebapi.lib.edgebricks import BUs, Projects
+from ebapi.lib.glance import Images
+from ebapi.lib.neutron import Networks, QoS
+from ebapi.lib.nova import VMs
+from ebapi.lib.tracker import ResourceTracker
+
+
+def getAge(resource):
+    """
+    Returns:
+        float: age of an API resource in seconds, None if it has no creation
+        timestamp.
+    """
+    for field in ("created_at", "created", "create_time", "creation_time"):
+        value = resource.get(field)
+        if not value:
+            continue
+        try:
+            created = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - created).total_seconds()
+    return None
+
+
+class Sweeper:
+    """
+    Sweeper finds resources left behind by aborted test runs by their naming
+    convention and age, and deletes them, implements::
+
+        * find  - build the deletion plan as a ResourceTracker
+        * sweep - delete what find returned, in parallel and rate limited
+
+    The BU and project configured in test.conf are never deleted, only the
+    leftovers inside them.
+
+    Examples:
+        ::
+
+            sweeper = Sweeper(minAgeInSecs=3600)
+            assert sweeper.sweep(dryRun=True)
+    """
+
+    BU_PATTERNS = ["ebtest*"]
+    PROJECT_PATTERNS = ["ebtest*"]
+    NETWORK_PATTERNS = ["Auto-Net*"]
+    VM_PATTERNS = ["ebtest*", "AutoVM*"]
+    VOLUME_PATTERNS = ["ebtest*"]
+    IMAGE_PATTERNS = ["ebtest*"]
+    QOS_PATTERNS = ["*kbps-limit"]
+
+    def __init__(self, minAgeInSecs=3600, maxWorkers=8, maxRate=2.0, undated=False):
+        self.minAgeInSecs = minAgeInSecs
+        self.maxWorkers = maxWorkers
+        self.maxRate = maxRate
+        # also sweep resources which carry no creation timestamp
+        self.undated = undated
+        self.testConfig = ConfigParser()
+        self.domainID = self.testConfig.getDomainID()
+        self.projectID = self.testConfig.getProjectID()
+
+    @staticmethod
+    def _matches(name, patterns):
+        return any(fnmatch.fnmatchcase(name or "", pattern) for pattern in patterns)
+
+    def _isCandidate(self, resource, patterns):
+        if not self._matches(resource.get("name"), patterns):
+            return False
+
+        age = getAge(resource)
+        if age is None:
+            return self.undated
+        return age >= self.minAgeInSecs
+
+    def _findProjects(self, tracker, buKey, bu, leakedOnly=False):
+        # force deleting a leaked BU removes its projects as well, listing them
+        # only makes the deletion order explicit, so failures are not fatal
+        try:
+            projObj = Projects(
+                bu["name"],
+                self.testConfig.getProjectAdmin(),
+                self.testConfig.getProjectAdminPassword(),
+            )
+            content = projObj.list(bu["id"])
+        except Exception as e:
+            elog.warning(
+                "skipping projects of business unit %s: %s"
+                % (eutil.bcolor(bu["name"]), e)
+            )
+            return
+
+        for project in (content or {}).get("projects", []):
+            if project["id"] == self.projectID:
+                continue
+            if leakedOnly and not self._isCandidate(project, self.PROJECT_PATTERNS):
+                continue
+            tracker.add(ResourceTracker.PROJECT, project["id"], projObj, [buKey])
+
+    def _findBUs(self, tracker):
+        buObj = BUs()
+        for bu in buObj.list() or []:
+            if bu["id"] == self.domainID:
+                # keep the configured BU, sweep only leaked projects in it
+                self._findProjects(tracker, None, bu, leakedOnly=True)
+            elif self._isCandidate(bu, self.BU_PATTERNS):
+                buKey = tracker.add(ResourceTracker.BU, bu["id"], buObj)
+                self._findProjects(tracker, buKey, bu)
+
+    def _findProjectResources(self, tracker):
+        if not self.projectID:
+            return
+
+        networkObj = Networks(self.projectID)
+        response = networkObj.getNetworksByFilter("router:external=False")
+        netKeys = []
+        if response is not None and response.ok:
+            for network in json.loads(response.content)["networks"]:
+                if self._isCandidate(network, self.NETWORK_PATTERNS):
+                    netKeys.append(
+                        tracker.add(ResourceTracker.NETWORK, network["id"], networkObj)
+                    )
+
+        # snapshots go before their volumes, volumes after the VMs they may
+        # still be attached to
+        volumeObj = Volumes(self.projectID)
+        volKeys = []
+        for volume in volumeObj.listVolumes() or []:
+            if self._isCandidate(volume, self.VOLUME_PATTERNS):
+                volKeys.append(
+                    tracker.add(ResourceTracker.VOLUME, volume["id"], volumeObj)
+                )
+
+        snapObj = Snapshots(self.projectID)
+        for snapshot in snapObj.listSnapshots() or []:
+            if self._isCandidate(snapshot, self.VOLUME_PATTERNS):
+                volKey = (ResourceTracker.VOLUME, snapshot["volume_id"])
+                tracker.add(ResourceTracker.SNAPSHOT, snapshot["id"], snapObj, [volKey])
+
+        imageObj = Images(self.projectID)
+        for image in imageObj.getImagesbyOwner(self.projectID).get("images", []):
+            if self._isCandidate(image, self.IMAGE_PATTERNS):
+                tracker.add(ResourceTracker.IMAGE, image["id"], imageObj)
+
+        # without port details, conservatively delete leaked VMs before any
+        # leaked network and volume of the project
+        vmObj = VMs(self.projectID)
+        for vmID, vmName in (vmObj.getAllVMs() or {}).items():
+            if not self._matches(vmName, self.VM_PATTERNS):
+                continue
+            vm = vmObj.getVM(vmID)
+            if vm and self._isCandidate(vm, self.VM_PATTERNS):
+                tracker.add(ResourceTracker.VM, vmID, vmObj, netKeys + volKeys)
+
+    def _findQoSPolicies(self, tracker):
+        qosObj = QoS()
+        for policy in qosObj.getPolicies() or []:
+            if self._isCandidate(policy, self.QOS_PATTERNS):
+                tracker.add(ResourceTracker.QOSPOLICY, policy["id"], qosObj)
+
+    def find(self):
+        """
+        Returns:
+            ResourceTracker: leaked resources along with their dependencies.
+        """
+        tracker = ResourceTracker(self.maxWorkers, self.maxRate)
+        self._findBUs(tracker)
+        self._findProjectResources(tracker)
+        self._findQoSPolicies(tracker)
+        elog.info(
+            "found %s leaked resources older than %ss"
+            % (eutil.bcolor(len(tracker.resources)), self.minAgeInSecs)
+        )
+        return tracker
+
+    def sweep(self, dryRun=False):
+        """
+        Returns:
+            bool: True if all leaked resources were deleted.
+
+        Args:
+            dryRun (bool): only log what would be deleted.
+        """
+        start = time.monotonic()
+        tracker = self.find()
+        result = tracker.teardown(dryRun=dryRun)
+        elog.info(
+            "sweep %s in %.1fs"
+            % ("planned" if dryRun else "completed", time.monotonic() - start)
+        )
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="delete resources leaked by aborted ebtest runs"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true", help="only show what would be deleted"
+    )
+    parser.add_argument(
+        "--min-age",
+        type=int,
+        default=3600,
+        help="only sweep resources older than this many seconds, default 3600",
+    )
+    parser.add_argument(
+        "--undated",
+        action="store_true",
+        help="also sweep matching resources without creation timestamp",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=8, help="parallel deletions, default 8"
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=2.0,
+        help="maximum delete requests per second, default 2",
+    )
+    args = parser.parse_args()
+
+    sweeper = Sweeper(args.min_age, args.workers, args.rate, args.undated)
+    return 0 if sweeper.sweep(dryRun=args.dry_run) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,273 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest library for tracking and tearing down created resources"""
+
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+from ebapi.lib.edgebricks import BUs, Projects
+
+
+def _deleteVM(vmObj, vmID):
+    # deleteVM waits for the VM resources to be released
+    return vmObj.deleteVM(vmID)
+
+
+def _deleteVolume(volumeObj, volumeID):
+    response = volumeObj.deleteVolume(volumeID)
+    if not response.ok:
+        elog.error(
+            "deleting volume %s: %s"
+            % (eutil.bcolor(volumeID), eutil.rcolor(response.status_code))
+        )
+        return False
+    return volumeObj.waitForDelete(volumeID)
+
+
+def _deleteSnapshot(snapObj, snapID):
+    response = snapObj.deleteSnapshot(snapID)
+    if not response.ok:
+        elog.error(
+            "deleting snapshot %s: %s"
+            % (eutil.bcolor(snapID), eutil.rcolor(response.status_code))
+        )
+        return False
+    return snapObj.waitForDelete(snapID)
+
+
+def _deleteImage(imageObj, imageID):
+    return imageObj.deleteImage(imageID)
+
+
+def _deleteNetwork(networkObj, networkID):
+    return networkObj.deleteInternalNetwork(networkID, wait=True)
+
+
+def _deleteFloatingIP(fipObj, fipID):
+    response = fipObj.deleteFloatingIP(fipID)
+    if not response.ok:
+        elog.error(
+            "deleting floating IP %s: %s"
+            % (eutil.bcolor(fipID), eutil.rcolor(response.status_code))
+        )
+        return False
+    return True
+
+
+def _deleteQoSPolicy(qosObj, policyID):
+    return qosObj.deletePolicy(policyID)
+
+
+def _deleteProject(projObj, projID):
+    if not projObj.delete(projID, force_delete=True):
+        return False
+    return projObj.waitForState(projID, state=Projects.PROJ_STATE_DELETED)
+
+
+def _deleteBU(buObj, buID):
+    if not buObj.delete(buID, force_delete="true"):
+        return False
+    return buObj.waitForState(buID, state=BUs.BU_STATE_DELETED)
+
+
+class ResourceTracker:
+    """
+    ResourceTracker records created resources along with the resources they
+    depend on and tears all of them down, implements::
+
+        * add      - track a created resource
+        * remove   - stop tracking a resource, e.g. deleted by the test itself
+        * getPlan  - deletion order of the tracked resources
+        * teardown - delete all tracked resources
+
+    Teardown deletes a resource only after everything depending on it is gone.
+    Resources without pending dependents are deleted concurrently, and each
+    deletion waits for the resource to reach its deleted state instead of
+    sleeping for a fixed time. A failing deletion does not stop the others,
+    so one failure no longer leaks the rest of the resources.
+
+    Examples:
+        ::
+
+            tracker = ResourceTracker()
+            bu      = tracker.add(ResourceTracker.BU, buID, buObj)
+            proj    = tracker.add(ResourceTracker.PROJECT, projID, projObj, [bu])
+            net     = tracker.add(ResourceTracker.NETWORK, netID, networkObj, [proj])
+            tracker.add(ResourceTracker.VM, vmID, vmObj, [net, proj])
+            assert tracker.teardown()
+    """
+
+    VM = "vm"
+    VOLUME = "volume"
+    SNAPSHOT = "snapshot"
+    IMAGE = "image"
+    NETWORK = "network"
+    FLOATINGIP = "floatingip"
+    QOSPOLICY = "qospolicy"
+    PROJECT = "project"
+    BU = "bu"
+
+    DELETERS = {
+        VM: _deleteVM,
+        VOLUME: _deleteVolume,
+        SNAPSHOT: _deleteSnapshot,
+        IMAGE: _deleteImage,
+        NETWORK: _deleteNetwork,
+        FLOATINGIP: _deleteFloatingIP,
+        QOSPOLICY: _deleteQoSPolicy,
+        PROJECT: _deleteProject,
+        BU: _deleteBU,
+    }
+
+    def __init__(self, maxWorkers=8, maxRate=None):
+        self.maxWorkers = maxWorkers
+        # spaces out delete requests, None for no limit
+        self.limiter = eutil.RateLimiter(maxRate)
+        # key -> (resource object, list of keys it depends on)
+        self.resources = {}
+
+    def add(self, kind, resourceID, obj, deps=None):
+        """
+        track a created resource.
+
+        Returns:
+            tuple: key of the resource, used as dependency of other resources.
+
+        Args:
+            kind       (string): one of the ResourceTracker resource kinds.
+
+            resourceID (string): ID of the created resource.
+
+            obj        (object): lib object used to delete the resource, e.g.
+                                 VMs(projectID) for a VM.
+
+            deps       (list)  : keys of the resources this one depends on.
+        """
+        if kind not in self.DELETERS:
+            raise ValueError("unknown resource kind %s" % kind)
+
+        key = (kind, resourceID)
+        deps = [dep for dep in (deps or []) if dep in self.resources]
+        self.resources[key] = (obj, deps)
+        elog.debug("tracking %s %s" % (kind, eutil.bcolor(resourceID)))
+        return key
+
+    def remove(self, key):
+        """
+        stop tracking a resource.
+
+        Returns:
+            bool: True if the resource was tracked.
+        """
+        if self.resources.pop(key, None) is None:
+            return False
+        for _, deps in self.resources.values():
+            if key in deps:
+                deps.remove(key)
+        return True
+
+    def _delete(self, key):
+        kind, resourceID = key
+        obj, _ = self.resources[key]
+        self.limiter.acquire()
+        elog.info("tearing down %s %s" % (kind, eutil.bcolor(resourceID)))
+        try:
+            return bool(self.DELETERS[kind](obj, resourceID))
+        except Exception as e:
+            elog.error(
+                "tearing down %s %s: %s"
+                % (kind, eutil.bcolor(resourceID), eutil.rcolor(e))
+            )
+            return False
+
+    def getPlan(self):
+        """
+        Returns:
+            list: tracked resource keys grouped in deletion waves, resources of
+            a wave do not depend on each other and are deleted concurrently.
+        """
+        pending = {key: set() for key in self.resources}
+        for key, (_, deps) in self.resources.items():
+            for dep in deps:
+                pending[dep].add(key)
+
+        plan = []
+        while pending:
+            wave = sorted(key for key, dependents in pending.items() if not dependents)
+            if not wave:
+                raise ValueError("dependency cycle in %s" % sorted(pending))
+            plan.append(wave)
+            for key in wave:
+                del pending[key]
+            for dependents in pending.values():
+                dependents.difference_update(wave)
+        return plan
+
+    def teardown(self, dryRun=False):
+        """
+        delete all tracked resources, dependents before their dependencies.
+
+        Returns:
+            bool: True if every resource was deleted, False if any leaked.
+
+        Args:
+            dryRun (bool): only log the deletion plan, delete nothing.
+        """
+        if not self.resources:
+            return True
+
+        plan = self.getPlan()  # fail early on dependency cycles
+        if dryRun:
+            for index, wave in enumerate(plan, 1):
+                for kind, resourceID in wave:
+                    elog.info(
+                        "dry-run: wave %s would delete %s %s"
+                        % (index, kind, eutil.bcolor(resourceID))
+                    )
+            return True
+
+        dependents = {key: set() for key in self.resources}
+        for key, (_, deps) in self.resources.items():
+            for dep in deps:
+                dependents[dep].add(key)
+
+        start = time.monotonic()
+        leaked = []
+        running = {}
+        with ThreadPoolExecutor(max_workers=self.maxWorkers) as executor:
+            while dependents or running:
+                ready = [key for key, pending in dependents.items() if not pending]
+                for key in ready:
+                    running[executor.submit(self._delete, key)] = key
+                    del dependents[key]
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = running.pop(future)
+                    if not future.result():
+                        # dependencies are still torn down, force deletes of
+                        # projects and BUs clean up whatever is left behind
+                        leaked.append(key)
+                    for pending in dependents.values():
+                        pending.discard(key)
+
+        for key in list(self.resources):
+            if key not in leaked:
+                del self.resources[key]
+
+        elapsed = time.monotonic() - start
+        if leaked:
+            elog.error(
+                "teardown leaked %s resources in %.1fs: %s"
+                % (len(leaked), elapsed, eutil.rcolor(leaked))
+            )
+            return False
+
+        elog.info("teardown completed in %s" % eutil.gcolor("%.1fs" % elapsed))
+        return True
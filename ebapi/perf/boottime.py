@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest benchmark engine for VM boot times"""
+
+from ebapi.common import stats
+
+# boot phases of a guest, see guests.Guests, timed from the create request:
+# accepted by the API, ACTIVE, and answering SSH, followed by the time from
+# ACTIVE until SSH answered, the guest's own share of the boot
+PHASES = ("acceptTime", "activeTime", "sshTime", "sshAfterActiveTime")
+
+
+def summarizeBoots(vms):
+    """
+    Returns:
+        dict: number of vms, number of failed boots and stats.summarize of
+        each of the PHASES over the vms that got there, in seconds.
+
+    Args:
+        vms (list): guests from Guests.create.
+
+    Examples:
+        ::
+
+            vms     = guests.create(names, login=False)
+            summary = boottime.summarizeBoots(vms)
+            elog.info('p95 to ACTIVE = %.1fs' % summary['activeTime']['p95'])
+    """
+    summary = {"vms": len(vms), "failed": len([vm for vm in vms if not vm["ok"]])}
+    for phase in PHASES:
+        summary[phase] = stats.summarize([vm[phase] for vm in vms if phase in vm])
+    return summary
+
+
+def getRows(results):
+    """
+    Returns:
+        list: a header row followed by one row per image and flavor with
+        failed boots and p50/p95/max of each phase, as strings.
+
+    Args:
+        results (list): dicts with image, flavor and summarizeBoots keys.
+    """
+    header = ["image", "flavor", "vms", "failed"]
+    for phase in PHASES:
+        header += ["%s %s" % (phase, p) for p in ("p50", "p95", "max")]
+
+    rows = [header]
+    for result in results:
+        row = [result["image"], result["flavor"], result["vms"], result["failed"]]
+        for phase in PHASES:
+            summary = result[phase] or {}
+            for p in ("p50", "p95", "max"):
+                row.append("%.1f" % summary[p] if p in summary else "-")
+        rows.append([str(cell) for cell in row])
+    return rows
+
+
+def formatBootTimes(results):
+    """
+    Returns:
+        string: getRows as a plain text table, times in seconds.
+    """
+    rows = getRows(results)
+    widths = [max(len(row[i]) for row in rows) + 2 for i in range(len(rows[0]))]
+    return "\n".join(
+        "".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
+
+
+def formatBootTimesHTML(results):
+    """
+    Returns:
+        string: getRows as an HTML table, e.g. for the pytest-html report.
+    """
+    rows = getRows(results)
+    html = ["<table>"]
+    html.append("<tr>%s</tr>" % "".join("<th>%s</th>" % cell for cell in rows[0]))
+    for row in rows[1:]:
+        html.append("<tr>%s</tr>" % "".join("<td>%s</td>" % cell for cell in row))
+    html.append("</table>")
+    return "\n".join(html)
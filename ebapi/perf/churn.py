@@ -0,0 +1,466 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest churn stress for BUs and projects.
+
+Concurrent users create a BU, a project in it, delete the project and delete
+the BU, over and over for a set duration. Every request is timed, and the
+states the BU and project go through are polled, so the results show
+request latency over time, how long each state transition takes, failure
+and stuck-state rates, and the resources left behind.
+
+Examples:
+    ::
+
+        python3 -m ebapi.perf.churn --concurrency 4 --duration 600
+        python3 -m ebapi.perf.churn --concurrency 8 --no-project
+"""
+
+import argparse
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+from ebapi.lib.edgebricks import BUs, Projects
+
+
+def getStateNames(cls, prefix):
+    """
+    Returns:
+        dict: state constants of cls starting with prefix by value, e.g.
+        {6: 'CREATED'} for getStateNames(BUs, 'BU_STATE_').
+    """
+    size = len(prefix)
+    return {
+        value: name[size:]
+        for name, value in vars(cls).items()
+        if name.startswith(prefix)
+    }
+
+
+BU_STATES = getStateNames(BUs, "BU_STATE_")
+PROJECT_STATES = getStateNames(Projects, "PROJ_STATE_")
+# state of a resource the API no longer returns
+GONE = "GONE"
+
+
+def watchStates(getState, target, timeoutInSecs=300, pollInSecs=2, failStates=()):
+    """
+    poll the state of a resource until it reaches target, one of failStates,
+    or timeoutInSecs passes.
+
+    Returns:
+        dict: timeline, a list of [state, seconds] with the time each state
+        was first seen, final, the last state, reached, True if final is
+        target, and stuck, True on timeout.
+
+    Args:
+        getState      (callable): returns the current state.
+
+        target        (object)  : state to wait for.
+
+        timeoutInSecs (int)     : maximum time to wait.
+
+        pollInSecs    (int)     : time between two polls.
+
+        failStates    (tuple)   : states the resource does not leave.
+    """
+    start = time.monotonic()
+    timeline = []
+    while True:
+        state = getState()
+        if not timeline or timeline[-1][0] != state:
+            timeline.append([state, time.monotonic() - start])
+        if state == target or state in failStates:
+            break
+        if time.monotonic() - start > timeoutInSecs:
+            break
+        time.sleep(pollInSecs)
+
+    return {
+        "timeline": timeline,
+        "final": state,
+        "reached": state == target,
+        "stuck": state != target and state not in failStates,
+    }
+
+
+class Churn:
+    """
+    Churn creates and deletes BUs and projects from concurrent users,
+    implements::
+
+        * run - churn for durationInSecs and collect the results
+
+    BUs and projects are named ebtestChurn<pid>..., so the sweeper deletes
+    whatever a run leaves behind.
+
+    Examples:
+        ::
+
+            churn   = Churn(concurrency=4, durationInSecs=600)
+            results = churn.run()
+            elog.info(formatChurn(results))
+            assert not results['leftovers']
+    """
+
+    BU_FAIL_STATES = (BUs.BU_STATE_CREATE_ERROR, BUs.BU_STATE_ERROR)
+    PROJECT_FAIL_STATES = (
+        Projects.PROJ_STATE_CREATE_ERROR,
+        Projects.PROJ_STATE_ERROR,
+    )
+
+    def __init__(
+        self,
+        concurrency=4,
+        durationInSecs=600,
+        withProject=True,
+        stateTimeoutInSecs=300,
+        pollInSecs=2,
+        windowInSecs=60,
+    ):
+        self.concurrency = concurrency
+        self.durationInSecs = durationInSecs
+        self.withProject = withProject
+        self.stateTimeoutInSecs = stateTimeoutInSecs
+        self.pollInSecs = pollInSecs
+        self.windowInSecs = windowInSecs
+        self.prefix = "ebtestChurn%d" % os.getpid()
+        self.buObj = BUs()
+        self.lock = threading.Lock()
+        self.start = None
+        self.cycles = 0
+        # [seconds into the run, operation, latency, ok]
+        self.samples = []
+        # transition, e.g. 'bu CREATING->CREATED' -> [durations]
+        self.transitions = {}
+        # kind -> {'attempts': n, 'stuck': {state: n}, 'failed': {state: n}}
+        self.waits = {}
+        # (kind, ID) -> name, of resources not seen deleted yet
+        self.live = {}
+
+    def _nextCycle(self):
+        with self.lock:
+            self.cycles += 1
+            return self.cycles
+
+    def _timed(self, operation, call):
+        start = time.monotonic()
+        result = None
+        try:
+            result = call()
+        except Exception as e:
+            elog.error("%s failed: %s" % (operation, eutil.rcolor(e)))
+        with self.lock:
+            self.samples.append(
+                [
+                    start - self.start,
+                    operation,
+                    time.monotonic() - start,
+                    bool(result),
+                ]
+            )
+        return result
+
+    def _watch(self, kind, getState, target, names, failStates):
+        watched = watchStates(
+            getState, target, self.stateTimeoutInSecs, self.pollInSecs, failStates
+        )
+        timeline = [[names.get(s, s), t] for s, t in watched["timeline"]]
+        final = names.get(watched["final"], watched["final"])
+        with self.lock:
+            for (state, seen), (nextState, nextSeen) in zip(timeline, timeline[1:]):
+                transition = "%s %s->%s" % (kind, state, nextState)
+                self.transitions.setdefault(transition, []).append(nextSeen - seen)
+
+            waits = self.waits.setdefault(
+                kind, {"attempts": 0, "stuck": {}, "failed": {}}
+            )
+            waits["attempts"] += 1
+            if watched["stuck"]:
+                waits["stuck"][final] = waits["stuck"].get(final, 0) + 1
+                elog.error("%s stuck in %s" % (kind, eutil.rcolor(final)))
+            elif not watched["reached"]:
+                waits["failed"][final] = waits["failed"].get(final, 0) + 1
+        return watched["reached"]
+
+    def _getBUState(self, buID, gone=GONE):
+        buRsp = self.buObj.get(buID)
+        return gone if buRsp is None else buRsp["domain_state"]
+
+    def _getProjectState(self, projObj, projID, gone=GONE):
+        projRsp = projObj.get(projID)
+        return gone if projRsp is None else projRsp["project_state"]
+
+    def _churnProject(self, buID, buName, userName, userPwd, cycle):
+        projObj = self._timed(
+            "project login", lambda: Projects(buName, userName, userPwd)
+        )
+        if projObj is None:
+            return
+
+        projName = "%sProject%d" % (self.prefix, cycle)
+        projID = self._timed("project create", lambda: projObj.create(projName, buID))
+        if not projID:
+            return
+        self.live[("project", projID)] = projName
+
+        self._watch(
+            "project",
+            lambda: self._getProjectState(projObj, projID),
+            Projects.PROJ_STATE_CREATED,
+            PROJECT_STATES,
+            self.PROJECT_FAIL_STATES,
+        )
+        if not self._timed(
+            "project delete", lambda: projObj.delete(projID, force_delete=True)
+        ):
+            return
+
+        # a deleted project is either reported DELETED, or not at all
+        deleted = self._watch(
+            "project",
+            lambda: self._getProjectState(
+                projObj, projID, gone=Projects.PROJ_STATE_DELETED
+            ),
+            Projects.PROJ_STATE_DELETED,
+            PROJECT_STATES,
+            (Projects.PROJ_STATE_DELETE_ERROR,),
+        )
+        if deleted:
+            del self.live[("project", projID)]
+
+    def _cycle(self):
+        cycle = self._nextCycle()
+        buName = "%sBU%d" % (self.prefix, cycle)
+        userName = "%sUser%d" % (self.prefix, cycle)
+        userPwd = self.prefix
+        buID = self._timed(
+            "bu create",
+            lambda: self.buObj.create(
+                buName=buName, userName=userName, userPwd=userPwd
+            ),
+        )
+        if not buID:
+            return
+        self.live[("bu", buID)] = buName
+
+        created = self._watch(
+            "bu",
+            lambda: self._getBUState(buID),
+            BUs.BU_STATE_CREATED,
+            BU_STATES,
+            self.BU_FAIL_STATES,
+        )
+        if created and self.withProject:
+            self._churnProject(buID, buName, userName, userPwd, cycle)
+
+        if not self._timed(
+            "bu delete", lambda: self.buObj.delete(buID, force_delete="true")
+        ):
+            return
+
+        # as for projects, a deleted BU may no longer be returned at all
+        deleted = self._watch(
+            "bu",
+            lambda: self._getBUState(buID, gone=BUs.BU_STATE_DELETED),
+            BUs.BU_STATE_DELETED,
+            BU_STATES,
+            (BUs.BU_STATE_DELETE_ERROR,),
+        )
+        if deleted:
+            del self.live[("bu", buID)]
+
+    def _user(self, deadline):
+        while time.monotonic() < deadline:
+            self._cycle()
+
+    def _getTimeline(self):
+        windows = {}
+        for seconds, operation, latency, ok in self.samples:
+            window = int(seconds // self.windowInSecs) * self.windowInSecs
+            windows.setdefault(window, {}).setdefault(operation, []).append(
+                (latency, ok)
+            )
+
+        timeline = []
+        for window, operations in sorted(windows.items()):
+            row = {"window": window}
+            for operation, samples in sorted(operations.items()):
+                summary = stats.summarize([latency for latency, _ in samples])
+                row[operation] = {
+                    "count": len(samples),
+                    "errors": len([ok for _, ok in samples if not ok]),
+                    "p50": summary["p50"],
+                    "p95": summary["p95"],
+                }
+            timeline.append(row)
+        return timeline
+
+    def _countRemaining(self):
+        # BUs of this run the API still lists, deleted ones excluded
+        bus = self.buObj.list()
+        if bus is None:
+            return None
+        return len(
+            [
+                bu
+                for bu in bus
+                if bu.get("name", "").startswith(self.prefix)
+                and bu.get("domain_state") != BUs.BU_STATE_DELETED
+            ]
+        )
+
+    def run(self):
+        """
+        Returns:
+            dict: the results::
+
+                cycles       - create/delete cycles started
+                operations   - per request: count, errors, errorRate and
+                               latency, see stats.summarize
+                timeline     - per windowInSecs window and request: count,
+                               errors, p50 and p95 latency
+                transitions  - stats.summarize of the time between two
+                               states, e.g. 'bu CREATING->CREATED'
+                waits        - per kind: attempts, and the stuck and failed
+                               counts by final state, along with stuckRate
+                leftovers    - BUs and projects not seen deleted
+                remainingBUs - BUs of this run the API still lists
+        """
+        elog.info(
+            "churning BUs%s with %s users for %ss"
+            % (
+                " and projects" if self.withProject else "",
+                eutil.bcolor(self.concurrency),
+                self.durationInSecs,
+            )
+        )
+        self.start = time.monotonic()
+        deadline = self.start + self.durationInSecs
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for _ in range(self.concurrency):
+                executor.submit(self._user, deadline)
+
+        operations = {}
+        for _, operation, latency, ok in self.samples:
+            operations.setdefault(operation, []).append((latency, ok))
+
+        for kind, waits in self.waits.items():
+            waits["stuckRate"] = sum(waits["stuck"].values()) / waits["attempts"]
+
+        return {
+            "cycles": self.cycles,
+            "operations": {
+                operation: {
+                    "count": len(samples),
+                    "errors": len([ok for _, ok in samples if not ok]),
+                    "errorRate": len([ok for _, ok in samples if not ok])
+                    / len(samples),
+                    "latency": stats.summarize([latency for latency, _ in samples]),
+                }
+                for operation, samples in sorted(operations.items())
+            },
+            "timeline": self._getTimeline(),
+            "transitions": {
+                transition: stats.summarize(durations)
+                for transition, durations in sorted(self.transitions.items())
+            },
+            "waits": self.waits,
+            "leftovers": [
+                {"kind": kind, "id": resourceID, "name": name}
+                for (kind, resourceID), name in sorted(self.live.items())
+            ],
+            "remainingBUs": self._countRemaining(),
+        }
+
+
+def formatChurn(results):
+    """
+    Returns:
+        string: requests and state transitions with count and p50/p95/max
+        in seconds, followed by stuck rates and leftovers, as a table.
+    """
+    lines = ["%-40s %7s %7s %8s %8s %8s" % ("", "count", "errors", "p50", "p95", "max")]
+    for operation, result in results["operations"].items():
+        latency = result["latency"]
+        lines.append(
+            "%-40s %7d %7d %8.2f %8.2f %8.2f"
+            % (
+                operation,
+                result["count"],
+                result["errors"],
+                latency["p50"],
+                latency["p95"],
+                latency["max"],
+            )
+        )
+    for transition, summary in results["transitions"].items():
+        lines.append(
+            "%-40s %7d %7s %8.2f %8.2f %8.2f"
+            % (
+                transition,
+                summary["count"],
+                "",
+                summary["p50"],
+                summary["p95"],
+                summary["max"],
+            )
+        )
+    for kind, waits in sorted(results["waits"].items()):
+        lines.append(
+            "%s: %.1f%% stuck %s, failed %s"
+            % (kind, 100.0 * waits["stuckRate"], waits["stuck"], waits["failed"])
+        )
+    lines.append(
+        "%d cycles, %d leftovers, %s BUs remaining"
+        % (results["cycles"], len(results["leftovers"]), results["remainingBUs"])
+    )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="create and delete BUs and projects under concurrency"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4, help="concurrent users, default 4"
+    )
+    parser.add_argument(
+        "--duration", type=int, default=600, help="seconds of churn, default 600"
+    )
+    parser.add_argument(
+        "--no-project",
+        action="store_true",
+        help="only churn BUs, without a project in each",
+    )
+    parser.add_argument(
+        "--state-timeout",
+        type=int,
+        default=300,
+        help="seconds before a state counts as stuck, default 300",
+    )
+    args = parser.parse_args()
+
+    churn = Churn(
+        concurrency=args.concurrency,
+        durationInSecs=args.duration,
+        withProject=not args.no_project,
+        stateTimeoutInSecs=args.state_timeout,
+    )
+    results = churn.run()
+    elog.info("churn results:\n%s" % formatChurn(results))
+    stats.saveResults("churn", results)
+    return 0 if not results["leftovers"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
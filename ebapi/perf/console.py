@@ -0,0 +1,375 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest benchmark engine for noVNC console latency.
+
+A console is opened the way the noVNC client opens it: the console URL is
+requested from nova, then a websocket is opened to the nginx console proxy
+and the VNC server greets with its RFB protocol version as the first frame.
+Every step is timed. ConsoleStandIn plays the console proxy locally, so the
+measuring itself can be tested without a cloud.
+"""
+
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# first thing a VNC server sends, see RFC 6143
+RFB_VERSION = b"RFB 003.008\n"
+
+
+def getWebSocketAccept(key):
+    """
+    Returns:
+        string: Sec-WebSocket-Accept the server answers to key with.
+    """
+    digest = hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()
+    return base64.b64encode(digest).decode()
+
+
+def getWebSocketURL(consoleURL):
+    """
+    Returns:
+        string: websocket URL the noVNC client of consoleURL connects to,
+        e.g. wss://nginx:26000/websockify?token=... for
+        https://nginx:26000/vnc_auto.html?token=...
+    """
+    url = urlparse(consoleURL)
+    scheme = "wss" if url.scheme == "https" else "ws"
+    query = parse_qs(url.query)
+    # noVNC takes the websocket path from the path parameter, if given
+    path = query.pop("path", ["websockify"])[0]
+    if "?" in path:
+        path, _, token = path.partition("?")
+        query.update(parse_qs(token))
+    params = urlencode({k: v[0] for k, v in query.items() if k == "token"})
+    return "%s://%s/%s%s" % (
+        scheme,
+        url.netloc,
+        path.lstrip("/"),
+        "?" + params if params else "",
+    )
+
+
+def _readExactly(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        data += chunk
+    return data
+
+
+def readFrame(sock):
+    """
+    Returns:
+        tuple: opcode and payload of the next websocket frame on sock.
+    """
+    first, second = _readExactly(sock, 2)
+    size = second & 0x7F
+    if size == 126:
+        size = struct.unpack("!H", _readExactly(sock, 2))[0]
+    elif size == 127:
+        size = struct.unpack("!Q", _readExactly(sock, 8))[0]
+    mask = _readExactly(sock, 4) if second & 0x80 else None
+    payload = _readExactly(sock, size)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return first & 0x0F, payload
+
+
+def writeFrame(sock, payload, opcode=0x2, masked=False):
+    """
+    send payload as a single websocket frame, clients mask their frames.
+    """
+    header = bytes([0x80 | opcode])
+    maskBit = 0x80 if masked else 0
+    if len(payload) < 126:
+        header += bytes([maskBit | len(payload)])
+    elif len(payload) < 65536:
+        header += bytes([maskBit | 126]) + struct.pack("!H", len(payload))
+    else:
+        header += bytes([maskBit | 127]) + struct.pack("!Q", len(payload))
+    if masked:
+        mask = os.urandom(4)
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        header += mask
+    sock.sendall(header + payload)
+
+
+def _readHeaders(sock):
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError("connection closed during handshake")
+        data += chunk
+    head, _, rest = data.partition(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return lines[0], headers, rest
+
+
+def openConsole(wsURL, timeoutInSecs=10, verifyTLS=True):
+    """
+    open a console websocket and wait for the first frame.
+
+    Returns:
+        dict: connectTime, TCP and TLS connect, handshakeTime, until the
+        101 Switching Protocols response, and firstFrameTime, until the first
+        frame arrived, in seconds from the start, ok, and the error if any.
+        Times of steps not reached are None.
+
+    Args:
+        wsURL         (string): ws:// or wss:// URL, see getWebSocketURL.
+
+        timeoutInSecs (int)   : timeout of every socket operation.
+
+        verifyTLS     (bool)  : check the certificate of the proxy.
+    """
+    result = {
+        "connectTime": None,
+        "handshakeTime": None,
+        "firstFrameTime": None,
+        "ok": False,
+        "error": None,
+    }
+    url = urlparse(wsURL)
+    secure = url.scheme == "wss"
+    port = url.port or (443 if secure else 80)
+    path = url.path + ("?" + url.query if url.query else "")
+    key = base64.b64encode(os.urandom(16)).decode()
+    start = time.monotonic()
+    sock = None
+    try:
+        sock = socket.create_connection((url.hostname, port), timeout=timeoutInSecs)
+        if secure:
+            context = ssl.create_default_context()
+            if not verifyTLS:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            sock = context.wrap_socket(sock, server_hostname=url.hostname)
+        result["connectTime"] = time.monotonic() - start
+
+        origin = "%s://%s" % ("https" if secure else "http", url.netloc)
+        request = (
+            "GET %s HTTP/1.1\r\n"
+            "Host: %s\r\n"
+            "Origin: %s\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            "Sec-WebSocket-Key: %s\r\n"
+            "Sec-WebSocket-Version: 13\r\n"
+            "Sec-WebSocket-Protocol: binary\r\n\r\n" % (path, url.netloc, origin, key)
+        )
+        sock.sendall(request.encode())
+        status, headers, rest = _readHeaders(sock)
+        if status.split()[1:2] != ["101"]:
+            result["error"] = status
+            return result
+        if headers.get("sec-websocket-accept") != getWebSocketAccept(key):
+            result["error"] = "bad Sec-WebSocket-Accept"
+            return result
+        result["handshakeTime"] = time.monotonic() - start
+
+        if rest:
+            # the server sent its first frame along with the handshake
+            sock = _BufferedSocket(sock, rest)
+        opcode, payload = readFrame(sock)
+        result["firstFrameTime"] = time.monotonic() - start
+        if opcode == 0x8:
+            result["error"] = "closed by the proxy"
+            return result
+        result["ok"] = True
+        result["greeting"] = payload[:12].decode("latin-1")
+    except (OSError, ValueError) as e:
+        result["error"] = str(e)
+    finally:
+        if sock is not None:
+            sock.close()
+    return result
+
+
+class _BufferedSocket:
+    # socket with bytes already received in front of it
+    def __init__(self, sock, data):
+        self.sock = sock
+        self.data = data
+
+    def recv(self, size):
+        if self.data:
+            chunk, self.data = self.data[:size], self.data[size:]
+            return chunk
+        return self.sock.recv(size)
+
+    def close(self):
+        self.sock.close()
+
+
+class ConsoleProbe:
+    """
+    ConsoleProbe opens the consoles of VMs concurrently and times them,
+    implements::
+
+        * probe   - open the console of one VM
+        * measure - open the consoles of VMs, rounds times each
+
+    Examples:
+        ::
+
+            probe   = ConsoleProbe(VMs(projectID), maxInFlight=10)
+            results = probe.measure(vmIDs, rounds=3)
+            elog.info(summarizeConsoles(results))
+    """
+
+    def __init__(self, vmObj, maxInFlight=8, timeoutInSecs=10, verifyTLS=True):
+        self.vmObj = vmObj
+        self.maxInFlight = maxInFlight
+        self.timeoutInSecs = timeoutInSecs
+        self.verifyTLS = verifyTLS
+
+    def probe(self, vmID):
+        """
+        Returns:
+            dict: vmID, urlTime, the time nova took to issue the console URL,
+            and openConsole results, times from the websocket connect.
+        """
+        start = time.monotonic()
+        consoleURL = self.vmObj.getVMConsole(vmID)
+        urlTime = time.monotonic() - start
+        if not consoleURL:
+            return {"vmID": vmID, "urlTime": urlTime, "ok": False, "error": "no URL"}
+
+        result = openConsole(
+            getWebSocketURL(consoleURL), self.timeoutInSecs, self.verifyTLS
+        )
+        result.update({"vmID": vmID, "urlTime": urlTime})
+        if not result["ok"]:
+            elog.error(
+                "console of %s: %s"
+                % (eutil.bcolor(vmID), eutil.rcolor(result["error"]))
+            )
+        return result
+
+    def measure(self, vmIDs, rounds=1):
+        """
+        Returns:
+            list: probe results, rounds per VM.
+        """
+        with ThreadPoolExecutor(max_workers=self.maxInFlight) as executor:
+            return list(executor.map(self.probe, list(vmIDs) * rounds))
+
+
+def summarizeConsoles(results):
+    """
+    Returns:
+        dict: number of console opens, failed ones, and stats.summarize of
+        urlTime, connectTime, handshakeTime and firstFrameTime over the
+        successful ones.
+    """
+    done = [r for r in results if r["ok"]]
+    summary = {"opens": len(results), "failed": len(results) - len(done)}
+    for key in ("urlTime", "connectTime", "handshakeTime", "firstFrameTime"):
+        summary[key] = stats.summarize([r[key] for r in done])
+    return summary
+
+
+class ConsoleStandIn:
+    """
+    ConsoleStandIn is a local websocket server playing the nginx console
+    proxy, implements::
+
+        * start - serve, returns a console URL like the one nova issues
+        * stop  - stop serving
+
+    It answers the websocket handshake after handshakeDelayInSecs and sends
+    the RFB version as first frame after frameDelayInSecs, so the latencies
+    openConsole measures against it are known.
+
+    Examples:
+        ::
+
+            standIn    = ConsoleStandIn(frameDelayInSecs=0.2)
+            consoleURL = standIn.start()
+            result     = openConsole(getWebSocketURL(consoleURL))
+            standIn.stop()
+    """
+
+    def __init__(self, handshakeDelayInSecs=0, frameDelayInSecs=0):
+        self.handshakeDelayInSecs = handshakeDelayInSecs
+        self.frameDelayInSecs = frameDelayInSecs
+        self.listener = None
+        self.thread = None
+        self.stopped = threading.Event()
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                _, headers, _ = _readHeaders(conn)
+                time.sleep(self.handshakeDelayInSecs)
+                response = (
+                    "HTTP/1.1 101 Switching Protocols\r\n"
+                    "Upgrade: websocket\r\n"
+                    "Connection: Upgrade\r\n"
+                    "Sec-WebSocket-Accept: %s\r\n"
+                    "Sec-WebSocket-Protocol: binary\r\n\r\n"
+                    % getWebSocketAccept(headers.get("sec-websocket-key", ""))
+                )
+                conn.sendall(response.encode())
+                time.sleep(self.frameDelayInSecs)
+                writeFrame(conn, RFB_VERSION)
+            except OSError as e:
+                elog.debug("console stand-in: %s" % e)
+
+    def _accept(self):
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.listener.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            conn.settimeout(None)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def start(self):
+        """
+        Returns:
+            string: console URL served by the stand-in.
+        """
+        self.stopped.clear()
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        # closing a socket does not wake up accept, so poll for stop
+        self.listener.settimeout(0.5)
+        self.thread = threading.Thread(target=self._accept, daemon=True)
+        self.thread.start()
+        port = self.listener.getsockname()[1]
+        return "http://127.0.0.1:%d/vnc_auto.html?token=ebtest" % port
+
+    def stop(self):
+        if self.listener is not None:
+            self.stopped.set()
+            self.thread.join()
+            self.listener.close()
+            self.listener = None
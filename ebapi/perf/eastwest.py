@@ -0,0 +1,163 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest benchmark engine for east-west traffic between VM pairs"""
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+from ebapi.perf.iperf import Iperf
+
+# placements of the two VMs of a pair
+SAME_HOST = "same-host"
+CROSS_HOST = "cross-host"
+
+
+def parsePing(output):
+    """
+    Returns:
+        list: round trip times in ms of the replies in ping output.
+    """
+    return [float(rtt) for rtt in re.findall(r"time=([\d.]+) ?ms", output)]
+
+
+def measureLatency(source, targetIP, count=100, intervalInSecs=0.2):
+    """
+    Returns:
+        dict: stats.summarize of the ping round trip times in ms along with
+        lostPercent, None if no reply came back.
+
+    Args:
+        source         (RemoteMachine): machine to ping from.
+
+        targetIP       (string)       : address to ping.
+
+        count          (int)          : number of echo requests.
+
+        intervalInSecs (float)        : time between two requests, below
+                                        0.2 needs root on most images.
+    """
+    timeoutInSecs = int(count * intervalInSecs) + 30
+    _, output = source.run(
+        "ping -c %d -i %s %s" % (count, intervalInSecs, targetIP),
+        timeoutInSecs=timeoutInSecs,
+    )
+    rtts = parsePing(output or "")
+    if not rtts:
+        elog.error("no ping replies from %s" % eutil.rcolor(targetIP))
+        return None
+
+    latency = stats.summarize(rtts)
+    latency["lostPercent"] = 100.0 * (count - len(rtts)) / count
+    return latency
+
+
+def measurePair(pair, durationInSecs=20, streams=1, udpBitrate="1G"):
+    """
+    measure the network path between the two guests of a pair, see
+    guests.Guests: TCP throughput, UDP throughput and packet rate, and
+    latency from the first to the second guest, over their fixed IPs.
+
+    Returns:
+        dict: placement, hosts, tcp, udp and latency, the latter being None
+        if that measurement failed.
+
+    Args:
+        pair           (dict)  : placement and guests, a list of two guests.
+
+        durationInSecs (int)   : iperf3 time per run.
+
+        streams        (int)   : parallel TCP streams.
+
+        udpBitrate     (string): UDP target bitrate, set it above the expected
+                                 line rate to measure the packet rate limit.
+    """
+    client, server = pair["guests"]
+    iperf = Iperf(server["remote"], client["remote"], server["fixedIP"])
+    tcp = iperf.measure(durationInSecs=durationInSecs, streams=streams)
+    udp = iperf.measure(durationInSecs=durationInSecs, udp=True, bitrate=udpBitrate)
+    latency = measureLatency(client["remote"], server["fixedIP"])
+    return {
+        "placement": pair["placement"],
+        "hosts": [client["host"], server["host"]],
+        "tcp": tcp,
+        "udp": udp,
+        "latency": latency,
+    }
+
+
+def measurePairs(pairs, **kwargs):
+    """
+    run measurePair on all pairs concurrently.
+
+    Returns:
+        list: measurePair results, in the order of pairs.
+
+    Args:
+        kwargs: measurePair arguments.
+    """
+    if not pairs:
+        return []
+
+    with ThreadPoolExecutor(max_workers=len(pairs)) as executor:
+        return list(executor.map(lambda pair: measurePair(pair, **kwargs), pairs))
+
+
+def _mean(values):
+    values = [value for value in values if value is not None]
+    if not values:
+        return None
+    return sum(values) / len(values)
+
+
+def getMatrix(results):
+    """
+    Returns:
+        dict: one row per placement, keyed by placement, with the mean over
+        its pairs of tcpKbps, tcpRetransmits, udpKbps, udpLostPercent,
+        packetsPerSec, latencyP50Ms, latencyP95Ms and latencyP99Ms, along
+        with the number of pairs.
+    """
+    columns = {
+        "tcpKbps": lambda r: r["tcp"] and r["tcp"]["receivedKbps"],
+        "tcpRetransmits": lambda r: r["tcp"] and r["tcp"]["retransmits"],
+        "udpKbps": lambda r: r["udp"] and r["udp"]["receivedKbps"],
+        "udpLostPercent": lambda r: r["udp"] and r["udp"]["lostPercent"],
+        "packetsPerSec": lambda r: r["udp"] and r["udp"]["packetsPerSec"],
+        "latencyP50Ms": lambda r: r["latency"] and r["latency"]["p50"],
+        "latencyP95Ms": lambda r: r["latency"] and r["latency"]["p95"],
+        "latencyP99Ms": lambda r: r["latency"] and r["latency"]["p99"],
+    }
+    matrix = {}
+    for placement in sorted(set(r["placement"] for r in results)):
+        rows = [r for r in results if r["placement"] == placement]
+        matrix[placement] = {"pairs": len(rows)}
+        for column, getValue in columns.items():
+            matrix[placement][column] = _mean([getValue(r) for r in rows])
+    return matrix
+
+
+def formatMatrix(matrix):
+    """
+    Returns:
+        string: getMatrix result as a table, one row per placement.
+    """
+    columns = ["pairs"] + [
+        column for column in next(iter(matrix.values()), {}) if column != "pairs"
+    ]
+    lines = ["%-12s" % "placement" + "".join("%16s" % c for c in columns)]
+    for placement, row in matrix.items():
+        cells = []
+        for column in columns:
+            value = row[column]
+            if isinstance(value, float):
+                value = "%.2f" % value
+            cells.append("%16s" % ("-" if value is None else value))
+        lines.append("%-12s" % placement + "".join(cells))
+    return "\n".join(lines)
@@ -0,0 +1,217 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest HA benchmark for host failure and VM evacuation.
+
+A host carrying VMs is powered off. Its status and all of its VMs are then
+polled together, every VM in parallel, to time when the failure is detected
+and when each VM is ACTIVE again on another host. The host is then powered
+back on, and the benchmark waits for it to rejoin and to carry VMs again.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+from ebapi.lib.hosts import Hosts
+from ebapi.lib.nova import VMs
+
+
+class HostEvacuation:
+    """
+    HostEvacuation fails a host and times the recovery of its VMs,
+    implements::
+
+        * getPlacement - state and host of VMs, fetched in parallel
+        * fail         - power off the host, time detection and recovery
+        * restore      - power on the host, time rejoin and rebalancing
+
+    All times are in seconds from the power off or power on request. The
+    host is healthy while its status is the one seen before the power off.
+
+    Examples:
+        ::
+
+            evacuation = HostEvacuation(projectID, hostID)
+            result     = evacuation.fail(vmIDs)
+            try:
+                assert result['failed'] == 0
+            finally:
+                assert evacuation.restore(vmIDs)['rejoined']
+    """
+
+    def __init__(
+        self, projectID, hostID, timeoutInSecs=900, pollInSecs=2, maxInFlight=16
+    ):
+        self.hostID = hostID
+        self.timeoutInSecs = timeoutInSecs
+        self.pollInSecs = pollInSecs
+        self.maxInFlight = maxInFlight
+        self.hostObj = Hosts()
+        self.vmObj = VMs(projectID)
+        self.hostName = self.hostObj.getHostName(hostID)
+        self.healthyStatus = None
+
+    def _getVMPlacement(self, vmID):
+        vmRsp = self.vmObj.getVM(vmID)
+        if vmRsp is None:
+            return None, None
+        return vmRsp["vm_state"], vmRsp["host"]
+
+    def getPlacement(self, vmIDs):
+        """
+        Returns:
+            dict: (vm_state, host name) per VM ID, (None, None) for VMs that
+            could not be fetched.
+        """
+        with ThreadPoolExecutor(max_workers=self.maxInFlight) as executor:
+            return dict(zip(vmIDs, executor.map(self._getVMPlacement, vmIDs)))
+
+    def _isRecovered(self, placement):
+        state, host = placement
+        return state == "ACTIVE" and host not in (None, self.hostName)
+
+    def fail(self, vmIDs):
+        """
+        power off the host and poll it and vmIDs until every VM is ACTIVE on
+        another host, or timeoutInSecs.
+
+        Returns:
+            dict: detectTime, until the host status changed, and per VM the
+            time it was first seen off ACTIVE on the host (detectTime) and
+            ACTIVE on another host (recoverTime, None if it did not recover),
+            recoverTime summarized over the VMs, the time until the last VM
+            recovered (totalTime) and the number of VMs not recovered
+            (failed). None if the host could not be powered off.
+
+        Args:
+            vmIDs (list): VMs running on the host.
+        """
+        self.healthyStatus = self.hostObj.getHostStatus(self.hostID)
+        elog.info(
+            "powering off host %s carrying %s VMs, status %s"
+            % (
+                eutil.bcolor(self.hostName),
+                eutil.bcolor(len(vmIDs)),
+                eutil.bcolor(self.healthyStatus),
+            )
+        )
+        start = time.monotonic()
+        if not self.hostObj.powerOFF(self.hostID):
+            return None
+
+        detectTime = None
+        vms = {vmID: {"detectTime": None, "recoverTime": None} for vmID in vmIDs}
+        pending = set(vmIDs)
+        while pending and time.monotonic() - start < self.timeoutInSecs:
+            if detectTime is None:
+                status = self.hostObj.getHostStatus(self.hostID)
+                if status is not None and status != self.healthyStatus:
+                    detectTime = time.monotonic() - start
+                    elog.info(
+                        "host %s is %s after %.1fs"
+                        % (
+                            eutil.bcolor(self.hostName),
+                            eutil.bcolor(status),
+                            detectTime,
+                        )
+                    )
+
+            placement = self.getPlacement(sorted(pending))
+            seen = time.monotonic() - start
+            for vmID, (state, host) in placement.items():
+                vm = vms[vmID]
+                running = state == "ACTIVE" and host == self.hostName
+                if vm["detectTime"] is None and not running:
+                    vm["detectTime"] = seen
+                if self._isRecovered((state, host)):
+                    vm["recoverTime"] = seen
+                    pending.discard(vmID)
+                    elog.info(
+                        "VM %s ACTIVE on %s after %.1fs"
+                        % (eutil.bcolor(vmID), eutil.bcolor(host), seen)
+                    )
+
+            if pending:
+                time.sleep(self.pollInSecs)
+
+        recoverTimes = [vm["recoverTime"] for vm in vms.values() if vm["recoverTime"]]
+        for vmID in pending:
+            elog.error("VM %s not recovered" % eutil.rcolor(vmID))
+        return {
+            "host": self.hostName,
+            "detectTime": detectTime,
+            "vms": vms,
+            "recoverTime": stats.summarize(recoverTimes),
+            "totalTime": max(recoverTimes) if not pending and recoverTimes else None,
+            "failed": len(pending),
+        }
+
+    def restore(self, vmIDs, rebalanceTimeoutInSecs=600):
+        """
+        power on the host, wait for it to rejoin with its status from before
+        fail, then for the host to carry VMs again.
+
+        Returns:
+            dict: rejoinTime, rebalanceTime, rejoined and rebalanced, the
+            number of vmIDs that are not ACTIVE after rejoining (notActive)
+            and the number of vmIDs per host at the end (placement).
+
+        Args:
+            vmIDs                  (list): the VMs evacuated by fail.
+
+            rebalanceTimeoutInSecs (int) : time to wait for VMs to come back
+                                           to the host, 0 to not wait.
+        """
+        result = {
+            "rejoinTime": None,
+            "rebalanceTime": None,
+            "rejoined": False,
+            "rebalanced": False,
+        }
+        elog.info("powering on host %s" % eutil.bcolor(self.hostName))
+        start = time.monotonic()
+        if not self.hostObj.powerON(self.hostID):
+            return result
+
+        def isHealthy():
+            return self.hostObj.getHostStatus(self.hostID) == self.healthyStatus
+
+        result["rejoined"] = eutil.waitUntil(
+            isHealthy, self.timeoutInSecs, self.pollInSecs
+        )
+        if result["rejoined"]:
+            result["rejoinTime"] = time.monotonic() - start
+
+        def isRebalanced():
+            return bool(self.hostObj.getDependentVMS(self.hostID)) or any(
+                host == self.hostName for _, host in self.getPlacement(vmIDs).values()
+            )
+
+        if result["rejoined"] and rebalanceTimeoutInSecs:
+            result["rebalanced"] = eutil.waitUntil(
+                isRebalanced, rebalanceTimeoutInSecs, self.pollInSecs
+            )
+            if result["rebalanced"]:
+                result["rebalanceTime"] = time.monotonic() - start
+
+        placement = self.getPlacement(vmIDs)
+        result["notActive"] = len([p for p in placement.values() if p[0] != "ACTIVE"])
+        result["placement"] = {}
+        for _, host in placement.values():
+            result["placement"][host] = result["placement"].get(host, 0) + 1
+        elog.info(
+            "host %s rejoined: %s, rebalanced: %s"
+            % (
+                eutil.bcolor(self.hostName),
+                eutil.bcolor(result["rejoined"]),
+                eutil.bcolor(result["rebalanced"]),
+            )
+        )
+        return result
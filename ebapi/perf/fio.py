@@ -0,0 +1,217 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest benchmark engine for block storage I/O with fio"""
+
+import json
+
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+
+# name -> fio rw mode, block size and queue depth
+WORKLOADS = {
+    "randread": ("randread", "4k", 32),
+    "randwrite": ("randwrite", "4k", 32),
+    "seqread": ("read", "1M", 8),
+    "seqwrite": ("write", "1M", 8),
+}
+
+# fio completion latency percentiles reported in milliseconds
+PERCENTILES = {"p50": "50.000000", "p95": "95.000000", "p99": "99.000000"}
+
+
+def getDevicePath(volumeID):
+    """
+    Returns:
+        string: stable device path of an attached volume inside the guest,
+        virtio disks carry the first 20 characters of the volume ID as serial.
+    """
+    size = 20
+    return "/dev/disk/by-id/virtio-%s" % volumeID[:size]
+
+
+def parseFioJSON(output):
+    """
+    Returns:
+        dict: summary of a fio --output-format=json report with
+        group_reporting, None on failure. Per direction, read and write::
+
+            iops      - I/O operations per second
+            bwKBps    - bandwidth in KiB per second
+            latencyMs - completion latency mean and percentiles, see
+                        PERCENTILES, in milliseconds
+
+        A direction without I/O is None.
+
+    Args:
+        output (string): stdout of fio run with --output-format=json.
+    """
+    try:
+        content = json.loads(output)
+    except ValueError:
+        elog.error("fio did not report JSON: %s" % eutil.rcolor(output[:200]))
+        return None
+
+    jobs = content.get("jobs")
+    if not jobs:
+        elog.error("fio reported no jobs")
+        return None
+
+    job = jobs[0]
+    if job.get("error"):
+        elog.error("fio failed: %s" % eutil.rcolor(job["error"]))
+        return None
+
+    result = {}
+    for direction in ("read", "write"):
+        stats = job[direction]
+        if not stats.get("io_bytes"):
+            result[direction] = None
+            continue
+
+        clat = stats["clat_ns"]
+        percentiles = clat.get("percentile", {})
+        latencyMs = {"mean": clat["mean"] / 1e6}
+        for name, key in PERCENTILES.items():
+            if key in percentiles:
+                latencyMs[name] = percentiles[key] / 1e6
+        result[direction] = {
+            "iops": stats["iops"],
+            "bwKBps": stats["bw"],
+            "latencyMs": latencyMs,
+        }
+    return result
+
+
+class Fio:
+    """
+    Fio runs fio workloads against a block device of a RemoteMachine,
+    implements::
+
+        * isInstalled   - check for fio on the machine
+        * waitForDevice - wait for an attached volume to show up
+        * measure       - one workload, see WORKLOADS
+        * measureAll    - every workload in WORKLOADS, one after the other
+
+    I/O is direct, bypassing the guest page cache, with libaio, and runs
+    through sudo unless sudo is False, e.g. when logged in as root. Write
+    workloads destroy the data on the device.
+
+    Examples:
+        ::
+
+            fio    = Fio(remote, getDevicePath(volumeID))
+            assert fio.waitForDevice()
+            result = fio.measure('randread', durationInSecs=60)
+            elog.info('%.0f IOPS' % result['read']['iops'])
+    """
+
+    def __init__(self, remote, device, sudo=True):
+        self.remote = remote
+        self.device = device
+        self.sudo = "sudo -n " if sudo else ""
+
+    def isInstalled(self):
+        """
+        Returns:
+            bool: True if fio is installed on the machine.
+        """
+        rc, _ = self.remote.run("which fio")
+        if rc != 0:
+            elog.error("fio not installed on %s" % eutil.rcolor(self.remote.host))
+            return False
+        return True
+
+    def waitForDevice(self, timeoutInSecs=60):
+        """
+        Returns:
+            bool: True once the device exists on the machine.
+        """
+        return eutil.waitUntil(
+            lambda: self.remote.run("test -b %s" % self.device, 10)[0] == 0,
+            timeoutInSecs,
+            2,
+        )
+
+    def measure(self, workload, durationInSecs=60, rampInSecs=5, numJobs=1):
+        """
+        run one fio workload on the device.
+
+        Returns:
+            dict: see parseFioJSON, along with workload, blockSize and
+            ioDepth. None on failure.
+
+        Args:
+            workload       (string): a WORKLOADS key.
+
+            durationInSecs (int)   : measured time, without rampInSecs.
+
+            rampInSecs     (int)   : warm-up seconds left out of the report.
+
+            numJobs        (int)   : parallel fio jobs, each at ioDepth.
+        """
+        mode, blockSize, ioDepth = WORKLOADS[workload]
+        command = (
+            "%sfio --name=%s --filename=%s --rw=%s --bs=%s --iodepth=%d "
+            "--numjobs=%d --direct=1 --ioengine=libaio --time_based "
+            "--runtime=%d --ramp_time=%d --group_reporting "
+            "--output-format=json"
+            % (
+                self.sudo,
+                workload,
+                self.device,
+                mode,
+                blockSize,
+                ioDepth,
+                numJobs,
+                durationInSecs,
+                rampInSecs,
+            )
+        )
+        _, output = self.remote.run(
+            command, timeoutInSecs=durationInSecs + rampInSecs + 120
+        )
+        result = parseFioJSON(output)
+        if result is None:
+            return None
+
+        result.update(
+            {"workload": workload, "blockSize": blockSize, "ioDepth": ioDepth}
+        )
+        stats = result["read"] or result["write"]
+        if stats is None:
+            elog.error(
+                "fio %s on %s reported no I/O" % (workload, eutil.rcolor(self.device))
+            )
+            return None
+
+        elog.info(
+            "fio %s on %s: %s IOPS, %s KiB/s, p99 %s ms"
+            % (
+                workload,
+                self.device,
+                eutil.bcolor("%.0f" % stats["iops"]),
+                eutil.bcolor("%.0f" % stats["bwKBps"]),
+                stats["latencyMs"].get("p99"),
+            )
+        )
+        return result
+
+    def measureAll(self, **kwargs):
+        """
+        Returns:
+            dict: measure results keyed by workload, None on failure.
+
+        Args:
+            kwargs: measure arguments other than workload.
+        """
+        results = {}
+        for workload in WORKLOADS:
+            result = self.measure(workload, **kwargs)
+            if result is None:
+                return None
+            results[workload] = result
+        return results
@@ -0,0 +1,295 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest library for benchmark VMs that are reachable over SSH"""
+
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ebapi.common import utils as eutil
+from ebapi.common.commands import RemoteMachine, getGateway
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.neutron import FloatingIPs, Routers
+from ebapi.lib.nova import VMs, Flavors
+from ebapi.lib.tracker import ResourceTracker
+
+
+def getFlavorID(projectID):
+    """
+    Returns:
+        string: ID of the flavor best matching the vcpus and rammb of the
+        [perf] section in test.conf, None if there is none.
+
+    Examples:
+        ::
+
+            flavorID = getFlavorID(projectID)
+    """
+    testConfig = ConfigParser("perf")
+    return Flavors(projectID).getBestMatchingFlavor(
+        numCPU=int(testConfig.getOptionalConfig("vcpus", "2")),
+        memMB=int(testConfig.getOptionalConfig("rammb", "2048")),
+    )
+
+
+class Guests:
+    """
+    Guests boots benchmark VMs and makes them reachable over SSH, implements::
+
+        * create     - boot VMs concurrently, with floating IPs
+        * placeOn    - live migrate a VM onto a given host
+        * waitForSSH - wait until a VM accepts SSH logins
+        * close      - close the SSH connections to the VMs
+
+    The VMs are attached to the routed network, booted from the image and
+    logged into with the credentials of the [perf] section in test.conf. The
+    image should have the benchmark tools (iperf3, fio, ping) installed.
+    Everything created is added to the tracker for teardown.
+
+    A guest is a dict with the VMs.createVMs handle keys (name, id, ok,
+    acceptTime, activeTime) along with host, fixedIP, floatingIP, remote, a
+    RemoteMachine logged into the VM, sshTime, the time from submitting the
+    VM until its first SSH login, or until SSH answered if create was called
+    with login=False, and sshAfterActiveTime, the part of sshTime after the
+    VM was ACTIVE. Every guest is made reachable as soon as it is ACTIVE, so
+    its times do not depend on the other guests created along with it.
+
+    Examples:
+        ::
+
+            tracker = ResourceTracker()
+            guests  = Guests(projectID, tracker)
+            vms     = guests.create(['ebtestPerf1', 'ebtestPerf2'])
+            assert all(vm['ok'] for vm in vms)
+            rc, out = vms[0]['remote'].run('uname -a')
+            guests.close()
+            tracker.teardown()
+    """
+
+    def __init__(self, projectID, tracker, imageID=None, flavorID=None):
+        self.projectID = projectID
+        self.tracker = tracker
+        self.testConfig = ConfigParser("perf")
+        self.networkID = self.testConfig.getOptionalConfig("networkid")
+        self.imageID = imageID or self.testConfig.getOptionalConfig("imageid")
+        self.username = self.testConfig.getOptionalConfig("username")
+        self.password = self.testConfig.getOptionalConfig("password")
+        self.keyfile = self.testConfig.getOptionalConfig("keyfile")
+        self.flavorID = flavorID
+        if self.flavorID is None:
+            self.flavorID = getFlavorID(projectID)
+        self.vmObj = VMs(projectID)
+        self.fipObj = FloatingIPs(projectID)
+        self.gateway = getGateway()
+        self.externalNetID = None
+        self.remotes = []
+
+    def isConfigured(self, login=True):
+        """
+        Returns:
+            bool: True if network, image and, unless login is False, the
+            login are set in [perf].
+        """
+        required = [("networkid", self.networkID), ("imageid", self.imageID)]
+        if login:
+            required.append(("username", self.username))
+            required.append(("password or keyfile", self.password or self.keyfile))
+        missing = [name for name, value in required if not value]
+        if missing:
+            elog.error("[perf] %s not set in test.conf" % ", ".join(missing))
+            return False
+        return True
+
+    def _getExternalNetID(self):
+        if self.externalNetID is None:
+            routerObj = Routers(self.projectID)
+            for routerID in routerObj.getAllRouters() or []:
+                self.externalNetID = routerObj.getExternalNetworkIDFromRouter(routerID)
+                if self.externalNetID:
+                    break
+        return self.externalNetID
+
+    def _getFixedIP(self, vmID):
+        vm = self.vmObj.getVM(vmID)
+        if not vm:
+            return None
+        for addresses in vm["addresses"].values():
+            for address in addresses:
+                return address["Addr"]
+        return None
+
+    def _addFloatingIP(self, guest):
+        portID = self.vmObj.getPortIDFromNetID(guest["id"], self.networkID)
+        externalNetID = self._getExternalNetID()
+        if not portID or not externalNetID:
+            elog.error("no port or external network for %s" % guest["name"])
+            return False
+
+        response = self.fipObj.createFloatingIP(externalNetID, portID)
+        if not response.ok:
+            elog.error(
+                "creating floating IP for %s: %s"
+                % (eutil.bcolor(guest["name"]), eutil.rcolor(response.status_code))
+            )
+            return False
+
+        floatingIP = json.loads(response.content)["floatingip"]
+        self.tracker.add(
+            ResourceTracker.FLOATINGIP, floatingIP["id"], self.fipObj, [guest["key"]]
+        )
+        guest["floatingIP"] = floatingIP["floating_ip_address"]
+        return True
+
+    def getRemote(self, ipAddr):
+        """
+        Returns:
+            RemoteMachine: logged into a guest at ipAddr.
+        """
+        remote = RemoteMachine(
+            ipAddr,
+            self.username,
+            password=self.password,
+            keyfile=self.keyfile,
+            gateway=self.gateway,
+        )
+        self.remotes.append(remote)
+        return remote
+
+    def waitForSSH(self, guest, timeoutInSecs=300, login=True):
+        """
+        Returns:
+            bool: True once the guest accepts SSH logins, or only answers SSH
+            if login is False. False on timeout.
+        """
+        remote = guest["remote"]
+
+        def isReachable():
+            if not login:
+                return remote.isSSHReady()
+            rc, _ = remote.run("true", timeoutInSecs=30)
+            return rc == 0
+
+        return eutil.waitUntil(isReachable, timeoutInSecs, 2)
+
+    def _prepare(self, guest, activeAt, sshTimeoutInSecs, login):
+        # untracked VMs would leak, so VMs that never showed up are looked up
+        # once more before giving up on them
+        if not guest["id"]:
+            guest["id"] = self.vmObj.getVMIDByName(guest["name"])
+            if not guest["id"]:
+                return guest
+
+        guest["key"] = self.tracker.add(ResourceTracker.VM, guest["id"], self.vmObj)
+        if not guest["ok"]:
+            # the VM never became ACTIVE, createVMs timed the timeout
+            guest.pop("activeTime", None)
+            return guest
+
+        guest["ok"] = False
+        guest["host"] = self.vmObj.getHost(guest["id"])
+        guest["fixedIP"] = self._getFixedIP(guest["id"])
+        if not self._addFloatingIP(guest):
+            return guest
+
+        guest["remote"] = self.getRemote(guest["floatingIP"])
+        if not self.waitForSSH(guest, sshTimeoutInSecs, login):
+            elog.error("no SSH login on %s" % eutil.rcolor(guest["name"]))
+            return guest
+
+        guest["sshAfterActiveTime"] = time.monotonic() - activeAt
+        guest["sshTime"] = guest["activeTime"] + guest["sshAfterActiveTime"]
+        guest["ok"] = True
+        return guest
+
+    def create(self, names, maxInFlight=8, sshTimeoutInSecs=300, login=True):
+        """
+        boot VMs concurrently and wait until they accept SSH logins.
+
+        Returns:
+            list: one guest dict per name, see the class description. None
+            if the project quota cannot cover the VMs.
+
+        Args:
+            names            (list): VM names.
+
+            maxInFlight      (int) : maximum number of concurrent creates.
+
+            sshTimeoutInSecs (int) : per VM timeout for the first SSH login,
+                                     after it became ACTIVE.
+
+            login            (bool): False to only wait for the SSH server to
+                                     answer, e.g. for images without the
+                                     [perf] login.
+        """
+        specs = [
+            {
+                "vmName": name,
+                "flavorID": self.flavorID,
+                "networkID": self.networkID,
+                "imageID": self.imageID,
+            }
+            for name in names
+        ]
+        # every VM is prepared as soon as it is done, while the others are
+        # still being created
+        with ThreadPoolExecutor(max_workers=max(len(specs), 1)) as executor:
+            prepared = []
+
+            def onDone(handle):
+                prepared.append(
+                    executor.submit(
+                        self._prepare, handle, time.monotonic(), sshTimeoutInSecs, login
+                    )
+                )
+
+            handles, _ = self.vmObj.createVMs(
+                specs, maxInFlight=maxInFlight, onDone=onDone
+            )
+            if handles is None:
+                return None
+            guests = [future.result() for future in prepared]
+
+        # in the order of names
+        order = {name: i for i, name in enumerate(names)}
+        guests.sort(key=lambda guest: order[guest["name"]])
+        return [guest for guest in guests if guest["id"]]
+
+    def placeOn(self, guest, host, timeoutInSecs=600, pollInSecs=10):
+        """
+        live migrate a guest onto host, unless it already runs there.
+
+        Returns:
+            bool: True once the guest is ACTIVE on host.
+        """
+        if guest["host"] == host:
+            return True
+
+        elog.info("placing %s on host %s" % (guest["name"], eutil.bcolor(host)))
+        if not self.vmObj.migrateVM(guest["id"], host=host):
+            return False
+
+        def isPlaced():
+            return (
+                self.vmObj.getStatus(guest["id"]) == "ACTIVE"
+                and self.vmObj.getHost(guest["id"]) == host
+            )
+
+        if not eutil.waitUntil(isPlaced, timeoutInSecs, pollInSecs):
+            elog.error("%s not moved to %s" % (guest["name"], eutil.rcolor(host)))
+            return False
+
+        guest["host"] = host
+        return True
+
+    def close(self):
+        """
+        close the SSH connections to all guests.
+        """
+        for remote in self.remotes:
+            remote.close()
+        self.remotes = []
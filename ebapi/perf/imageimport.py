@@ -0,0 +1,264 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest benchmark engine for image import through glance tasks.
+
+Images of configurable sizes are served from an HTTP server on the test
+host, so the benchmark does not depend on internet access, and imported
+concurrently. Throughput is the image size over the time from the import
+request until the image is active.
+"""
+
+import functools
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.tracker import ResourceTracker
+
+MB = 1048576
+
+
+def getLocalIP(remoteHost):
+    """
+    Returns:
+        string: IP address of the test host on the route to remoteHost, which
+        is the address remoteHost reaches the test host at, unless there is
+        NAT in between.
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+        # connecting a UDP socket sends nothing, it only picks the route
+        sock.connect((remoteHost, 443))
+        return sock.getsockname()[0]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        elog.debug("image server: " + format % args)
+
+
+class ImageServer:
+    """
+    ImageServer serves generated raw images over HTTP from a background
+    thread, implements::
+
+        * addImage - generate an image file of a given size
+        * start    - start serving, returns the base URL
+        * stop     - stop serving and remove the image files
+
+    The server listens on all addresses. The URL advertised to glance uses
+    host, by default the address of the test host on the route to the API.
+
+    Examples:
+        ::
+
+            server = ImageServer(directory)
+            url    = server.start()
+            server.addImage('64mb.raw', 64)
+            try:
+                taskID = imageObj.createImageTask('img', url + '/64mb.raw', 'raw')
+            finally:
+                server.stop()
+    """
+
+    def __init__(self, directory, host=None, port=0):
+        self.directory = directory
+        self.host = host
+        self.port = port
+        self.files = []
+        self.server = None
+        self.thread = None
+
+    def addImage(self, fileName, sizeInMB):
+        """
+        generate an image of sizeInMB, random data repeated, so nothing on
+        the way can compress or skip zeros. Existing files are reused.
+
+        Returns:
+            string: path of the image file.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, fileName)
+        if path not in self.files:
+            self.files.append(path)
+        if os.path.exists(path) and os.path.getsize(path) == sizeInMB * MB:
+            return path
+
+        block = os.urandom(MB)
+        with open(path, "wb") as imageFile:
+            for _ in range(sizeInMB):
+                imageFile.write(block)
+        return path
+
+    def start(self):
+        """
+        Returns:
+            string: base URL of the served images.
+        """
+        handler = functools.partial(_QuietHandler, directory=self.directory)
+        self.server = ThreadingHTTPServer(("", self.port), handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+        host = self.host
+        if not host:
+            host = getLocalIP(urlparse(ConfigParser().getApiURL()).hostname)
+        url = "http://%s:%d" % (host, self.server.server_address[1])
+        elog.info("serving images at %s" % eutil.bcolor(url))
+        return url
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+        for path in self.files:
+            if os.path.exists(path):
+                os.remove(path)
+        self.files = []
+
+
+class ImageImport:
+    """
+    ImageImport imports images concurrently and times them, implements::
+
+        * run - import images, wait for them to be active
+
+    Every image becomes a tracked resource, so the tracker deletes it.
+
+    Examples:
+        ::
+
+            importer = ImageImport(Images(projectID), tracker, netID)
+            results  = importer.run([('ebtestImport0', url, 64)])
+            elog.info(summarizeImports(results))
+    """
+
+    def __init__(self, imageObj, tracker, netID="", maxInFlight=8, timeoutInSecs=1800):
+        self.imageObj = imageObj
+        self.tracker = tracker
+        self.netID = netID
+        self.maxInFlight = maxInFlight
+        self.timeoutInSecs = timeoutInSecs
+
+    def _submit(self, image):
+        name, url, _ = image
+        start = time.monotonic()
+        taskID = self.imageObj.createImageTask(name, url, "raw", self.netID)
+        return taskID, start, time.monotonic() - start
+
+    def _getStatus(self, imageID):
+        image = self.imageObj.getImage(imageID)
+        return image["status"] if image else None
+
+    def _finish(self, image, submitted, task, waitStart):
+        (name, _, sizeInMB), (_, start, acceptTime) = image, submitted
+        result = {
+            "name": name,
+            "sizeInMB": sizeInMB,
+            "ok": False,
+            "acceptTime": acceptTime,
+            "taskTime": None,
+            "activeTime": None,
+            "throughputMBps": None,
+        }
+        if task is None:
+            return result
+
+        result["taskTime"] = waitStart - start + task["doneTime"]
+        imageID = (task.get("result") or {}).get("image_id")
+        if imageID:
+            self.tracker.add(ResourceTracker.IMAGE, imageID, self.imageObj)
+        if task["status"] != "success" or not imageID:
+            elog.error(
+                "import of %s failed: %s" % (eutil.rcolor(name), task.get("message"))
+            )
+            return result
+
+        # the image is usually active once the task succeeded, otherwise the
+        # time to active runs on until it is
+        status = {"image": self._getStatus(imageID)}
+
+        def isFinal():
+            status["image"] = self._getStatus(imageID)
+            return status["image"] in ("active", "killed")
+
+        if status["image"] == "active":
+            result["activeTime"] = result["taskTime"]
+        else:
+            deadline = waitStart + self.timeoutInSecs
+            eutil.waitUntil(isFinal, max(deadline - time.monotonic(), 0), 2)
+            if status["image"] != "active":
+                elog.error("image %s is %s" % (eutil.rcolor(name), status["image"]))
+                return result
+            result["activeTime"] = time.monotonic() - start
+
+        result["ok"] = True
+        result["throughputMBps"] = sizeInMB / result["activeTime"]
+        return result
+
+    def run(self, images):
+        """
+        import images concurrently, at most maxInFlight requests at a time.
+
+        Returns:
+            list: per image its name, sizeInMB, ok, acceptTime, the time the
+            import request took, taskTime and activeTime, the seconds from
+            the request until the task finished and the image was active,
+            and throughputMBps, sizeInMB over activeTime.
+
+        Args:
+            images (list): (name, url, sizeInMB) tuples.
+        """
+        with ThreadPoolExecutor(max_workers=self.maxInFlight) as executor:
+            submitted = list(executor.map(self._submit, images))
+
+            waitStart = time.monotonic()
+            taskIDs = [taskID for taskID, _, _ in submitted if taskID]
+            tasks = self.imageObj.waitForTasks(taskIDs, self.timeoutInSecs)
+            found = [
+                tasks.get(taskID) if taskID else None for taskID, _, _ in submitted
+            ]
+            return list(
+                executor.map(
+                    self._finish,
+                    images,
+                    submitted,
+                    found,
+                    [waitStart] * len(images),
+                )
+            )
+
+
+def summarizeImports(results):
+    """
+    Returns:
+        dict: number of imports, failed imports, stats.summarize of the time
+        to active and the throughput of the successful imports, and the
+        aggregate throughput, MB imported over the time until the last import
+        was active.
+    """
+    done = [r for r in results if r["ok"]]
+    activeTimes = [r["activeTime"] for r in done]
+    return {
+        "imports": len(results),
+        "failed": len(results) - len(done),
+        "activeTime": stats.summarize(activeTimes),
+        "throughputMBps": stats.summarize([r["throughputMBps"] for r in done]),
+        "aggregateMBps": (
+            sum(r["sizeInMB"] for r in done) / max(activeTimes) if done else None
+        ),
+    }
@@ -0,0 +1,250 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest benchmark engine for network throughput with iperf3"""
+
+import json
+from concurrent import futures
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+
+
+def withinTolerance(measured, expected, tolerance=0.1):
+    """
+    Returns:
+        bool: True if measured deviates from expected by at most tolerance,
+        a fraction of expected.
+
+    Examples:
+        ::
+
+            assert withinTolerance(result['receivedKbps'], 1000, 0.1)
+    """
+    return abs(measured - expected) <= tolerance * expected
+
+
+def parseIperfJSON(output):
+    """
+    Returns:
+        dict: summary of an iperf3 --json report, None on failure::
+
+            protocol      - tcp or udp
+            sentKbps      - average sender throughput
+            receivedKbps  - average receiver throughput
+            retransmits   - TCP retransmits, None for UDP
+            jitterMs      - UDP jitter, None for TCP
+            lostPercent   - UDP datagram loss, None for TCP
+            packetsPerSec - UDP datagrams received per second, None for TCP
+            intervals     - throughput of each interval in Kbps, without the
+                            omitted warm-up intervals
+            intervalKbps  - stats.summarize of intervals
+
+    Args:
+        output (string): stdout of the iperf3 client run with --json.
+    """
+    try:
+        content = json.loads(output)
+    except ValueError:
+        elog.error("iperf3 did not report JSON: %s" % eutil.rcolor(output[:200]))
+        return None
+
+    if content.get("error"):
+        elog.error("iperf3 failed: %s" % eutil.rcolor(content["error"]))
+        return None
+
+    protocol = content["start"]["test_start"]["protocol"].lower()
+    end = content["end"]
+    intervals = [
+        interval["sum"]["bits_per_second"] / 1000.0
+        for interval in content.get("intervals", [])
+        if not interval["sum"].get("omitted")
+    ]
+
+    if protocol == "udp":
+        sent = end.get("sum_sent", end["sum"])
+        received = end.get("sum_received", end["sum"])
+        retransmits = None
+        jitterMs = received.get("jitter_ms")
+        lostPercent = received.get("lost_percent")
+        packetsPerSec = None
+        if received.get("packets") is not None and received.get("seconds"):
+            delivered = received["packets"] - received.get("lost_packets", 0)
+            packetsPerSec = delivered / received["seconds"]
+    else:
+        sent = end["sum_sent"]
+        received = end["sum_received"]
+        retransmits = sent.get("retransmits")
+        jitterMs = None
+        lostPercent = None
+        packetsPerSec = None
+
+    return {
+        "protocol": protocol,
+        "sentKbps": sent["bits_per_second"] / 1000.0,
+        "receivedKbps": received["bits_per_second"] / 1000.0,
+        "retransmits": retransmits,
+        "jitterMs": jitterMs,
+        "lostPercent": lostPercent,
+        "packetsPerSec": packetsPerSec,
+        "intervals": intervals,
+        "intervalKbps": stats.summarize(intervals),
+    }
+
+
+class Iperf:
+    """
+    Iperf measures throughput between two RemoteMachines with iperf3 in JSON
+    mode, implements::
+
+        * isInstalled - check for iperf3 on both machines
+        * measure     - one run in one direction, TCP or UDP
+        * measureBoth - one run in each direction
+
+    The server is started in one-off mode for every run, on its own channel
+    next to the client, so no daemon is left behind.
+
+    Examples:
+        ::
+
+            iperf  = Iperf(serverMachine, clientMachine, serverIP)
+            result = iperf.measure(durationInSecs=20, streams=4)
+            assert withinTolerance(result['receivedKbps'], 1000)
+
+            # server to client, UDP at 50 Mbps
+            result = iperf.measure(direction=Iperf.DOWNLOAD, udp=True,
+                                   bitrate='50M')
+    """
+
+    # client to server
+    UPLOAD = "upload"
+    # server to client
+    DOWNLOAD = "download"
+
+    def __init__(self, server, client, serverIP, port=5201):
+        self.server = server
+        self.client = client
+        self.serverIP = serverIP
+        self.port = port
+
+    def isInstalled(self):
+        """
+        Returns:
+            bool: True if iperf3 is installed on server and client.
+        """
+        for machine in (self.server, self.client):
+            rc, _ = machine.run("which iperf3")
+            if rc != 0:
+                elog.error("iperf3 not installed on %s" % eutil.rcolor(machine.host))
+                return False
+        return True
+
+    def _isListening(self):
+        rc, _ = self.server.run(
+            "ss -ltn | grep -q ':%d ' || netstat -ltn | grep -q ':%d '"
+            % (self.port, self.port),
+            timeoutInSecs=10,
+        )
+        return rc == 0
+
+    def measure(
+        self,
+        durationInSecs=20,
+        streams=1,
+        direction=UPLOAD,
+        udp=False,
+        bitrate=None,
+        omitSecs=2,
+    ):
+        """
+        run iperf3 once.
+
+        Returns:
+            dict: see parseIperfJSON, along with direction and streams.
+            None on failure.
+
+        Args:
+            durationInSecs (int)   : measured time, without omitSecs.
+
+            streams        (int)   : parallel client streams.
+
+            direction      (string): Iperf.UPLOAD or Iperf.DOWNLOAD.
+
+            udp            (bool)  : UDP instead of TCP.
+
+            bitrate        (string): target bitrate, e.g. '10M', iperf3
+                                     defaults to 1 Mbps for UDP.
+
+            omitSecs       (int)   : warm-up seconds left out of the report,
+                                     e.g. TCP slow start or a QoS burst.
+        """
+        timeoutInSecs = durationInSecs + omitSecs + 60
+        server = self.server.submit("iperf3 -s -1 -p %d" % self.port, timeoutInSecs)
+        if not eutil.waitUntil(self._isListening, timeoutInSecs=15, sleepInSecs=1):
+            elog.error(
+                "iperf3 server on %s not listening" % eutil.rcolor(self.serverIP)
+            )
+            self.server.run("pkill -f 'iperf3 -s -1 -p %d'" % self.port)
+            return None
+
+        command = "iperf3 -c %s -p %d -J -t %d -O %d -P %d" % (
+            self.serverIP,
+            self.port,
+            durationInSecs,
+            omitSecs,
+            streams,
+        )
+        if direction == self.DOWNLOAD:
+            command += " -R"
+        if udp:
+            command += " -u"
+        if bitrate:
+            command += " -b %s" % bitrate
+
+        # iperf3 reports errors in its JSON output as well, so do not bail out
+        # on the exit status before parsing
+        _, output = self.client.run(command, timeoutInSecs=timeoutInSecs)
+        try:
+            server.result(timeout=15)
+        except futures.TimeoutError:
+            # the client never got through, stop waiting for it
+            self.server.run("pkill -f 'iperf3 -s -1 -p %d'" % self.port)
+
+        result = parseIperfJSON(output)
+        if result is None:
+            return None
+
+        result["direction"] = direction
+        result["streams"] = streams
+        elog.info(
+            "iperf3 %s %s x%d: %s Kbps received, %s retransmits"
+            % (
+                result["protocol"],
+                direction,
+                streams,
+                eutil.bcolor("%.0f" % result["receivedKbps"]),
+                result["retransmits"],
+            )
+        )
+        return result
+
+    def measureBoth(self, **kwargs):
+        """
+        Returns:
+            dict: measure results keyed by Iperf.UPLOAD and Iperf.DOWNLOAD,
+            None on failure.
+
+        Args:
+            kwargs: measure arguments other than direction.
+        """
+        results = {}
+        for direction in (self.UPLOAD, self.DOWNLOAD):
+            result = self.measure(direction=direction, **kwargs)
+            if result is None:
+                return None
+            results[direction] = result
+        return results
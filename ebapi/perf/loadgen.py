@@ -0,0 +1,451 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest load generator for the Edgebricks control plane.
+
+Drives a scenario built on the ebapi lib classes either open loop, at a target
+rate of scenario runs per second, or closed loop, with a fixed number of
+concurrent users, optionally ramping up. Every REST request is timed per
+endpoint, so the results hold latency percentiles, a latency histogram and
+the error rate of each endpoint, next to the same for the scenario runs.
+
+Examples:
+    ::
+
+        python3 -m ebapi.perf.loadgen --scenario listvms --rps 20 --duration 120
+        python3 -m ebapi.perf.loadgen --scenario getproject --concurrency 16 \\
+            --ramp-up 30
+        python3 -m ebapi.perf.loadgen --scenario network --rps 0.5
+"""
+
+import argparse
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.common.rest import RestClient
+from ebapi.lib.edgebricks import BUs, Projects
+from ebapi.lib.neutron import Networks
+from ebapi.lib.nova import VMs
+
+# UUIDs, with or without dashes, and numeric IDs in a URL path
+ID_PATTERN = re.compile(
+    r"/([0-9a-fA-F]{8}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?[0-9a-fA-F]{4}-?"
+    r"[0-9a-fA-F]{12}|\d+)(?=/|$)"
+)
+
+
+def getEndpoint(method, url):
+    """
+    Returns:
+        string: method and URL path with IDs replaced by {id}, so requests for
+        different resources count towards the same endpoint, e.g.
+        'GET /v2/clusters/{id}/projects/{id}/vms'.
+    """
+    return "%s %s" % (method, ID_PATTERN.sub("/{id}", urlsplit(url).path))
+
+
+class Recorder:
+    """
+    Recorder collects latencies and outcomes by endpoint, thread-safe.
+
+    Examples:
+        ::
+
+            recorder = Recorder()
+            recorder.record('GET /v1/hosts', 0.120, True)
+            results  = recorder.getResults()
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # endpoint -> ([latency], errors)
+        self.endpoints = {}
+
+    def record(self, endpoint, latency, ok):
+        with self.lock:
+            latencies, errors = self.endpoints.get(endpoint, ([], 0))
+            latencies.append(latency)
+            self.endpoints[endpoint] = (latencies, errors + (0 if ok else 1))
+
+    def getResults(self):
+        """
+        Returns:
+            dict: keyed by endpoint, requests, errors, errorRate, latency,
+            see stats.summarize, and histogram, see stats.histogram, with
+            latencies in seconds.
+        """
+        with self.lock:
+            endpoints = dict(self.endpoints)
+
+        results = {}
+        for endpoint, (latencies, errors) in sorted(endpoints.items()):
+            results[endpoint] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "errorRate": errors / len(latencies),
+                "latency": stats.summarize(latencies),
+                "histogram": stats.histogram(latencies),
+            }
+        return results
+
+
+class RecordingClient(RestClient):
+    """
+    RecordingClient is a RestClient which times every request into a
+    Recorder, see instrument.
+    """
+
+    def __init__(self, token, recorder):
+        super().__init__(token)
+        self.recorder = recorder
+
+    def _timed(self, method, url, call, *args, **kwargs):
+        endpoint = getEndpoint(method, url)
+        start = time.monotonic()
+        try:
+            response = call(url, *args, **kwargs)
+        except requests.RequestException:
+            self.recorder.record(endpoint, time.monotonic() - start, False)
+            raise
+
+        ok = response is not None and response.ok
+        self.recorder.record(endpoint, time.monotonic() - start, ok)
+        return response
+
+    def get(self, url, *args, **kwargs):
+        return self._timed("GET", url, super().get, *args, **kwargs)
+
+    def put(self, url, *args, **kwargs):
+        return self._timed("PUT", url, super().put, *args, **kwargs)
+
+    def post(self, url, *args, **kwargs):
+        return self._timed("POST", url, super().post, *args, **kwargs)
+
+    def patch(self, url, *args, **kwargs):
+        return self._timed("PATCH", url, super().patch, *args, **kwargs)
+
+    def delete(self, url, *args, **kwargs):
+        return self._timed("DELETE", url, super().delete, *args, **kwargs)
+
+    def deleteWithPayload(self, url, *args, **kwargs):
+        return self._timed("DELETE", url, super().deleteWithPayload, *args, **kwargs)
+
+
+def instrument(obj, recorder):
+    """
+    Returns:
+        object: the lib object, e.g. VMs(projectID), with its RestClient
+        swapped for a RecordingClient with the same token.
+    """
+    obj.client = RecordingClient(obj.client.token, recorder)
+    return obj
+
+
+def _listVMs(recorder):
+    vmObj = instrument(VMs(ConfigParser().getProjectID()), recorder)
+    return lambda i: vmObj.getAllVMs() is not None
+
+
+def _getProject(recorder):
+    testConfig = ConfigParser()
+    projectID = testConfig.getProjectID()
+    projObj = instrument(
+        Projects(
+            testConfig.getDomainName(),
+            testConfig.getProjectAdmin(),
+            testConfig.getProjectAdminPassword(),
+        ),
+        recorder,
+    )
+    return lambda i: projObj.get(projectID) is not None
+
+
+def _createDeleteBU(recorder):
+    buObj = instrument(BUs(), recorder)
+    prefix = "ebtestLoad%d" % os.getpid()
+
+    def run(i):
+        # BU and user names are unique, so runs do not collide, and the
+        # ebtest prefix lets the sweeper pick up what a failed run leaked
+        buID = buObj.create(
+            buName="%sBU%d" % (prefix, i),
+            userName="%sUser%d" % (prefix, i),
+            userPwd=prefix,
+        )
+        if not buID:
+            return False
+        created = buObj.waitForState(buID, state=BUs.BU_STATE_CREATED, sleepInSecs=2)
+        return buObj.delete(buID, force_delete="true") and bool(created)
+
+    return run
+
+
+def _createDeleteNetwork(recorder):
+    networkObj = instrument(Networks(ConfigParser().getProjectID()), recorder)
+    prefix = "Auto-NetLoad%d" % os.getpid()
+
+    def run(i):
+        netID = networkObj.createInternalNetwork(
+            netName="%s-%d" % (prefix, i), subnetName="%s-%d" % (prefix, i)
+        )
+        if not netID:
+            return False
+        return networkObj.deleteInternalNetwork(netID)
+
+    return run
+
+
+# scenario name -> function returning the callable for one scenario run,
+# which takes the run number and returns True on success
+SCENARIOS = {
+    "listvms": _listVMs,
+    "getproject": _getProject,
+    "bu": _createDeleteBU,
+    "network": _createDeleteNetwork,
+}
+
+
+class LoadGenerator:
+    """
+    LoadGenerator runs a scenario under load, implements::
+
+        * runOpen   - start runs at a target rate, however long they take
+        * runClosed - keep a number of concurrent users busy
+        * run       - either of them, and collect the results
+
+    Open loop latencies of the scenario runs are taken from the time a run
+    was due, so a saturated API shows up as queueing delay instead of a
+    lower request rate. With a ramp-up, the rate or the number of users
+    grows linearly to the target over rampUpInSecs.
+
+    Examples:
+        ::
+
+            recorder  = Recorder()
+            generator = LoadGenerator(SCENARIOS['listvms'](recorder), recorder,
+                                      durationInSecs=60, rps=10)
+            results   = generator.run()
+            elog.info(formatResults(results))
+    """
+
+    OPEN = "open"
+    CLOSED = "closed"
+    SCENARIO = "scenario"
+
+    def __init__(
+        self,
+        scenario,
+        recorder,
+        durationInSecs=60,
+        rampUpInSecs=0,
+        rps=None,
+        concurrency=None,
+        maxInFlight=64,
+    ):
+        if bool(rps) == bool(concurrency):
+            raise ValueError("set either rps (open loop) or concurrency (closed loop)")
+
+        self.scenario = scenario
+        self.recorder = recorder
+        self.durationInSecs = durationInSecs
+        self.rampUpInSecs = rampUpInSecs
+        self.rps = rps
+        self.concurrency = concurrency
+        self.maxInFlight = maxInFlight
+        self.scenarioRecorder = Recorder()
+        self.counter = 0
+        self.counterLock = threading.Lock()
+
+    def _nextRun(self):
+        with self.counterLock:
+            self.counter += 1
+            return self.counter
+
+    def _runOnce(self, dueTime):
+        ok = False
+        try:
+            ok = bool(self.scenario(self._nextRun()))
+        except Exception as e:
+            elog.error("scenario run failed: %s" % eutil.rcolor(e))
+        self.scenarioRecorder.record(self.SCENARIO, time.monotonic() - dueTime, ok)
+
+    def _getRate(self, elapsed):
+        if self.rampUpInSecs and elapsed < self.rampUpInSecs:
+            # start at a tenth of the rate, a zero rate would never start
+            return self.rps * max(elapsed / self.rampUpInSecs, 0.1)
+        return self.rps
+
+    def runOpen(self):
+        """
+        start scenario runs at rps per second for durationInSecs, at most
+        maxInFlight of them run at a time, the others queue.
+        """
+        start = time.monotonic()
+        dueTime = start
+        with ThreadPoolExecutor(max_workers=self.maxInFlight) as executor:
+            while dueTime - start < self.durationInSecs:
+                delay = dueTime - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                executor.submit(self._runOnce, dueTime)
+                dueTime += 1.0 / self._getRate(dueTime - start)
+
+    def _user(self, startDelay, deadline):
+        time.sleep(startDelay)
+        while time.monotonic() < deadline:
+            self._runOnce(time.monotonic())
+
+    def runClosed(self):
+        """
+        keep concurrency users running the scenario back to back for
+        durationInSecs, the users start spread over rampUpInSecs.
+        """
+        deadline = time.monotonic() + self.durationInSecs
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for user in range(self.concurrency):
+                startDelay = self.rampUpInSecs * user / self.concurrency
+                executor.submit(self._user, startDelay, deadline)
+
+    def run(self):
+        """
+        Returns:
+            dict: model, target, durationInSecs, rampUpInSecs, elapsed, rps,
+            the achieved scenario runs per second, scenario, the Recorder
+            results of the scenario runs, and endpoints, the Recorder results
+            of the REST requests.
+        """
+        model = self.OPEN if self.rps else self.CLOSED
+        elog.info(
+            "running %s loop load, target %s for %ss"
+            % (model, eutil.bcolor(self.rps or self.concurrency), self.durationInSecs)
+        )
+        start = time.monotonic()
+        if model == self.OPEN:
+            self.runOpen()
+        else:
+            self.runClosed()
+        elapsed = time.monotonic() - start
+
+        scenario = self.scenarioRecorder.getResults().get(self.SCENARIO)
+        return {
+            "model": model,
+            "target": self.rps or self.concurrency,
+            "durationInSecs": self.durationInSecs,
+            "rampUpInSecs": self.rampUpInSecs,
+            "elapsed": elapsed,
+            "rps": scenario["requests"] / elapsed if scenario else 0.0,
+            "scenario": scenario,
+            "endpoints": self.recorder.getResults(),
+        }
+
+
+def formatResults(results):
+    """
+    Returns:
+        string: requests, error rate and p50/p95/p99 latency in ms of the
+        scenario runs and of each endpoint, as a table.
+    """
+    rows = [("scenario", results["scenario"])]
+    rows += sorted(results["endpoints"].items())
+    lines = [
+        "%-60s %9s %7s %9s %9s %9s"
+        % ("endpoint", "requests", "errors", "p50 ms", "p95 ms", "p99 ms")
+    ]
+    for endpoint, result in rows:
+        if not result:
+            continue
+        latency = result["latency"]
+        lines.append(
+            "%-60s %9d %6.1f%% %9.1f %9.1f %9.1f"
+            % (
+                endpoint,
+                result["requests"],
+                100.0 * result["errorRate"],
+                1000 * latency["p50"],
+                1000 * latency["p95"],
+                1000 * latency["p99"],
+            )
+        )
+    return "\n".join(lines)
+
+
+def runScenario(name, **kwargs):
+    """
+    Returns:
+        dict: LoadGenerator.run results of the named scenario, along with the
+        scenario name.
+
+    Args:
+        name   (string): one of SCENARIOS.
+        kwargs         : LoadGenerator arguments.
+    """
+    recorder = Recorder()
+    generator = LoadGenerator(SCENARIOS[name](recorder), recorder, **kwargs)
+    results = generator.run()
+    results["name"] = name
+    elog.info("%s at %.2f runs/s:\n%s" % (name, results["rps"], formatResults(results)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="generate load on the Edgebricks control plane"
+    )
+    parser.add_argument(
+        "--scenario",
+        choices=sorted(SCENARIOS),
+        default="listvms",
+        help="scenario to run, default listvms",
+    )
+    model = parser.add_mutually_exclusive_group(required=True)
+    model.add_argument(
+        "--rps", type=float, help="open loop: scenario runs started per second"
+    )
+    model.add_argument(
+        "--concurrency", type=int, help="closed loop: number of concurrent users"
+    )
+    parser.add_argument(
+        "--duration", type=int, default=60, help="seconds of load, default 60"
+    )
+    parser.add_argument(
+        "--ramp-up",
+        type=int,
+        default=0,
+        help="seconds to ramp up to the target, default 0",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=64,
+        help="open loop: maximum concurrent scenario runs, default 64",
+    )
+    args = parser.parse_args()
+
+    results = runScenario(
+        args.scenario,
+        durationInSecs=args.duration,
+        rampUpInSecs=args.ramp_up,
+        rps=args.rps,
+        concurrency=args.concurrency,
+        maxInFlight=args.max_in_flight,
+    )
+    stats.saveResults("loadgen-%s" % args.scenario, results)
+    return 0 if results["scenario"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,238 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest benchmark engine for live migration"""
+
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.logger import elog
+from ebapi.perf.iperf import Iperf
+
+PERCENTILES = ("p50", "p95", "max")
+
+
+def parseTimestampedPing(output):
+    """
+    Returns:
+        list: unix timestamps of the replies in the output of ping -D.
+    """
+    return [
+        float(stamp)
+        for stamp in re.findall(r"^\[(\d+\.\d+)\].*time=", output or "", re.M)
+    ]
+
+
+def getDowntime(timestamps, intervalInSecs):
+    """
+    Returns:
+        float: longest time without ping replies in seconds, beyond the probe
+        interval, None if there were less than two replies.
+
+    Args:
+        timestamps     (list) : reply timestamps, see parseTimestampedPing.
+
+        intervalInSecs (float): time between two echo requests.
+    """
+    if len(timestamps) < 2:
+        return None
+
+    ordered = sorted(timestamps)
+    gap = max(b - a for a, b in zip(ordered, ordered[1:]))
+    return max(gap - intervalInSecs, 0.0)
+
+
+def getThroughputDip(intervals):
+    """
+    Returns:
+        float: drop of the slowest iperf3 interval below the median interval,
+        0.2 for 20% below, None without intervals.
+
+    Args:
+        intervals (list): per interval throughput in Kbps, see Iperf.measure.
+    """
+    if not intervals:
+        return None
+
+    median = statistics.median(intervals)
+    if not median:
+        return None
+    return max(1 - min(intervals) / median, 0.0)
+
+
+class MigrationProbe:
+    """
+    MigrationProbe live migrates guests while a prober guest pings them and
+    drives iperf3 traffic to them, implements::
+
+        * measure    - migrate one guest, probing it
+        * measureAll - migrate guests concurrently, each with its own probe
+
+    Guests are the dicts of guests.Guests. The downtime is the longest gap in
+    the ping replies, so it does not depend on the clocks of the guests and
+    the test host agreeing. Probes run for probeInSecs, the migration is
+    started settleInSecs into the probe and has to finish before the probe
+    ends for the downtime and throughput dip to cover all of it.
+
+    Examples:
+        ::
+
+            probe  = MigrationProbe(guests, proberVM)
+            result = probe.measure(vm, targetHost)
+            elog.info('downtime %.2fs' % result['downtime'])
+    """
+
+    def __init__(
+        self,
+        guests,
+        prober,
+        probeInSecs=120,
+        settleInSecs=10,
+        pingIntervalInSecs=0.2,
+        basePort=5201,
+    ):
+        self.guests = guests
+        self.prober = prober
+        self.probeInSecs = probeInSecs
+        self.settleInSecs = settleInSecs
+        self.pingIntervalInSecs = pingIntervalInSecs
+        self.basePort = basePort
+
+    def measure(self, vm, host, port=None, workload=None):
+        """
+        migrate vm onto host while probing it.
+
+        Returns:
+            dict: name, source and target host, migrated, True once
+            the vm runs on host, migrationTime in seconds from the migrate
+            request until the vm was seen ACTIVE on host, downtime in seconds,
+            throughputDip and the iperf3 result. Probe values are None if the
+            probe failed.
+
+        Args:
+            vm       (dict)  : guest to migrate.
+
+            host     (string): target host name.
+
+            port     (int)   : iperf3 port, distinct per concurrent probe.
+
+            workload (string): command started in the vm for the duration of
+                               the probe, e.g. to dirty memory.
+        """
+        port = port or self.basePort
+        remote = self.prober["remote"]
+        ping = remote.submit(
+            "ping -D -i %s -w %d %s"
+            % (self.pingIntervalInSecs, self.probeInSecs, vm["fixedIP"]),
+            self.probeInSecs + 30,
+        )
+        if workload:
+            vm["remote"].submit(
+                "timeout %d %s" % (self.probeInSecs, workload), self.probeInSecs + 30
+            )
+
+        iperf = Iperf(vm["remote"], remote, vm["fixedIP"], port)
+        result = {
+            "name": vm["name"],
+            "source": vm["host"],
+            "target": host,
+        }
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            traffic = executor.submit(
+                iperf.measure, durationInSecs=self.probeInSecs, omitSecs=0
+            )
+            time.sleep(self.settleInSecs)
+
+            start = time.monotonic()
+            result["migrated"] = self.guests.placeOn(vm, host, pollInSecs=1)
+            result["migrationTime"] = time.monotonic() - start
+            result["iperf"] = traffic.result()
+
+        replies = parseTimestampedPing(ping.result().stdout)
+        result["downtime"] = getDowntime(replies, self.pingIntervalInSecs)
+        result["throughputDip"] = getThroughputDip(
+            result["iperf"]["intervals"] if result["iperf"] else None
+        )
+        elog.info(
+            "migrated %s to %s in %.1fs, downtime %ss"
+            % (
+                eutil.bcolor(vm["name"]),
+                eutil.bcolor(host),
+                result["migrationTime"],
+                eutil.bcolor(result["downtime"]),
+            )
+        )
+        return result
+
+    def measureAll(self, moves, workload=None):
+        """
+        migrate guests concurrently.
+
+        Returns:
+            list: measure results, in the order of moves.
+
+        Args:
+            moves    (list)  : (vm, target host) tuples.
+
+            workload (string): see measure.
+        """
+        with ThreadPoolExecutor(max_workers=len(moves)) as executor:
+            futures = [
+                executor.submit(self.measure, vm, host, self.basePort + i, workload)
+                for i, (vm, host) in enumerate(moves)
+            ]
+            return [future.result() for future in futures]
+
+
+def summarizeMigrations(results):
+    """
+    Returns:
+        dict: number of migrations, failed migrations and stats.summarize of
+        migrationTime, downtime and throughputDip over the successful ones.
+    """
+    done = [r for r in results if r["migrated"]]
+    summary = {"migrations": len(results), "failed": len(results) - len(done)}
+    for key in ("migrationTime", "downtime", "throughputDip"):
+        summary[key] = stats.summarize([r[key] for r in done if r[key] is not None])
+    return summary
+
+
+def formatMigrations(summaries):
+    """
+    Returns:
+        string: plain text table with one row per flavor and concurrency,
+        p50/p95/max of migration time and downtime in seconds and the p95
+        throughput dip in percent.
+
+    Args:
+        summaries (list): summarizeMigrations dicts with flavor and
+                          concurrency keys.
+    """
+    rows = [["flavor", "concurrency", "migrations", "failed"]]
+    rows[0] += ["%s %s" % (k, p) for k in ("time", "downtime") for p in PERCENTILES]
+    rows[0].append("dip p95")
+    for summary in summaries:
+        row = [
+            summary["flavor"],
+            summary["concurrency"],
+            summary["migrations"],
+            summary["failed"],
+        ]
+        for key in ("migrationTime", "downtime"):
+            values = summary[key] or {}
+            row += ["%.2f" % values[p] if p in values else "-" for p in PERCENTILES]
+        dip = summary["throughputDip"] or {}
+        row.append("%.0f%%" % (100 * dip["p95"]) if dip else "-")
+        rows.append([str(cell) for cell in row])
+
+    widths = [max(len(row[i]) for row in rows) + 2 for i in range(len(rows[0]))]
+    return "\n".join(
+        "".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
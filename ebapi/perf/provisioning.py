@@ -0,0 +1,191 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""ebtest benchmark engine for VM provisioning time per boot source"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from ebapi.common import stats
+from ebapi.lib.cinder import Snapshots, Volumes
+from ebapi.lib.tracker import ResourceTracker
+
+# image     - boot volume copied from the image
+# snapshot  - boot volume created from a snapshot of a volume of the image
+# volume    - boot a clone of a volume of the image, cloned beforehand
+SOURCES = ("image", "snapshot", "volume")
+
+
+class BootSources:
+    """
+    BootSources prepares boot sources of one image and hands out createVM
+    arguments booting from them, implements::
+
+        * prepare  - create the sources VMs of a boot source need
+        * getSpecs - createVMs specs for VMs booting from a source
+
+    The volume of the image and its snapshot are created once and shared by
+    all VMs, clones are created per VM by prepare, concurrently, since every
+    VM needs a volume of its own. Preparation times are kept in prepTimes,
+    they are not part of the provisioning time of the VMs.
+
+    Examples:
+        ::
+
+            sources = BootSources(projectID, tracker, imageID)
+            deps    = sources.prepare('snapshot', names)
+            specs   = sources.getSpecs('snapshot', names, flavorID, netID)
+            handles, timing = VMs(projectID).createVMs(specs)
+    """
+
+    def __init__(
+        self, projectID, tracker, imageID, volumeType=None, sizeInGB=1, maxInFlight=8
+    ):
+        self.tracker = tracker
+        self.imageID = imageID
+        self.volumeType = volumeType
+        self.sizeInGB = sizeInGB
+        self.maxInFlight = maxInFlight
+        self.volumeObj = Volumes(projectID)
+        self.snapObj = Snapshots(projectID)
+        self.volumeKey = None
+        self.snapKey = None
+        self.clones = {}
+        self.prepTimes = {}
+
+    def _createVolume(self, volName, **source):
+        start = time.monotonic()
+        volumeID = self.volumeObj.createVolume(
+            volName, self.sizeInGB, self.volumeType, **source
+        )
+        if not volumeID:
+            return None, None
+        key = self.tracker.add(ResourceTracker.VOLUME, volumeID, self.volumeObj)
+        if not self.volumeObj.waitForStatus(volumeID, "available", 900):
+            return None, None
+        return key, time.monotonic() - start
+
+    def _prepareVolume(self):
+        if self.volumeKey is None:
+            self.volumeKey, prepTime = self._createVolume(
+                "ebtestBootSource", imageID=self.imageID
+            )
+            self.prepTimes["volume"] = prepTime
+        return self.volumeKey
+
+    def _prepareSnapshot(self):
+        if self.snapKey is None and self._prepareVolume():
+            start = time.monotonic()
+            snapID = self.snapObj.createSnapshot(self.volumeKey[1], "ebtestBootSource")
+            if not snapID:
+                return None
+            key = self.tracker.add(
+                ResourceTracker.SNAPSHOT, snapID, self.snapObj, [self.volumeKey]
+            )
+            if not self.snapObj.waitForStatus(snapID, "available", 900):
+                return None
+            self.snapKey = key
+            self.prepTimes["snapshot"] = time.monotonic() - start
+        return self.snapKey
+
+    def _prepareClones(self, names):
+        if not self._prepareVolume():
+            return None
+
+        def clone(name):
+            return self._createVolume(name, sourceVolID=self.volumeKey[1])
+
+        with ThreadPoolExecutor(max_workers=self.maxInFlight) as executor:
+            cloned = list(executor.map(clone, names))
+        if not all(key for key, _ in cloned):
+            return None
+
+        self.prepTimes["clone"] = stats.summarize([t for _, t in cloned])
+        for name, (key, _) in zip(names, cloned):
+            self.clones[name] = key
+        return [key for key, _ in cloned]
+
+    def prepare(self, source, names):
+        """
+        create what VMs booting from source need.
+
+        Returns:
+            list: tracker keys the VMs depend on, None on failure.
+
+        Args:
+            source (string): one of SOURCES.
+
+            names  (list)  : names of the VMs, clones are named <name>Boot.
+        """
+        if source == "image":
+            return []
+        if source == "snapshot":
+            snapKey = self._prepareSnapshot()
+            return [snapKey] if snapKey else None
+        return self._prepareClones(["%sBoot" % name for name in names])
+
+    def getSpecs(self, source, names, flavorID, networkID):
+        """
+        Returns:
+            list: createVMs specs of VMs booting from source, see
+            VMs.createVM, after prepare.
+        """
+        specs = []
+        for name in names:
+            spec = {"vmName": name, "flavorID": flavorID, "networkID": networkID}
+            if source == "image":
+                spec["imageID"] = self.imageID
+            elif source == "snapshot":
+                spec["snapshotID"] = self.snapKey[1]
+            else:
+                spec["volumeID"] = self.clones["%sBoot" % name][1]
+            if source != "volume":
+                spec["volumeType"] = self.volumeType
+                spec["volumeSizeInGB"] = self.sizeInGB
+            specs.append(spec)
+        return specs
+
+
+def summarizeProvisioning(handles):
+    """
+    Returns:
+        dict: number of VMs, failed VMs and stats.summarize of the accept and
+        active times of the VMs which became ACTIVE.
+
+    Args:
+        handles (list): handles of VMs.createVMs.
+    """
+    done = [h for h in handles if h["ok"]]
+    return {
+        "vms": len(handles),
+        "failed": len(handles) - len(done),
+        "acceptTime": stats.summarize([h["acceptTime"] for h in done]),
+        "activeTime": stats.summarize([h["activeTime"] for h in done]),
+    }
+
+
+def formatProvisioning(results):
+    """
+    Returns:
+        string: plain text table with one row per boot source, p50/p95/max of
+        the time to ACTIVE in seconds.
+
+    Args:
+        results (list): summarizeProvisioning dicts with a source key.
+    """
+    rows = [["source", "vms", "failed", "active p50", "active p95", "active max"]]
+    for result in results:
+        active = result["activeTime"] or {}
+        row = [result["source"], result["vms"], result["failed"]]
+        row += [
+            "%.1f" % active[p] if p in active else "-" for p in ("p50", "p95", "max")
+        ]
+        rows.append([str(cell) for cell in row])
+
+    widths = [max(len(row[i]) for row in rows) + 2 for i in range(len(rows[0]))]
+    return "\n".join(
+        "".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows
+    )
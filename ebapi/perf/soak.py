@@ -0,0 +1,532 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+"""
+ebtest soak runner with drift detection.
+
+Scenarios, the VM lifecycle, network create/delete and BU churn, run in a
+loop for hours. Every request and every wait for a state is timed, and
+every sampleInSecs the samples are summarized per operation and appended to
+a time series file, one JSON line per sample, so a running soak can be
+followed. Once the baseline period, the first hour by default, is over,
+every sample is compared against it, and operations whose latency or
+failure rate drifted are flagged. Slow degradation of the control plane,
+like services leaking memory, only shows up this way.
+
+Examples:
+    ::
+
+        python3 -m ebapi.perf.soak --duration 28800
+        python3 -m ebapi.perf.soak --scenarios network,bu --sample 120
+"""
+
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.edgebricks import BUs
+from ebapi.lib.neutron import Networks
+from ebapi.lib.nova import VMs
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf.churn import GONE, watchStates
+from ebapi.perf.guests import getFlavorID
+
+# vm      - create a VM, wait for ACTIVE, delete it
+# network - create a network, delete it, wait for it to be gone
+# bu      - create a BU, wait for CREATED, delete it, wait for DELETED
+SCENARIOS = ("vm", "network", "bu")
+
+
+def summarizeSamples(samples):
+    """
+    Returns:
+        dict: per operation count, errors, errorRate, and p50, p95 and max
+        of the latency of the successful samples, None without any.
+
+    Args:
+        samples (list): [seconds into the run, operation, latency, ok].
+    """
+    operations = {}
+    for _, operation, latency, ok in samples:
+        operations.setdefault(operation, []).append((latency, ok))
+
+    summary = {}
+    for operation, found in sorted(operations.items()):
+        errors = len([ok for _, ok in found if not ok])
+        latency = stats.summarize([latency for latency, ok in found if ok])
+        summary[operation] = {
+            "count": len(found),
+            "errors": errors,
+            "errorRate": errors / len(found),
+            "p50": latency["p50"] if latency else None,
+            "p95": latency["p95"] if latency else None,
+            "max": latency["max"] if latency else None,
+        }
+    return summary
+
+
+def detectDrift(baseline, current, latencyFactor=1.5, maxRateIncrease=0.02, minCount=3):
+    """
+    compare a sample against the baseline, operation by operation.
+
+    Returns:
+        list: one dict per drift, with operation, metric, p95 or errorRate,
+        and the baseline and current values.
+
+    Args:
+        baseline        (dict) : summarizeSamples of the baseline period.
+
+        current         (dict) : summarizeSamples of a later sample.
+
+        latencyFactor   (float): p95 latency above the baseline p95 times
+                                 latencyFactor is drift.
+
+        maxRateIncrease (float): failure rate above the baseline failure
+                                 rate plus maxRateIncrease is drift, 0.02 is
+                                 2 percentage points.
+
+        minCount        (int)  : samples an operation needs, in the baseline
+                                 and the current sample, to be compared.
+
+    Examples:
+        ::
+
+            drifts = detectDrift(baseline, summarizeSamples(window))
+            for drift in drifts:
+                elog.error('%(operation)s %(metric)s drifted' % drift)
+    """
+    drifts = []
+    for operation, now in sorted(current.items()):
+        then = baseline.get(operation)
+        if not then or then["count"] < minCount or now["count"] < minCount:
+            continue
+
+        if then["p95"] and now["p95"] and now["p95"] > then["p95"] * latencyFactor:
+            drifts.append(
+                {
+                    "operation": operation,
+                    "metric": "p95",
+                    "baseline": then["p95"],
+                    "current": now["p95"],
+                }
+            )
+        if now["errorRate"] > then["errorRate"] + maxRateIncrease:
+            drifts.append(
+                {
+                    "operation": operation,
+                    "metric": "errorRate",
+                    "baseline": then["errorRate"],
+                    "current": now["errorRate"],
+                }
+            )
+    return drifts
+
+
+class Soak:
+    """
+    Soak loops scenarios for durationInSecs, samples their latencies and
+    failure rates periodically and flags drift against the baseline period,
+    implements::
+
+        * run - soak and collect the results
+
+    Every scenario runs concurrency loops of its own. Created resources are
+    tracked until they are deleted, so whatever a failing loop leaves behind
+    is torn down at the end, and named ebtestSoak<pid>... for the sweeper.
+    The vm scenario boots the [perf] imageid on the [perf] networkid.
+
+    Examples:
+        ::
+
+            soak    = Soak(projectID, ['vm', 'network'], durationInSecs=28800)
+            results = soak.run()
+            elog.info(formatSoak(results))
+            assert not results['drift']
+    """
+
+    # pause of a loop after a failure it cannot go on from right away
+    RETRY_IN_SECS = 30
+
+    def __init__(
+        self,
+        projectID,
+        scenarios=SCENARIOS,
+        durationInSecs=14400,
+        sampleInSecs=300,
+        baselineInSecs=3600,
+        concurrency=1,
+        latencyFactor=1.5,
+        maxRateIncrease=0.02,
+        stateTimeoutInSecs=600,
+        seriesPath=None,
+    ):
+        self.projectID = projectID
+        self.scenarios = list(scenarios)
+        self.durationInSecs = durationInSecs
+        self.sampleInSecs = sampleInSecs
+        self.baselineInSecs = baselineInSecs
+        self.concurrency = concurrency
+        self.latencyFactor = latencyFactor
+        self.maxRateIncrease = maxRateIncrease
+        self.stateTimeoutInSecs = stateTimeoutInSecs
+        self.seriesPath = seriesPath or os.path.join(
+            stats.getResultsDir(), "soak-%s.jsonl" % time.strftime("%Y%m%d-%H%M%S")
+        )
+        self.prefix = "ebtestSoak%d" % os.getpid()
+        self.tracker = ResourceTracker()
+        self.lock = threading.Lock()
+        self.start = None
+        self.cycles = 0
+        # [seconds into the run, operation, latency, ok] since the last sample
+        self.pending = []
+        # every sample of the baseline period
+        self.baselineSamples = []
+        self.baseline = None
+        self.totals = []
+        self.series = []
+        self.drift = []
+
+    def _nextCycle(self):
+        with self.lock:
+            self.cycles += 1
+            return self.cycles
+
+    def _record(self, operation, latency, ok):
+        with self.lock:
+            self.pending.append(
+                [time.monotonic() - self.start, operation, latency, bool(ok)]
+            )
+
+    def _timed(self, operation, call):
+        start = time.monotonic()
+        result = None
+        try:
+            result = call()
+        except Exception as e:
+            elog.error("%s failed: %s" % (operation, eutil.rcolor(e)))
+        self._record(operation, time.monotonic() - start, result)
+        return result
+
+    def _track(self, kind, resourceID, obj):
+        with self.lock:
+            return self.tracker.add(kind, resourceID, obj)
+
+    def _untrack(self, key):
+        with self.lock:
+            self.tracker.remove(key)
+
+    def _getVMSpec(self):
+        testConfig = ConfigParser("perf")
+        flavorID = getFlavorID(self.projectID)
+        networkID = testConfig.getOptionalConfig("networkid")
+        imageID = testConfig.getOptionalConfig("imageid")
+        if not (flavorID and networkID and imageID):
+            elog.error("vm scenario needs [perf] networkid, imageid and a flavor")
+            return None
+        return {"flavorID": flavorID, "networkID": networkID, "imageID": imageID}
+
+    def _vmCycle(self, vmObj, vmSpec):
+        spec = dict(vmSpec, vmName="%sVM%d" % (self.prefix, self._nextCycle()))
+        handles, _ = vmObj.createVMs([spec], maxInFlight=1)
+        if handles is None:
+            # over quota, the VMs of a previous cycle are still being deleted
+            self._record("vm create", 0, False)
+            time.sleep(self.RETRY_IN_SECS)
+            return
+
+        handle = handles[0]
+        self._record("vm create", handle.get("acceptTime", 0), "acceptTime" in handle)
+        if not handle["id"]:
+            return
+        key = self._track(ResourceTracker.VM, handle["id"], vmObj)
+        self._record("vm to ACTIVE", handle.get("activeTime", 0), handle["ok"])
+
+        # deleteVM returns once the VM is gone
+        if self._timed("vm delete", lambda: vmObj.deleteVM(handle["id"])):
+            self._untrack(key)
+
+    def _networkCycle(self, networkObj):
+        name = "%sNet%d" % (self.prefix, self._nextCycle())
+        networkID = self._timed(
+            "network create",
+            lambda: networkObj.createInternalNetwork(name, name + "Subnet"),
+        )
+        if not networkID:
+            return
+        key = self._track(ResourceTracker.NETWORK, networkID, networkObj)
+
+        if not self._timed(
+            "network delete", lambda: networkObj.deleteInternalNetwork(networkID)
+        ):
+            return
+        if self._timed(
+            "network to deleted",
+            lambda: networkObj.waitForDelete(networkID, self.stateTimeoutInSecs),
+        ):
+            self._untrack(key)
+
+    def _waitForBUState(self, operation, buObj, buID, target, gone=GONE):
+        def getState():
+            buRsp = buObj.get(buID)
+            return gone if buRsp is None else buRsp["domain_state"]
+
+        start = time.monotonic()
+        watched = watchStates(getState, target, self.stateTimeoutInSecs)
+        self._record(operation, time.monotonic() - start, watched["reached"])
+        return watched["reached"]
+
+    def _buCycle(self, buObj):
+        cycle = self._nextCycle()
+        buName = "%sBU%d" % (self.prefix, cycle)
+        buID = self._timed(
+            "bu create",
+            lambda: buObj.create(
+                buName=buName,
+                userName="%sUser%d" % (self.prefix, cycle),
+                userPwd=self.prefix,
+            ),
+        )
+        if not buID:
+            return
+        key = self._track(ResourceTracker.BU, buID, buObj)
+
+        self._waitForBUState("bu to CREATED", buObj, buID, BUs.BU_STATE_CREATED)
+        if not self._timed(
+            "bu delete", lambda: buObj.delete(buID, force_delete="true")
+        ):
+            return
+        # a deleted BU may no longer be returned at all
+        if self._waitForBUState(
+            "bu to DELETED",
+            buObj,
+            buID,
+            BUs.BU_STATE_DELETED,
+            gone=BUs.BU_STATE_DELETED,
+        ):
+            self._untrack(key)
+
+    def _loop(self, scenario, deadline):
+        if scenario == "vm":
+            vmSpec = self._getVMSpec()
+            if vmSpec is None:
+                return
+            cycle = functools.partial(self._vmCycle, VMs(self.projectID), vmSpec)
+        elif scenario == "network":
+            cycle = functools.partial(self._networkCycle, Networks(self.projectID))
+        else:
+            cycle = functools.partial(self._buCycle, BUs())
+
+        while time.monotonic() < deadline:
+            try:
+                cycle()
+            except Exception as e:
+                # a soak outlives single failures
+                elog.error("%s cycle failed: %s" % (scenario, eutil.rcolor(e)))
+                time.sleep(self.RETRY_IN_SECS)
+
+    def _sample(self, final=False):
+        with self.lock:
+            samples, self.pending = self.pending, []
+        seconds = time.monotonic() - self.start
+        self.totals += samples
+
+        inBaseline = [s for s in samples if s[0] < self.baselineInSecs]
+        self.baselineSamples += inBaseline
+        if self.baseline is None and seconds >= self.baselineInSecs:
+            self.baseline = summarizeSamples(self.baselineSamples)
+            elog.info("soak baseline: %s" % self.baseline)
+
+        summary = summarizeSamples(samples)
+        drifts = []
+        if self.baseline is not None and len(inBaseline) < len(samples):
+            drifts = detectDrift(
+                self.baseline,
+                summarizeSamples([s for s in samples if s[0] >= self.baselineInSecs]),
+                self.latencyFactor,
+                self.maxRateIncrease,
+            )
+        for drift in drifts:
+            elog.error(
+                "%s %s drifted from %.3f to %s after %ds"
+                % (
+                    drift["operation"],
+                    drift["metric"],
+                    drift["baseline"],
+                    eutil.rcolor("%.3f" % drift["current"]),
+                    seconds,
+                )
+            )
+            drift["time"] = seconds
+        self.drift += drifts
+
+        point = {
+            "time": seconds,
+            "wallTime": time.time(),
+            "final": final,
+            "operations": summary,
+            "drift": drifts,
+        }
+        self.series.append(point)
+        try:
+            os.makedirs(os.path.dirname(self.seriesPath) or ".", exist_ok=True)
+            with open(self.seriesPath, "a", encoding="UTF-8") as f:
+                f.write(json.dumps(point, sort_keys=True) + "\n")
+        except OSError as e:
+            elog.error("failed to append soak sample: %s" % eutil.rcolor(e))
+
+    def run(self):
+        """
+        Returns:
+            dict: the results::
+
+                cycles     - scenario cycles started
+                seriesPath - time series file, one sample per line
+                samples    - number of samples taken
+                baseline   - summarizeSamples of the baseline period, None
+                             if the soak ended before it did
+                operations - summarizeSamples of the whole soak
+                drift      - detectDrift results with the time they were
+                             seen at
+                leftovers  - resources the scenarios did not delete, torn
+                             down at the end
+                teardown   - True if tearing down the leftovers succeeded
+        """
+        elog.info(
+            "soaking %s with %s loops each for %ss, sampling every %ss into %s"
+            % (
+                ", ".join(self.scenarios),
+                self.concurrency,
+                self.durationInSecs,
+                self.sampleInSecs,
+                eutil.bcolor(self.seriesPath),
+            )
+        )
+        self.start = time.monotonic()
+        deadline = self.start + self.durationInSecs
+        loops = self.scenarios * self.concurrency
+        with ThreadPoolExecutor(max_workers=len(loops)) as executor:
+            futures = [executor.submit(self._loop, s, deadline) for s in loops]
+            while wait(futures, timeout=self.sampleInSecs).not_done:
+                self._sample()
+        self._sample(final=True)
+
+        leftovers = [
+            {"kind": kind, "id": resourceID}
+            for kind, resourceID in sorted(self.tracker.resources)
+        ]
+        return {
+            "cycles": self.cycles,
+            "seriesPath": self.seriesPath,
+            "samples": len(self.series),
+            "baseline": self.baseline,
+            "operations": summarizeSamples(self.totals),
+            "drift": self.drift,
+            "leftovers": leftovers,
+            "teardown": self.tracker.teardown(),
+        }
+
+
+def formatSoak(results):
+    """
+    Returns:
+        string: operations with count, errors and p50/p95 against the
+        baseline p95, in seconds, followed by the drift, as a table.
+    """
+    lines = [
+        "%-24s %7s %7s %8s %8s %8s" % ("", "count", "errors", "p50", "p95", "base p95")
+    ]
+    baseline = results["baseline"] or {}
+    for operation, result in results["operations"].items():
+        base = (baseline.get(operation) or {}).get("p95")
+        lines.append(
+            "%-24s %7d %7d %8s %8s %8s"
+            % (
+                operation,
+                result["count"],
+                result["errors"],
+                "%.2f" % result["p50"] if result["p50"] is not None else "-",
+                "%.2f" % result["p95"] if result["p95"] is not None else "-",
+                "%.2f" % base if base is not None else "-",
+            )
+        )
+    for drift in results["drift"]:
+        lines.append(
+            "drift at %ds: %s %s %.3f -> %.3f"
+            % (
+                drift["time"],
+                drift["operation"],
+                drift["metric"],
+                drift["baseline"],
+                drift["current"],
+            )
+        )
+    lines.append(
+        "%d cycles, %d samples, %d drifts, %d leftovers"
+        % (
+            results["cycles"],
+            results["samples"],
+            len(results["drift"]),
+            len(results["leftovers"]),
+        )
+    )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="loop scenarios for hours and flag latency and failure drift"
+    )
+    parser.add_argument(
+        "--scenarios",
+        default=",".join(SCENARIOS),
+        help="comma separated scenarios, default %s" % ",".join(SCENARIOS),
+    )
+    parser.add_argument(
+        "--duration", type=int, default=14400, help="seconds of soak, default 14400"
+    )
+    parser.add_argument(
+        "--sample", type=int, default=300, help="seconds between samples, default 300"
+    )
+    parser.add_argument(
+        "--baseline",
+        type=int,
+        default=3600,
+        help="seconds of the baseline period, default 3600",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=1, help="loops per scenario, default 1"
+    )
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error("unknown scenarios %s" % ", ".join(unknown))
+
+    soak = Soak(
+        ConfigParser().getProjectID(),
+        scenarios,
+        durationInSecs=args.duration,
+        sampleInSecs=args.sample,
+        baselineInSecs=args.baseline,
+        concurrency=args.concurrency,
+    )
+    results = soak.run()
+    elog.info("soak results:\n%s" % formatSoak(results))
+    stats.saveResults("soak", results)
+    return 0 if not results["drift"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -71,7 +71,7 @@ def test_privateAccess():
 def test_publicAccess():
     firewall = None
     if password:
-        firewall = RemoteMachine(vncPublicIP, userName, password)
+        firewall = RemoteMachine(vncPublicIP, userName, password=password)
     elif keyFile:
         firewall = RemoteMachine(vncPublicIP, userName, keyfile=keyFile)
     else:
@@ -4,16 +4,18 @@
 # (c) 2022 Edgebricks Inc
 
 
-import re
 import time
 import pytest
 
+from ebapi.common import stats
 from ebapi.common import utils as eutil
-from ebapi.common.commands import RemoteMachine
+from ebapi.common.commands import RemoteMachine, getGateway
 from ebapi.common.config import ConfigParser
 from ebapi.common.logger import elog
 from ebapi.lib import nova
 from ebapi.lib import neutron
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf.iperf import Iperf, withinTolerance
 
 
 # test settings:
@@ -28,21 +30,30 @@ iperfClientIP = testConfig.getConfig("iperfclientip")
 vmUserName = testConfig.getConfig("vmusername")
 vmPassword = testConfig.getConfig("vmpassword")
 vmKeyFile = testConfig.getConfig("vmkeyfile")
+# allowed deviation of the measured rate from maxBandwidth
+tolerance = float(testConfig.getOptionalConfig("tolerance", "0.1"))
+streams = int(testConfig.getOptionalConfig("streams", "1"))
+durationInSecs = 20
 policies = [
     # (maxBurst, maxBandwidth) in Kbps
     ("50", "500"),  # 500  Kbps throttling (10% fluctuation)
     ("100", "1000"),  # 1000 Kbps throttling (10% fluctuation)
     ("10000", "100000"),  # 100 Mbps throttling (10% fluctuation)
 ]
+# neutron rule direction, and the iperf direction it throttles as seen from
+# the VM, which is the iperf client
+directions = [
+    ("egress", Iperf.UPLOAD),
+    ("ingress", Iperf.DOWNLOAD),
+]
 testConfig = ConfigParser()
 projectID = testConfig.getProjectID()
-iperfServCmd = "nohup iperf3 --server --daemon"
-clientCmdOpts = "-c %s -t 20 -i 1 -f k --get-server-output" % iperfServerIP
-iperfClntCmd = "iperf3 " + clientCmdOpts
 # following test settings will be automatically populated
 iperfServer = None
 iperfClient = None
+iperf = None
 selectedVM = None
+measurements = []
 
 
 @pytest.fixture(scope="module")
@@ -56,7 +67,7 @@ def setup_test(request):  # pylint: disable=too-many-branches
 
     serverObj = nova.VMs(projectID)
 
-    global iperfClientIP, iperfServer, iperfClient, selectedVM  # pylint: disable=global-statement
+    global iperfClientIP, iperfServer, iperfClient, iperf, selectedVM  # pylint: disable=global-statement
     if not iperfClientIP:
         vms = serverObj.getAllVMs()
         vmIDs = vms.keys()
@@ -73,16 +84,22 @@ def setup_test(request):  # pylint: disable=too-many-branches
         pytest.skip("failed to find any VMS with floating IP")
 
     if serPassword:
-        iperfServer = RemoteMachine(iperfServerIP, serUserName, serPassword)
+        iperfServer = RemoteMachine(iperfServerIP, serUserName, password=serPassword)
     elif serKeyFile:
         iperfServer = RemoteMachine(iperfServerIP, serUserName, keyfile=serKeyFile)
     else:
         pytest.skip("set test param serPassword or serKeyFile")
 
+    # floating IPs may only be reachable through the [remote] gateway
+    gateway = getGateway()
     if vmPassword:
-        iperfClient = RemoteMachine(iperfClientIP, vmUserName, vmPassword)
+        iperfClient = RemoteMachine(
+            iperfClientIP, vmUserName, password=vmPassword, gateway=gateway
+        )
     elif vmKeyFile:
-        iperfClient = RemoteMachine(iperfClientIP, vmUserName, keyfile=vmKeyFile)
+        iperfClient = RemoteMachine(
+            iperfClientIP, vmUserName, keyfile=vmKeyFile, gateway=gateway
+        )
     else:
         pytest.skip("set test param vmPassword or vmKeyFile")
 
@@ -94,51 +111,23 @@ def setup_test(request):  # pylint: disable=too-many-branches
     if notset:
         pytest.skip("test params not set")
 
-    rc, _ = iperfServer.run("which iperf3")
-    if rc != 0:
-        pytest.skip(
-            "iperf3 not installed on iperfServer: %s" % eutil.bcolor(iperfServerIP)
-        )
-
-    rc, _ = iperfClient.run("which iperf3")
-    if rc != 0:
-        pytest.skip(
-            "iperf3 not installed on iperfClient: %s" % eutil.bcolor(iperfClientIP)
-        )
-
-    iperfServer.run("killall iperf3; rm server.out")
-    rc, _ = iperfServer.run(iperfServCmd)
-    if rc != 0:
-        pytest.skip("failed to start iperf server")
-
-    rc, _ = iperfServer.run("netstat -anp | grep 5201")
-    if rc != 0:
-        pytest.skip("netstat output failed to show iperf server port 5201")
-
-    elog.info("iperf3 running on server %s" % eutil.bcolor(iperfServerIP))
+    iperf = Iperf(iperfServer, iperfClient, iperfServerIP)
+    if not iperf.isInstalled():
+        pytest.skip("iperf3 not installed on iperfServer or iperfClient")
 
     def cleanup():
-        iperfServer.run("killall iperf3; rm server.out")
+        if measurements:
+            stats.saveResults("qos", measurements)
+        iperfServer.close()
+        iperfClient.close()
 
     request.addfinalizer(cleanup)
 
 
-def getBandwidth(output):
-    match = re.findall(".*receiver", output, re.M)
-    if not match:
-        elog.error("no receiver information in server log")
-        return None
-    sender = match.pop()
-    match = re.findall(r"(\S+\s.bits/sec)", sender, re.M)
-    if not match:
-        elog.error("no bandwidth information in server log")
-        return None
-
-    return match.pop()
-
-
+@pytest.mark.usefixtures("setup_test")
+@pytest.mark.parametrize("ruleDirection, iperfDirection", directions)
 @pytest.mark.parametrize("maxBurst, maxBandwidth", policies)
-def test_bandwidth(maxBurst, maxBandwidth):
+def test_bandwidth(maxBurst, maxBandwidth, ruleDirection, iperfDirection):
     serverObj = nova.VMs(projectID)
     macAddr = serverObj.getMacAddrFromIP(selectedVM, iperfClientIP)
     assert macAddr
@@ -153,43 +142,66 @@ def test_bandwidth(maxBurst, maxBandwidth):
     elog.info("portID of VM %s = %s" % (eutil.bcolor(selectedVM), eutil.bcolor(portID)))
 
     elog.info("getting bandwidth without any QoS Policy")
-    rc, output = iperfClient.run(iperfClntCmd)
-    assert rc == 0
-    assert output
-
-    bandwidth = getBandwidth(output)
-    assert bandwidth
-    elog.info("bandwidth without any QoS Policy = %s" % eutil.bcolor(bandwidth))
+    baseline = iperf.measure(durationInSecs, streams, iperfDirection)
+    assert baseline
+    elog.info(
+        "bandwidth without any QoS Policy = %s Kbps"
+        % eutil.bcolor("%.0f" % baseline["receivedKbps"])
+    )
+    if baseline["receivedKbps"] < float(maxBandwidth) * (1 + tolerance):
+        pytest.skip("link too slow to observe a %s Kbps limit" % maxBandwidth)
 
     qosObj = neutron.QoS()
     name = maxBandwidth + "kbps-limit"
     policyID = qosObj.createPolicy(name)
     assert policyID
     elog.info("QoS policyID = %s" % eutil.bcolor(policyID))
+    tracker = ResourceTracker()
+    tracker.add(ResourceTracker.QOSPOLICY, policyID, qosObj)
 
-    assert qosObj.createBandwidthLimitRules(policyID, maxBurst, maxBandwidth)
-    elog.info("successfully created bandwidth limit rules")
-
-    assert portObj.attachQoSPolicy(portID, policyID)
-    elog.info(
-        "successfully attached QoS policy %s to port %s"
-        % (eutil.bcolor(policyID), eutil.bcolor(portID))
-    )
-
-    time.sleep(2)
-    elog.info("getting bandwidth with QoS Policy")
-    rc, output = iperfClient.run(iperfClntCmd)
-    assert rc == 0
-
-    bandwidth = getBandwidth(output)
-    assert bandwidth
-    elog.info("bandwidth with QoS Policy = %s" % eutil.bcolor(bandwidth))
+    try:
+        assert qosObj.createBandwidthLimitRules(
+            policyID, maxBurst, maxBandwidth, ruleDirection
+        )
+        elog.info("successfully created %s bandwidth limit rules" % ruleDirection)
 
-    assert portObj.detachQoSPolicy(portID)
-    elog.info(
-        "successfully detached QoS policy %s from port %s"
-        % (eutil.bcolor(policyID), eutil.bcolor(portID))
-    )
+        assert portObj.attachQoSPolicy(portID, policyID)
+        elog.info(
+            "successfully attached QoS policy %s to port %s"
+            % (eutil.bcolor(policyID), eutil.bcolor(portID))
+        )
 
-    assert qosObj.deletePolicy(policyID)
-    elog.info("successfully deleted QoS policy %s" % eutil.bcolor(policyID))
+        time.sleep(2)
+        elog.info("getting bandwidth with QoS Policy")
+        limited = iperf.measure(durationInSecs, streams, iperfDirection)
+        assert limited
+        elog.info(
+            "bandwidth with QoS Policy = %s Kbps"
+            % eutil.bcolor("%.0f" % limited["receivedKbps"])
+        )
+        measurements.append(
+            {
+                "maxBurst": int(maxBurst),
+                "maxBandwidth": int(maxBandwidth),
+                "direction": ruleDirection,
+                "baseline": baseline,
+                "limited": limited,
+                "error": limited["receivedKbps"] / float(maxBandwidth) - 1,
+            }
+        )
+        assert withinTolerance(
+            limited["receivedKbps"], float(maxBandwidth), tolerance
+        ), "measured %.0f Kbps, limit %s Kbps +/- %d%%" % (
+            limited["receivedKbps"],
+            maxBandwidth,
+            tolerance * 100,
+        )
+    finally:
+        # best effort, the policy may not be attached, and cannot be deleted
+        # while it is
+        if portObj.detachQoSPolicy(portID):
+            elog.info(
+                "successfully detached QoS policy %s from port %s"
+                % (eutil.bcolor(policyID), eutil.bcolor(portID))
+            )
+        assert tracker.teardown()
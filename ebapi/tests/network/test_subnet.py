@@ -0,0 +1,59 @@
+#! /usr/bin/python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import ipaddress
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib import neutron
+from ebapi.lib.tracker import ResourceTracker
+
+
+testConfig = ConfigParser()
+projectID = testConfig.getProjectID()
+numNetworks = 4
+
+
+@pytest.mark.resources(network=numNetworks)
+def test_concurrent_networks():
+    networkObj = neutron.Networks(projectID)
+
+    def createNetwork(index):
+        return networkObj.createInternalNetwork(
+            netName="Auto-Net%s" % index, subnetName="Auto-SubNet%s" % index
+        )
+
+    tracker = ResourceTracker()
+    netIDs = []
+    try:
+        with ThreadPoolExecutor(max_workers=numNetworks) as executor:
+            netIDs = list(executor.map(createNetwork, range(numNetworks)))
+        for netID in netIDs:
+            if netID:
+                tracker.add(ResourceTracker.NETWORK, netID, networkObj)
+        assert all(netIDs)
+
+        allocations = networkObj.subnetAllocator.getAllocations(projectID)
+        subnets = [
+            ipaddress.ip_network(cidr)
+            for cidr, entry in allocations.items()
+            if entry["network"] in netIDs
+        ]
+        assert len(subnets) == numNetworks
+        elog.info("allocated subnets: %s" % eutil.bcolor(subnets))
+        for subnet, other in itertools.combinations(subnets, 2):
+            assert not subnet.overlaps(other)
+
+    finally:
+        assert tracker.teardown()
+
+    allocations = networkObj.subnetAllocator.getAllocations(projectID)
+    for entry in allocations.values():
+        assert entry["network"] not in netIDs
@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+import pytest_html.extras
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.glance import Images
+from ebapi.lib.nova import Flavors
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import boottime
+from ebapi.perf.guests import Guests
+
+# test settings:
+# os property of the images and flavors as <vcpus>x<ram in MB>, every image
+# is booted with every flavor, bootvms VMs at a time
+testConfig = ConfigParser("perf")
+images = [
+    image.strip()
+    for image in testConfig.getOptionalConfig("bootimages", "cirros").split(",")
+]
+flavors = [
+    flavor.strip()
+    for flavor in testConfig.getOptionalConfig("bootflavors", "2x2048").split(",")
+]
+numVMs = int(testConfig.getOptionalConfig("bootvms", "3"))
+projectID = ConfigParser().getProjectID()
+results = []
+
+
+@pytest.fixture(scope="module")
+def boot_results():
+    yield results
+    if results:
+        elog.info("boot times:\n%s" % boottime.formatBootTimes(results))
+        stats.saveResults("boottime", results)
+
+
+@pytest.mark.perf
+@pytest.mark.resources(instances=numVMs, floatingip=numVMs)
+@pytest.mark.parametrize("flavor", flavors)
+@pytest.mark.parametrize("image", images)
+def test_boottime(image, flavor, boot_results, extras):
+    imageID = Images(projectID).getImageIDByOS(image)
+    if not imageID:
+        pytest.skip("no active %s image" % image)
+
+    numCPU, memMB = (int(n) for n in flavor.split("x"))
+    flavorID = Flavors(projectID).getBestMatchingFlavor(numCPU=numCPU, memMB=memMB)
+    assert flavorID
+
+    tracker = ResourceTracker()
+    guests = Guests(projectID, tracker, imageID=imageID, flavorID=flavorID)
+    if not guests.isConfigured(login=False):
+        pytest.skip("[perf] test params not set")
+
+    try:
+        names = ["ebtestBoot%d" % i for i in range(numVMs)]
+        # time to first SSH is the SSH server answering, images differ in
+        # their login
+        vms = guests.create(names, maxInFlight=numVMs, login=False)
+        assert vms is not None
+
+        result = boottime.summarizeBoots(vms)
+        result.update({"image": image, "flavor": flavor})
+        boot_results.append(result)
+        extras.append(pytest_html.extras.html(boottime.formatBootTimesHTML([result])))
+        extras.append(
+            pytest_html.extras.json(result, name="%s %s boot times" % (image, flavor))
+        )
+        assert result["failed"] == 0, "%d of %d %s VMs failed to boot" % (
+            result["failed"],
+            numVMs,
+            image,
+        )
+    finally:
+        guests.close()
+        assert tracker.teardown()
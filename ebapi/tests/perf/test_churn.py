@@ -0,0 +1,43 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.perf import churn
+
+
+# test settings:
+# concurrent users and duration of the churn, and the highest failure and
+# stuck-state rates allowed, 0.01 is 1%
+testConfig = ConfigParser("perf")
+concurrency = int(testConfig.getOptionalConfig("churnconcurrency", "4"))
+durationInSecs = int(testConfig.getOptionalConfig("churndurationsecs", "600"))
+maxErrorRate = float(testConfig.getOptionalConfig("churnmaxerrorrate", "0.01"))
+maxStuckRate = float(testConfig.getOptionalConfig("churnmaxstuckrate", "0"))
+
+
+@pytest.mark.perf
+def test_bu_project_churn():
+    results = churn.Churn(concurrency=concurrency, durationInSecs=durationInSecs).run()
+    elog.info("churn results:\n%s" % churn.formatChurn(results))
+    stats.saveResults("churn", results)
+
+    assert results["cycles"]
+    for operation, result in results["operations"].items():
+        assert result["errorRate"] <= maxErrorRate, "%s failed %d of %d" % (
+            operation,
+            result["errors"],
+            result["count"],
+        )
+    for kind, waits in results["waits"].items():
+        assert waits["stuckRate"] <= maxStuckRate, "%s stuck in %s" % (
+            kind,
+            waits["stuck"],
+        )
+    assert not results["leftovers"], "left behind %s" % results["leftovers"]
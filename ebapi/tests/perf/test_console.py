@@ -0,0 +1,104 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.nova import VMs
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import console
+from ebapi.perf.guests import getFlavorID
+
+
+# test settings:
+# consolevms VMs get their console opened consolerounds times each, all at
+# the same time, the proxy certificate is checked unless consoleverifytls is
+# false, and the p95 time to the first frame may not exceed consolemaxsecs,
+# 0 to only measure it
+testConfig = ConfigParser("perf")
+numVMs = int(testConfig.getOptionalConfig("consolevms", "10"))
+numRounds = int(testConfig.getOptionalConfig("consolerounds", "3"))
+verifyTLS = testConfig.getOptionalConfig("consoleverifytls", "true") == "true"
+maxInSecs = float(testConfig.getOptionalConfig("consolemaxsecs", "0"))
+networkID = testConfig.getOptionalConfig("networkid")
+imageID = testConfig.getOptionalConfig("imageid")
+projectID = ConfigParser().getProjectID()
+
+
+class StandInVMs:
+    # hands out the console URL of a ConsoleStandIn for every VM
+    def __init__(self, consoleURL):
+        self.consoleURL = consoleURL
+
+    def getVMConsole(self, vmID):
+        return self.consoleURL
+
+
+@pytest.mark.perf
+def test_console_standin():
+    standIn = console.ConsoleStandIn(handshakeDelayInSecs=0.1, frameDelayInSecs=0.2)
+    consoleURL = standIn.start()
+    try:
+        probe = console.ConsoleProbe(StandInVMs(consoleURL), maxInFlight=4)
+        results = probe.measure(["vm%d" % i for i in range(4)], rounds=2)
+    finally:
+        standIn.stop()
+
+    summary = console.summarizeConsoles(results)
+    assert summary["failed"] == 0
+    assert summary["handshakeTime"]["min"] >= 0.1
+    assert summary["firstFrameTime"]["min"] >= 0.3
+    assert all(r["greeting"] == console.RFB_VERSION.decode() for r in results)
+
+
+@pytest.mark.perf
+@pytest.mark.resources(instances=numVMs)
+def test_console_latency():
+    if not (networkID and imageID):
+        pytest.skip("[perf] test params not set")
+
+    flavorID = getFlavorID(projectID)
+    assert flavorID
+
+    tracker = ResourceTracker()
+    vmObj = VMs(projectID)
+    try:
+        specs = [
+            {
+                "vmName": "ebtestConsole%d" % i,
+                "flavorID": flavorID,
+                "networkID": networkID,
+                "imageID": imageID,
+            }
+            for i in range(numVMs)
+        ]
+        handles, _ = vmObj.createVMs(specs)
+        assert handles is not None
+        for handle in handles:
+            if handle["id"]:
+                tracker.add(ResourceTracker.VM, handle["id"], vmObj)
+        assert all(handle["ok"] for handle in handles)
+
+        probe = console.ConsoleProbe(vmObj, maxInFlight=numVMs, verifyTLS=verifyTLS)
+        results = probe.measure([handle["id"] for handle in handles], numRounds)
+        summary = console.summarizeConsoles(results)
+        elog.info("console latency: %s" % summary)
+        stats.saveResults("console", {"summary": summary, "opens": results})
+
+        assert summary["failed"] == 0, "%d of %d console opens failed" % (
+            summary["failed"],
+            summary["opens"],
+        )
+        if maxInSecs:
+            p95 = summary["firstFrameTime"]["p95"]
+            assert p95 <= maxInSecs, "p95 first frame %.2fs, at most %.2fs" % (
+                p95,
+                maxInSecs,
+            )
+    finally:
+        assert tracker.teardown()
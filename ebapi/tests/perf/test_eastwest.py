@@ -0,0 +1,83 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.hosts import Hosts
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import eastwest
+from ebapi.perf.guests import Guests
+from ebapi.perf.iperf import Iperf
+
+# test settings:
+# VM pairs per placement, all pairs are measured at the same time
+testConfig = ConfigParser("perf")
+numPairs = int(testConfig.getOptionalConfig("eastwestpairs", "1"))
+durationInSecs = int(testConfig.getOptionalConfig("durationsecs", "20"))
+streams = int(testConfig.getOptionalConfig("streams", "1"))
+udpBitrate = testConfig.getOptionalConfig("udpbitrate", "1G")
+placements = [eastwest.SAME_HOST, eastwest.CROSS_HOST]
+numVMs = 2 * numPairs * len(placements)
+projectID = ConfigParser().getProjectID()
+
+
+def placePairs(guests, vms, hostNames):
+    """
+    split vms into pairs per placement, and move the second VM of each pair
+    onto the host of the first one, or onto another host.
+    """
+    pairs = []
+    for i, placement in enumerate(placements * numPairs):
+        first, second = vms[2 * i], vms[2 * i + 1]
+        if placement == eastwest.SAME_HOST:
+            host = first["host"]
+        else:
+            others = [h for h in hostNames if h != first["host"]]
+            host = second["host"] if second["host"] in others else others[0]
+        assert guests.placeOn(second, host)
+        pairs.append({"placement": placement, "guests": [first, second]})
+    return pairs
+
+
+@pytest.mark.perf
+@pytest.mark.resources(instances=numVMs, floatingip=numVMs)
+def test_eastwest_matrix():
+    hostNames = list((Hosts().getHostNames() or {}).values())
+    if len(hostNames) < 2:
+        pytest.skip("cross-host pairs need at least 2 hosts")
+
+    tracker = ResourceTracker()
+    guests = Guests(projectID, tracker)
+    if not guests.isConfigured():
+        pytest.skip("[perf] test params not set")
+
+    try:
+        names = ["ebtestEastWest%d" % i for i in range(numVMs)]
+        vms = guests.create(names)
+        assert vms is not None
+        assert all(vm["ok"] for vm in vms)
+        if not Iperf(vms[0]["remote"], vms[1]["remote"], None).isInstalled():
+            pytest.skip("iperf3 not installed in the [perf] image")
+
+        pairs = placePairs(guests, vms, hostNames)
+        results = eastwest.measurePairs(
+            pairs, durationInSecs=durationInSecs, streams=streams, udpBitrate=udpBitrate
+        )
+        matrix = eastwest.getMatrix(results)
+        elog.info("east-west matrix:\n%s" % eastwest.formatMatrix(matrix))
+        stats.saveResults("eastwest", {"matrix": matrix, "pairs": results})
+
+        failed = [r for r in results if not (r["tcp"] and r["udp"] and r["latency"])]
+        assert not failed, "measurements failed between %s" % eutil.rcolor(
+            [r["hosts"] for r in failed]
+        )
+    finally:
+        guests.close()
+        assert tracker.teardown()
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common import utils as eutil
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf.evacuation import HostEvacuation
+from ebapi.perf.guests import Guests
+
+
+# test settings:
+# the host to power off, unset to not run the benchmark, VMs placed on it,
+# the recovery time objective for every VM in seconds, 0 to only measure it,
+# and the time allowed for VMs to come back to the host once it rejoined
+testConfig = ConfigParser("perf")
+hostID = testConfig.getOptionalConfig("hahostid")
+numVMs = int(testConfig.getOptionalConfig("havms", "4"))
+rtoInSecs = int(testConfig.getOptionalConfig("hartosecs", "0"))
+timeoutInSecs = int(testConfig.getOptionalConfig("hatimeoutsecs", "900"))
+rebalanceInSecs = int(testConfig.getOptionalConfig("harebalancesecs", "600"))
+projectID = ConfigParser().getProjectID()
+
+
+@pytest.mark.perf
+@pytest.mark.resources(instances=numVMs, floatingip=numVMs)
+def test_host_evacuation():
+    if not hostID:
+        pytest.skip("[perf] hahostid not set")
+
+    tracker = ResourceTracker()
+    guests = Guests(projectID, tracker)
+    if not guests.isConfigured(login=False):
+        pytest.skip("[perf] test params not set")
+
+    evacuation = HostEvacuation(projectID, hostID, timeoutInSecs=timeoutInSecs)
+    assert evacuation.hostName
+    restored = None
+    try:
+        names = ["ebtestEvacuation%d" % i for i in range(numVMs)]
+        vms = guests.create(names, maxInFlight=numVMs, login=False)
+        assert vms is not None
+        assert all(vm["ok"] for vm in vms)
+        for vm in vms:
+            assert guests.placeOn(vm, evacuation.hostName)
+
+        vmIDs = [vm["id"] for vm in vms]
+        failed = evacuation.fail(vmIDs)
+        assert failed is not None
+        restored = evacuation.restore(vmIDs, rebalanceTimeoutInSecs=rebalanceInSecs)
+        elog.info(
+            "evacuation of %s: detected after %ss, recovered %s"
+            % (
+                eutil.bcolor(evacuation.hostName),
+                eutil.bcolor(failed["detectTime"]),
+                eutil.bcolor(failed["recoverTime"]),
+            )
+        )
+        stats.saveResults("evacuation", {"fail": failed, "restore": restored})
+
+        assert failed["failed"] == 0, "%d of %d VMs not recovered" % (
+            failed["failed"],
+            numVMs,
+        )
+        if rtoInSecs:
+            worst = failed["recoverTime"]["max"]
+            assert worst <= rtoInSecs, "recovery took %.1fs, objective %ds" % (
+                worst,
+                rtoInSecs,
+            )
+        assert restored["rejoined"], "host did not rejoin"
+        assert restored["notActive"] == 0
+        if rebalanceInSecs:
+            assert restored["rebalanced"], "no VMs back on the host"
+    finally:
+        # never leave the host powered off, even if the evacuation broke off
+        if evacuation.healthyStatus is not None and restored is None:
+            evacuation.hostObj.powerON(hostID)
+        guests.close()
+        assert tracker.teardown()
@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import tempfile
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.glance import Images
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import imageimport
+
+
+# test settings:
+# image sizes in MB, imageimports images of every size are imported at the
+# same time from an HTTP server on the test host, which glance reaches at
+# imageserverhost:imageserverport, by default the test host's address on the
+# route to the API and any free port
+testConfig = ConfigParser("perf")
+sizes = [
+    int(size)
+    for size in testConfig.getOptionalConfig("imagesizesmb", "64, 256").split(",")
+]
+numImports = int(testConfig.getOptionalConfig("imageimports", "4"))
+serverHost = testConfig.getOptionalConfig("imageserverhost")
+serverPort = int(testConfig.getOptionalConfig("imageserverport", "0"))
+networkID = testConfig.getOptionalConfig("networkid", "")
+projectID = ConfigParser().getProjectID()
+results = []
+
+
+@pytest.fixture(scope="module")
+def image_server():
+    with tempfile.TemporaryDirectory(prefix="ebtest-images-") as directory:
+        server = imageimport.ImageServer(directory, serverHost, serverPort)
+        url = server.start()
+        try:
+            yield server, url
+        finally:
+            server.stop()
+    if results:
+        stats.saveResults("imageimport", results)
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("sizeInMB", sizes)
+def test_image_import(sizeInMB, image_server):
+    server, url = image_server
+    fileName = "ebtest-%dmb.raw" % sizeInMB
+    server.addImage(fileName, sizeInMB)
+    images = [
+        ("ebtestImport%dMB%d" % (sizeInMB, i), "%s/%s" % (url, fileName), sizeInMB)
+        for i in range(numImports)
+    ]
+
+    tracker = ResourceTracker()
+    try:
+        importer = imageimport.ImageImport(
+            Images(projectID), tracker, networkID, maxInFlight=numImports
+        )
+        imported = importer.run(images)
+        result = imageimport.summarizeImports(imported)
+        result.update({"sizeInMB": sizeInMB, "images": imported})
+        results.append(result)
+        elog.info(
+            "imported %d %d MB images, %s MB/s aggregate"
+            % (numImports, sizeInMB, result["aggregateMBps"])
+        )
+        assert result["failed"] == 0, "%d of %d imports failed" % (
+            result["failed"],
+            numImports,
+        )
+    finally:
+        assert tracker.teardown()
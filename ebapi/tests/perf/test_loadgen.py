@@ -0,0 +1,39 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.perf import loadgen
+
+
+# test settings:
+# read-only scenarios run open loop at loadrps for loaddurationsecs, the
+# create/delete scenarios are left to python3 -m ebapi.perf.loadgen
+testConfig = ConfigParser("perf")
+rps = float(testConfig.getOptionalConfig("loadrps", "5"))
+durationInSecs = int(testConfig.getOptionalConfig("loaddurationsecs", "60"))
+rampUpInSecs = int(testConfig.getOptionalConfig("loadrampupsecs", "10"))
+maxErrorRate = float(testConfig.getOptionalConfig("loadmaxerrorrate", "0.01"))
+scenarios = ["listvms", "getproject"]
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("scenario", scenarios)
+def test_loadgen(scenario):
+    results = loadgen.runScenario(
+        scenario, durationInSecs=durationInSecs, rampUpInSecs=rampUpInSecs, rps=rps
+    )
+    stats.saveResults("loadgen-%s" % scenario, results)
+
+    assert results["scenario"]
+    for endpoint, result in results["endpoints"].items():
+        assert result["errorRate"] <= maxErrorRate, "%s failed %.1f%% of %d" % (
+            endpoint,
+            100.0 * result["errorRate"],
+            result["requests"],
+        )
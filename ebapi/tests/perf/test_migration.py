@@ -0,0 +1,153 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.hosts import Hosts
+from ebapi.lib.nova import Flavors
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import migration
+from ebapi.perf.guests import Guests
+from ebapi.perf.iperf import Iperf
+
+
+# test settings:
+# flavors as <vcpus>x<ram in MB> and VMs migrated at a time, every flavor is
+# migrated at every concurrency, migrationruns times, while a prober VM pings
+# and drives iperf3 traffic to every migrating VM
+testConfig = ConfigParser("perf")
+flavors = [
+    flavor.strip()
+    for flavor in testConfig.getOptionalConfig("migrationflavors", "2x2048").split(",")
+]
+concurrencies = [
+    int(n)
+    for n in testConfig.getOptionalConfig("migrationconcurrency", "1, 4").split(",")
+]
+numRuns = int(testConfig.getOptionalConfig("migrationruns", "3"))
+probeInSecs = int(testConfig.getOptionalConfig("migrationprobesecs", "120"))
+workload = testConfig.getOptionalConfig("migrationworkload")
+projectID = ConfigParser().getProjectID()
+summaries = []
+
+
+def getCases():
+    """
+    flavor and concurrency pairs, each declaring the resources of its
+    migrating VMs and the prober, which uses the default [perf] flavor.
+    """
+    cases = []
+    for flavor in flavors:
+        numCPU, memMB = (int(n) for n in flavor.split("x"))
+        for concurrency in concurrencies:
+            demand = pytest.mark.resources(
+                instances=concurrency + 1,
+                cores=concurrency * numCPU,
+                ram=concurrency * memMB,
+                floatingip=concurrency + 1,
+            )
+            cases.append(pytest.param(flavor, concurrency, marks=demand))
+    return cases
+
+
+@pytest.fixture(scope="module")
+def migration_results():
+    yield summaries
+    if summaries:
+        elog.info("live migration:\n%s" % migration.formatMigrations(summaries))
+        stats.saveResults("migration", summaries)
+
+
+def getMoves(vms, hostNames):
+    """
+    pick a target host other than its current one for every VM, spreading
+    the VMs over the other hosts.
+    """
+    moves = []
+    for i, vm in enumerate(vms):
+        others = [h for h in hostNames if h != vm["host"]]
+        moves.append((vm, others[i % len(others)]))
+    return moves
+
+
+@pytest.mark.perf
+def test_migration_summary():
+    # replies every 0.2s, with 1.2s missing while the VM switched hosts
+    pingOutput = "\n".join(
+        "[%.3f] 64 bytes from 10.0.0.5: icmp_seq=%d ttl=64 time=0.4 ms" % (t, i)
+        for i, t in enumerate([100.0, 100.2, 100.4, 101.8, 102.0])
+    )
+    replies = migration.parseTimestampedPing(pingOutput)
+    assert migration.getDowntime(replies, 0.2) == pytest.approx(1.2)
+    assert migration.getDowntime(replies[:1], 0.2) is None
+    assert migration.getThroughputDip([1000, 1000, 500]) == pytest.approx(0.5)
+
+    results = [
+        {
+            "migrated": True,
+            "migrationTime": 20.0,
+            "downtime": 1.2,
+            "throughputDip": 0.5,
+        },
+        {"migrated": True, "migrationTime": 30.0, "downtime": None, "throughputDip": 0},
+        {"migrated": False, "migrationTime": 600, "downtime": 5, "throughputDip": 1},
+    ]
+    summary = migration.summarizeMigrations(results)
+    assert (summary["migrations"], summary["failed"]) == (3, 1)
+    assert summary["migrationTime"]["max"] == 30.0
+    assert summary["downtime"]["count"] == 1
+    assert summary["throughputDip"]["mean"] == pytest.approx(0.25)
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("flavor, concurrency", getCases())
+def test_live_migration(flavor, concurrency, migration_results):
+    hostNames = list((Hosts().getHostNames() or {}).values())
+    if len(hostNames) < 2:
+        pytest.skip("live migration needs at least 2 hosts")
+
+    numCPU, memMB = (int(n) for n in flavor.split("x"))
+    flavorID = Flavors(projectID).getBestMatchingFlavor(numCPU=numCPU, memMB=memMB)
+    assert flavorID
+
+    tracker = ResourceTracker()
+    probers = Guests(projectID, tracker)
+    guests = Guests(projectID, tracker, flavorID=flavorID)
+    if not guests.isConfigured():
+        pytest.skip("[perf] test params not set")
+
+    try:
+        prober = probers.create(["ebtestMigrationProber"])
+        assert prober is not None and prober[0]["ok"]
+        prober = prober[0]
+
+        names = ["ebtestMigration%d" % i for i in range(concurrency)]
+        vms = guests.create(names)
+        assert vms is not None
+        assert all(vm["ok"] for vm in vms)
+        if not Iperf(vms[0]["remote"], prober["remote"], None).isInstalled():
+            pytest.skip("iperf3 not installed in the [perf] image")
+
+        probe = migration.MigrationProbe(guests, prober, probeInSecs=probeInSecs)
+        results = []
+        for _ in range(numRuns):
+            results += probe.measureAll(getMoves(vms, hostNames), workload)
+
+        summary = migration.summarizeMigrations(results)
+        summary.update({"flavor": flavor, "concurrency": concurrency})
+        summary["runs"] = results
+        migration_results.append(summary)
+        assert summary["failed"] == 0, "%d of %d migrations failed" % (
+            summary["failed"],
+            summary["migrations"],
+        )
+    finally:
+        probers.close()
+        guests.close()
+        assert tracker.teardown()
@@ -0,0 +1,107 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.lib.nova import VMs
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import provisioning
+from ebapi.perf.guests import getFlavorID
+
+
+# test settings:
+# boot sources to compare, provisionvms VMs are created at a time from each,
+# on boot volumes of bootvolumetype and bootvolumesizegb
+testConfig = ConfigParser("perf")
+sources = [
+    source.strip()
+    for source in testConfig.getOptionalConfig(
+        "bootsources", ", ".join(provisioning.SOURCES)
+    ).split(",")
+]
+numVMs = int(testConfig.getOptionalConfig("provisionvms", "3"))
+volumeType = testConfig.getOptionalConfig("bootvolumetype", VMs.DEFAULT_VOLUME_TYPE)
+sizeInGB = int(testConfig.getOptionalConfig("bootvolumesizegb", "1"))
+networkID = testConfig.getOptionalConfig("networkid")
+imageID = testConfig.getOptionalConfig("imageid")
+projectID = ConfigParser().getProjectID()
+results = []
+
+
+def getCases():
+    """
+    boot sources, each declaring its VMs and their boot volumes, along with
+    the volume of the image and its snapshot for the sources booting off
+    them, the module fixture creates those for the first source needing them.
+    """
+    cases = []
+    for source in sources:
+        volumes = numVMs if source == "image" else numVMs + 1
+        snapshots = 1 if source == "snapshot" else 0
+        demand = pytest.mark.resources(
+            instances=numVMs,
+            volumes=volumes,
+            snapshots=snapshots,
+            gigabytes=(volumes + snapshots) * sizeInGB,
+        )
+        cases.append(pytest.param(source, marks=demand))
+    return cases
+
+
+@pytest.fixture(scope="module")
+def boot_sources():
+    if not (networkID and imageID):
+        pytest.skip("[perf] test params not set")
+
+    # the volume of the image and its snapshot are shared by all sources
+    tracker = ResourceTracker()
+    bootSources = provisioning.BootSources(
+        projectID, tracker, imageID, volumeType=volumeType, sizeInGB=sizeInGB
+    )
+    yield bootSources
+    if results:
+        elog.info("provisioning:\n%s" % provisioning.formatProvisioning(results))
+        stats.saveResults(
+            "provisioning", {"sources": results, "prepTimes": bootSources.prepTimes}
+        )
+    assert tracker.teardown()
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("source", getCases())
+def test_provisioning(source, boot_sources):
+    flavorID = getFlavorID(projectID)
+    assert flavorID
+
+    names = ["ebtestProvision%s%d" % (source.title(), i) for i in range(numVMs)]
+    assert boot_sources.prepare(source, names) is not None, (
+        "preparing %s boot source failed" % source
+    )
+
+    tracker = ResourceTracker()
+    vmObj = VMs(projectID)
+    try:
+        specs = boot_sources.getSpecs(source, names, flavorID, networkID)
+        handles, _ = vmObj.createVMs(specs, maxInFlight=numVMs)
+        assert handles is not None
+        # deleted before the boot sources, which the module fixture tears down
+        for handle in handles:
+            if handle["id"]:
+                tracker.add(ResourceTracker.VM, handle["id"], vmObj)
+
+        result = provisioning.summarizeProvisioning(handles)
+        result["source"] = source
+        results.append(result)
+        assert result["failed"] == 0, "%d of %d VMs failed to boot from %s" % (
+            result["failed"],
+            numVMs,
+            source,
+        )
+    finally:
+        assert tracker.teardown()
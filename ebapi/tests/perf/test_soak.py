@@ -0,0 +1,79 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.common.logger import elog
+from ebapi.perf import soak
+
+
+# test settings:
+# scenarios looped for soakdurationsecs, 0 to skip the soak, soakconcurrency
+# loops each, sampled every soaksamplesecs and compared against the first
+# soakbaselinesecs. p95 latency above soaklatencyfactor times the baseline,
+# or a failure rate above the baseline plus soakmaxrateincrease is drift
+testConfig = ConfigParser("perf")
+scenarios = [
+    scenario.strip()
+    for scenario in testConfig.getOptionalConfig(
+        "soakscenarios", ", ".join(soak.SCENARIOS)
+    ).split(",")
+]
+durationInSecs = int(testConfig.getOptionalConfig("soakdurationsecs", "0"))
+concurrency = int(testConfig.getOptionalConfig("soakconcurrency", "1"))
+sampleInSecs = int(testConfig.getOptionalConfig("soaksamplesecs", "300"))
+baselineInSecs = int(testConfig.getOptionalConfig("soakbaselinesecs", "3600"))
+latencyFactor = float(testConfig.getOptionalConfig("soaklatencyfactor", "1.5"))
+maxRateIncrease = float(testConfig.getOptionalConfig("soakmaxrateincrease", "0.02"))
+projectID = ConfigParser().getProjectID()
+
+
+@pytest.mark.perf
+def test_soak_drift_detection():
+    baseline = soak.summarizeSamples(
+        [[t, "network create", 1.0, True] for t in range(10)]
+    )
+    steady = soak.summarizeSamples(
+        [[3600 + t, "network create", 1.2, True] for t in range(10)]
+    )
+    assert soak.detectDrift(baseline, steady, latencyFactor=1.5) == []
+
+    degraded = soak.summarizeSamples(
+        [[7200 + t, "network create", 2.0, t % 4 != 0] for t in range(10)]
+    )
+    drifts = soak.detectDrift(baseline, degraded, 1.5, 0.02)
+    assert [d["metric"] for d in drifts] == ["p95", "errorRate"]
+    assert drifts[1]["current"] == pytest.approx(0.3)
+
+
+@pytest.mark.perf
+@pytest.mark.resources(
+    instances=concurrency if "vm" in scenarios else 0,
+    network=concurrency if "network" in scenarios else 0,
+)
+def test_soak():
+    if not durationInSecs:
+        pytest.skip("[perf] soakdurationsecs not set")
+
+    results = soak.Soak(
+        projectID,
+        scenarios,
+        durationInSecs=durationInSecs,
+        sampleInSecs=sampleInSecs,
+        baselineInSecs=baselineInSecs,
+        concurrency=concurrency,
+        latencyFactor=latencyFactor,
+        maxRateIncrease=maxRateIncrease,
+    ).run()
+    elog.info("soak results:\n%s" % soak.formatSoak(results))
+    stats.saveResults("soak", results)
+
+    assert results["cycles"]
+    assert results["baseline"] is not None, "soak ended within the baseline period"
+    assert not results["drift"], "drifted: %s" % results["drift"]
+    assert results["teardown"], "left behind %s" % results["leftovers"]
@@ -0,0 +1,86 @@
+#! /usr/bin/env python
+#
+# Author: ankit@edgebricks.com
+# (c) 2023 Edgebricks Inc
+
+
+import pytest
+
+from ebapi.common import stats
+from ebapi.common.config import ConfigParser
+from ebapi.lib.cinder import Volumes
+from ebapi.lib.tracker import ResourceTracker
+from ebapi.perf import fio
+from ebapi.perf.guests import Guests
+
+
+# test settings:
+# volume types to compare, every type gets a volume of volumesizegb attached
+# to its own VM, which runs every fio workload for fiodurationsecs, the VM
+# boots from a volume of VMs.createVM's default size of 1GB
+DEFAULT_TYPES = "relhighiops_type, relhighcap_type, highcap_type, highiops_type"
+testConfig = ConfigParser("perf")
+volumeTypes = [
+    volType.strip()
+    for volType in testConfig.getOptionalConfig("volumetypes", DEFAULT_TYPES).split(",")
+]
+sizeInGB = int(testConfig.getOptionalConfig("volumesizegb", "10"))
+durationInSecs = int(testConfig.getOptionalConfig("fiodurationsecs", "60"))
+projectID = ConfigParser().getProjectID()
+results = {}
+
+
+@pytest.fixture(scope="module")
+def storage_results():
+    yield results
+    if results:
+        stats.saveResults("storage", results)
+
+
+@pytest.mark.perf
+@pytest.mark.resources(instances=1, floatingip=1, volumes=2, gigabytes=sizeInGB + 1)
+@pytest.mark.parametrize("volumeType", volumeTypes)
+def test_volume_io(volumeType, storage_results):
+    volumeObj = Volumes(projectID)
+    if volumeType not in (volumeObj.listVolumeTypes() or []):
+        pytest.skip("no volume type %s" % volumeType)
+
+    tracker = ResourceTracker()
+    guests = Guests(projectID, tracker)
+    if not guests.isConfigured():
+        pytest.skip("[perf] test params not set")
+
+    vm = None
+    try:
+        vms = guests.create(["ebtestStorage"])
+        assert vms is not None and vms[0]["ok"]
+        vm = vms[0]
+        device = fio.Fio(vm["remote"], None)
+        if not device.isInstalled():
+            pytest.skip("fio not installed in the [perf] image")
+
+        volumeID = volumeObj.createVolume(
+            "ebtestStorage%s" % volumeType, sizeInGB, volumeType
+        )
+        assert volumeID
+        volumeKey = tracker.add(ResourceTracker.VOLUME, volumeID, volumeObj)
+        # delete the VM first, should the volume still be attached to it
+        tracker.add(ResourceTracker.VM, vm["id"], guests.vmObj, [volumeKey])
+        assert volumeObj.waitForStatus(volumeID, "available")
+
+        assert volumeObj.attachVolume(vm["id"], volumeID)
+        assert volumeObj.waitForStatus(volumeID, "in-use")
+        try:
+            device = fio.Fio(vm["remote"], fio.getDevicePath(volumeID))
+            assert device.waitForDevice()
+            measured = device.measureAll(durationInSecs=durationInSecs)
+            assert measured is not None
+            storage_results[volumeType] = {"sizeInGB": sizeInGB, "fio": measured}
+        finally:
+            # best effort, the volume cannot be deleted while it is attached,
+            # the tracker teardown reports it if it is still attached
+            if volumeObj.detachVolume(vm["id"], volumeID):
+                volumeObj.waitForStatus(volumeID, "available")
+    finally:
+        guests.close()
+        assert tracker.teardown()
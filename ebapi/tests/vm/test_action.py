@@ -3,133 +3,98 @@
 # Author: ankit@edgebricks.com
 # Copyright (c) 2021-2023 Edgebricks Inc.
 
-from time import sleep
+import re
+
+import pytest
 
 from ebapi.common.config import ConfigParser
-from ebapi.lib.edgebricks import BUs, Projects
 from ebapi.lib.nova import VMs
 from ebapi.lib.nova import Flavors
 from ebapi.lib.neutron import Networks
 from ebapi.lib.glance import Images
-
-
-class TestVMAction:
-    testConfig = ConfigParser()
-    # initialise bu and project
-    buObj = BUs()
-    domainName = testConfig.getDomainName()
-    userName = testConfig.getProjectAdmin()
-    userPwd = testConfig.getProjectAdminPassword()
-    projectName = testConfig.getProjectName()
+from ebapi.lib.shared import SharedProject
+from ebapi.lib.tracker import ResourceTracker
+
+
+# test settings:
+# os property of the images to run the VM actions on, every image gets its own
+# test class, so pytest-xdist workers run the images concurrently, at most
+# API_TEST_WORKERS at a time, in one BU and project shared by all of them
+DEFAULT_IMAGES = (
+    "cirros, arch, centos 7.0, centos 8.4, debian 9.0, debian 10.0, "
+    "freebsd 12, rhel 6.10, rhel 7.9, sles 15"
+)
+testConfig = ConfigParser("vm")
+images = [
+    image.strip()
+    for image in testConfig.getOptionalConfig("images", DEFAULT_IMAGES).split(",")
+    if image.strip()
+]
+
+
+class VMActionTests:
+    # os property of the image, set by the per-image subclasses below
+    image = None
+    sharedProject = SharedProject("vmactions")
 
     @classmethod
     def setup_class(cls):
-        # create bu
-        cls.buID = cls.buObj.create(
-            buName=cls.domainName, userName=cls.userName, userPwd=cls.userPwd
-        )
-        assert cls.buID
-
-        # get bu
-        buResp = cls.buObj.get(cls.buID)
-        assert buResp["name"] == cls.domainName
-
-        # wait for bu to be created
-        assert cls.buObj.waitForState(cls.buID, state=BUs.BU_STATE_CREATED)
-
-        # create Project in the above created bu
-        cls.projObj = Projects(cls.domainName, cls.userName, cls.userPwd)
-        metadata = {"templateId": "Large", "custom_template": "true"}
-        compQuota = {
-            "cores": 128,
-            "injected_file_content_bytes": -1,
-            "injected_file_path_bytes": -1,
-            "injected_files": -1,
-            "instances": 64,
-            "key_pairs": -1,
-            "metadata_items": -1,
-            "ram": 262144,
-        }
-        strQuota = {
-            "snapshots": 640,
-            "backup_gigabytes": -1,
-            "backups": -1,
-            "volumes": 640,
-            "gigabytes": 25600,
-        }
-        netQuota = {
-            "router": 30,
-            "subnet": -1,
-            "network": 30,
-            "port": -1,
-            "floatingip": 64,
-            "pool": -1,
-        }
+        cls.suffix = re.sub(r"\W+", "", cls.image.title())
 
-        cls.projID = cls.projObj.create(
-            cls.projectName, cls.buID, metadata, compQuota, strQuota, netQuota
-        )
+        # join the bu and project shared by all images
+        cls.buID, cls.projID = cls.sharedProject.acquire()
         assert cls.projID
 
-        # get project
-        projResp = cls.projObj.get(cls.projID)
-        assert projResp["name"] == cls.projectName
-
-        # wait for project to be created
-        assert cls.projObj.waitForState(cls.projID, state=Projects.PROJ_STATE_CREATED)
-
         # get vm flavor
         flavorObj = Flavors(cls.projID)
         cls.matchflavorID = flavorObj.getBestMatchingFlavor(numCPU=2, memMB=2048)
 
         # get vm image
         imageObj = Images(cls.projID)
-        imgDetails = imageObj.getImagesbyVisibility(visibility="public")
-        for images in imgDetails["images"]:
-            if images["os"] == "cirros" and images["status"] == "active":
-                cls.actualImageID = images["id"]
-            break
-        sleep(5)
+        cls.actualImageID = imageObj.getImageIDByOS(cls.image)
+        if not cls.actualImageID:
+            # teardown_class does not run when setup_class skips
+            cls.sharedProject.release()
+            pytest.skip("no active %s image" % cls.image)
 
     @classmethod
     def teardown_class(cls):
-        # delete project
-        assert cls.projObj.delete(cls.projID, force_delete=True)
-
-        # wait for project to be deleted
-        assert cls.projObj.waitForState(cls.projID, state=Projects.PROJ_STATE_DELETED)
-
-        # delete bu
-        assert cls.buObj.delete(cls.buID, force_delete="true")
-
-        # wait for bu to be deleted
-        assert cls.buObj.waitForState(cls.buID, state=BUs.BU_STATE_DELETED)
-
+        # the last image to finish deletes the project, then the bu
+        assert cls.sharedProject.release()
+
+    def createVM(cls, tracker, name):
+        # create internal network
+        networkObj = Networks(cls.projID)
+        netID = networkObj.createInternalNetwork(
+            netName="Auto-Net-%s-%s" % (name, cls.suffix),
+            subnetName="Auto-SubNet-%s-%s" % (name, cls.suffix),
+        )
+        assert netID
+        netKey = tracker.add(ResourceTracker.NETWORK, netID, networkObj)
+
+        # create vm
+        vmObj = VMs(cls.projID)
+        # createVMs waits for this VM only, createVM waits for every VM in
+        # the project, which the other images share
+        spec = {
+            "vmName": "ebtestVM%s%s" % (name, cls.suffix),
+            "flavorID": cls.matchflavorID,
+            "networkID": netID,
+            "imageID": cls.actualImageID,
+        }
+        handles, _ = vmObj.createVMs([spec], maxInFlight=1)
+        assert handles is not None
+        vmID = handles[0]["id"]
+        if vmID:
+            tracker.add(ResourceTracker.VM, vmID, vmObj, [netKey])
+        assert handles[0]["ok"]
+        return vmObj, vmID
+
+    @pytest.mark.resources(instances=1, cores=2, ram=2048, network=1)
     def test_vm_reboot_001(cls):
+        tracker = ResourceTracker()
         try:
-            # create internal network
-            networkObj = Networks(cls.projID)
-            netID = networkObj.createInternalNetwork(
-                netName="Auto-Net1",
-                subnetName="Auto-SubNet1",
-            )
-
-            # create vm
-            vmObj = VMs(cls.projID)
-            vmName = "ebtestVMReboot"
-            vmObj.createVM(
-                vmName=vmName,
-                flavorID=cls.matchflavorID,
-                networkID=netID,
-                imageID=cls.actualImageID,
-            )
-            content = vmObj.getAllVMs()
-            for key, value in content.items():
-                if value == vmName:
-                    vmID = key
-                break
-            # wait for VM to be created
-            assert vmObj.waitForState(vmID, state="ACTIVE")
+            vmObj, vmID = cls.createVM(tracker, "Reboot")
 
             # Reboot VM
             assert vmObj.rebootVM(vmID)
@@ -138,35 +103,14 @@ class TestVMAction:
             assert vmObj.waitForState(vmID, state="ACTIVE")
 
         finally:
-            assert vmObj.deleteVM(vmID)
-            assert networkObj.deleteInternalNetwork(netID)
-            sleep(5)
+            # delete vm, then network
+            assert tracker.teardown()
 
+    @pytest.mark.resources(instances=1, cores=2, ram=2048, network=1)
     def test_vm_poweroff_002(cls):
+        tracker = ResourceTracker()
         try:
-            # create internal network
-            networkObj = Networks(cls.projID)
-            netID = networkObj.createInternalNetwork(
-                netName="Auto-Net2",
-                subnetName="Auto-SubNet2",
-            )
-
-            # create vm
-            vmObj = VMs(cls.projID)
-            vmName = "ebtestVMPowerOff"
-            vmObj.createVM(
-                vmName=vmName,
-                flavorID=cls.matchflavorID,
-                networkID=netID,
-                imageID=cls.actualImageID,
-            )
-            content = vmObj.getAllVMs()
-            for key, value in content.items():
-                if value == vmName:
-                    vmID = key
-                break
-            # wait for VM to be created
-            assert vmObj.waitForState(vmID, state="ACTIVE")
+            vmObj, vmID = cls.createVM(tracker, "PowerOff")
 
             # Poweroff VM
             assert vmObj.powerOffVM(vmID)
@@ -181,35 +125,14 @@ class TestVMAction:
             assert vmObj.waitForState(vmID, state="ACTIVE")
 
         finally:
-            assert vmObj.deleteVM(vmID)
-            assert networkObj.deleteInternalNetwork(netID)
-            sleep(5)
+            # delete vm, then network
+            assert tracker.teardown()
 
+    @pytest.mark.resources(instances=1, cores=2, ram=2048, network=1)
     def test_vm_suspend_003(cls):
+        tracker = ResourceTracker()
         try:
-            # create internal network
-            networkObj = Networks(cls.projID)
-            netID = networkObj.createInternalNetwork(
-                netName="Auto-Net3",
-                subnetName="Auto-SubNet3",
-            )
-
-            # create vm
-            vmObj = VMs(cls.projID)
-            vmName = "ebtestVMSuspend"
-            vmObj.createVM(
-                vmName=vmName,
-                flavorID=cls.matchflavorID,
-                networkID=netID,
-                imageID=cls.actualImageID,
-            )
-            content = vmObj.getAllVMs()
-            for key, value in content.items():
-                if value == vmName:
-                    vmID = key
-                break
-            # wait for VM to be created
-            assert vmObj.waitForState(vmID, state="ACTIVE")
+            vmObj, vmID = cls.createVM(tracker, "Suspend")
 
             # Suspend VM
             assert vmObj.suspendVM(vmID)
@@ -224,6 +147,12 @@ class TestVMAction:
             assert vmObj.waitForState(vmID, state="ACTIVE")
 
         finally:
-            assert vmObj.deleteVM(vmID)
-            assert networkObj.deleteInternalNetwork(netID)
-            sleep(5)
+            # delete vm, then network
+            assert tracker.teardown()
+
+
+# one test class per image, e.g. TestVMActionCentos70, since pytest-xdist
+# (--dist loadscope) and the duration scheduler hand out whole classes
+for _image in images:
+    _name = "TestVMAction" + re.sub(r"\W+", "", _image.title())
+    globals()[_name] = type(_name, (VMActionTests,), {"image": _image})
@@ -12,6 +12,7 @@ from ebapi.lib.nova import VMs
 from ebapi.lib.nova import Flavors
 from ebapi.lib.neutron import Networks
 from ebapi.lib.glance import Images
+from ebapi.lib.tracker import ResourceTracker
 
 
 class TestVMCRUD:
@@ -25,11 +26,15 @@ class TestVMCRUD:
 
     @classmethod
     def setup_class(cls):
+        # track created resources for teardown
+        cls.tracker = ResourceTracker()
+
         # create bu
         cls.buID = cls.buObj.create(
             buName=cls.domainName, userName=cls.userName, userPwd=cls.userPwd
         )
         assert cls.buID
+        cls.buKey = cls.tracker.add(ResourceTracker.BU, cls.buID, cls.buObj)
 
         # get bu
         buResp = cls.buObj.get(cls.buID)
@@ -71,6 +76,7 @@ class TestVMCRUD:
             cls.projectName, cls.buID, metadata, compQuota, strQuota, netQuota
         )
         assert cls.projID
+        cls.tracker.add(ResourceTracker.PROJECT, cls.projID, cls.projObj, [cls.buKey])
 
         # get project
         projResp = cls.projObj.get(cls.projID)
@@ -94,19 +100,12 @@ class TestVMCRUD:
 
     @classmethod
     def teardown_class(cls):
-        # delete project
-        assert cls.projObj.delete(cls.projID, force_delete=True)
-
-        # wait for project to be deleted
-        assert cls.projObj.waitForState(cls.projID, state=Projects.PROJ_STATE_DELETED)
-
-        # delete bu
-        assert cls.buObj.delete(cls.buID, force_delete="true")
-
-        # wait for bu to be deleted
-        assert cls.buObj.waitForState(cls.buID, state=BUs.BU_STATE_DELETED)
+        # delete project, then bu
+        assert cls.tracker.teardown()
 
+    @pytest.mark.resources(instances=1, cores=2, ram=2048, network=1)
     def test_vm_crud_001(cls):
+        tracker = ResourceTracker()
         try:
             # create internal network
             networkObj = Networks(cls.projID)
@@ -114,6 +113,8 @@ class TestVMCRUD:
                 netName="Auto-Net1",
                 subnetName="Auto-SubNet1",
             )
+            assert netID
+            netKey = tracker.add(ResourceTracker.NETWORK, netID, networkObj)
 
             # create vm
             vmObj = VMs(cls.projID)
@@ -129,14 +130,16 @@ class TestVMCRUD:
                 if value == vmName:
                     vmID = key
                 break
+            tracker.add(ResourceTracker.VM, vmID, vmObj, [netKey])
+
             # wait for VM to be created
             assert vmObj.waitForState(vmID, state="ACTIVE")
 
         finally:
-            assert vmObj.deleteVM(vmID)
-            assert networkObj.deleteInternalNetwork(netID)
-            sleep(5)
+            # delete vm, then network
+            assert tracker.teardown()
 
+    @pytest.mark.resources(instances=1, cores=2, ram=2048, network=1)
     @pytest.mark.parametrize(
         "VMNames",
         [
@@ -146,6 +149,7 @@ class TestVMCRUD:
         ],
     )
     def test_vm_crud_002(cls, VMNames):
+        tracker = ResourceTracker()
         try:
             # create internal network
             networkObj = Networks(cls.projID)
@@ -153,6 +157,8 @@ class TestVMCRUD:
                 netName="Auto-Net2",
                 subnetName="Auto-SubNet2",
             )
+            assert netID
+            netKey = tracker.add(ResourceTracker.NETWORK, netID, networkObj)
 
             # create vm
             vmObj = VMs(cls.projID)
@@ -167,10 +173,48 @@ class TestVMCRUD:
                 if value == VMNames:
                     vmID = key
                 break
+            tracker.add(ResourceTracker.VM, vmID, vmObj, [netKey])
+
             # wait for VM to be created
             assert vmObj.waitForState(vmID, state="ACTIVE")
 
         finally:
-            vmObj.deleteVM(vmID)
-            networkObj.deleteInternalNetwork(netID)
-            sleep(5)
+            # delete vm, then network
+            tracker.teardown()
+
+    @pytest.mark.resources(instances=5, cores=10, ram=10240, network=1)
+    def test_vm_crud_003(cls):
+        tracker = ResourceTracker()
+        try:
+            # create internal network
+            networkObj = Networks(cls.projID)
+            netID = networkObj.createInternalNetwork(
+                netName="Auto-Net3",
+                subnetName="Auto-SubNet3",
+            )
+            assert netID
+            netKey = tracker.add(ResourceTracker.NETWORK, netID, networkObj)
+
+            # create vms concurrently
+            vmObj = VMs(cls.projID)
+            specs = [
+                {
+                    "vmName": "ebtestVMBulk%02d" % i,
+                    "flavorID": cls.matchflavorID,
+                    "networkID": netID,
+                    "imageID": cls.actualImageID,
+                }
+                for i in range(5)
+            ]
+            handles, timing = vmObj.createVMs(specs, maxInFlight=5)
+            assert handles
+            for handle in handles:
+                if handle["id"]:
+                    tracker.add(ResourceTracker.VM, handle["id"], vmObj, [netKey])
+
+            # every vm should be active
+            assert timing["failed"] == 0
+
+        finally:
+            # delete vms, then network
+            assert tracker.teardown()